@@ -1,6 +1,27 @@
 """Facial Recognition."""
 
-from .manager import FaceRecognizerManager
-from .interface import FaceRecoApp
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .interface import FaceRecoApp
+    from .manager import FaceRecognizerManager
 
 __all__ = ["FaceRecognizerManager", "FaceRecoApp"]
+
+# Importés au premier accès (PEP 562) : `import facial_recognition`, les processus
+# d'apprentissage et de comparaison ou la ligne de commande ne chargent ainsi ni
+# PyQt6 ni OpenCV tant qu'ils ne s'en servent pas
+_LAZY = {"FaceRecognizerManager": ".manager", "FaceRecoApp": ".interface"}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
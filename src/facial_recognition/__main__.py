@@ -1,25 +1,407 @@
 """Command-line interface."""
 
+import os
 import sys
+from contextlib import closing
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
 import click
-from PyQt6.QtWidgets import QApplication, QStyleFactory
-from .interface import FaceRecoApp
 
+from .dnn import DNN_BACKENDS, DNN_TARGETS
+
+if TYPE_CHECKING:
+    from .manager import FaceRecognizerManager
+
+DEFAULT_ENCODING_FILE = os.path.join("encodings_data", "visages_connus.pkl")
+DEFAULT_RESULTS_DB = os.path.join("encodings_data", "resultats.sqlite3")
+DEFAULT_CROP_ARCHIVE = os.path.join("encodings_data", "visages_alignes")
 
-@click.command()
+
+@click.group(invoke_without_command=True)
 @click.version_option()
 @click.option("--gui", is_flag=True, default=True, help="Launch the GUI interface.")
-def main(gui: bool) -> None:
+@click.option(
+    "--backend",
+    type=click.Choice(sorted(DNN_BACKENDS)),
+    default="default",
+    show_default=True,
+    help="OpenCV DNN backend used by YuNet and SFace.",
+)
+@click.option(
+    "--target",
+    type=click.Choice(sorted(DNN_TARGETS)),
+    default="cpu",
+    show_default=True,
+    help="OpenCV DNN target device.",
+)
+@click.option(
+    "--threads",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of OpenCV intra-op threads (default: OpenCV's choice).",
+)
+@click.option(
+    "--letterbox",
+    is_flag=True,
+    default=False,
+    help="Run the face detector on a small set of fixed input sizes instead of each image's exact size.",
+)
+@click.option(
+    "--decode-max-side",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Decode larger JPEGs at 1/2, 1/4 or 1/8 resolution for detection, keeping at least this many "
+    "pixels on the long side (1920 suits camera photos; default: full resolution).",
+)
+@click.option(
+    "--memory-budget",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Memory budget in MB: detection resolution, batch size, prefetch and worker count adapt to it.",
+)
+@click.option(
+    "--gallery-shards",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Match against one shared-memory copy of the gallery, split across this many processes (0: off).",
+)
+@click.option(
+    "--match-batch",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Faces accumulated across images before matching them together in blocked products (0: off).",
+)
+@click.option(
+    "--margin",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    show_default=True,
+    help="Leave a face unknown when another identity scores within this margin of the best one (0: off).",
+)
+@click.option(
+    "--calibration-sigmas",
+    type=click.FloatRange(min=0),
+    default=None,
+    help="Raise each identity's threshold to its impostor mean plus this many standard deviations, "
+    "calibrated at training and compaction (3 is a good start; default: off, global threshold only).",
+)
+@click.pass_context
+def main(
+    ctx: click.Context,
+    gui: bool,
+    backend: str,
+    target: str,
+    threads: Optional[int],
+    letterbox: bool,
+    decode_max_side: Optional[int],
+    memory_budget: Optional[int],
+    gallery_shards: int,
+    match_batch: int,
+    margin: float,
+    calibration_sigmas: Optional[float],
+) -> None:
     """Facial Recognition."""
+    ctx.obj = {
+        "backend_id": DNN_BACKENDS[backend],
+        "target_id": DNN_TARGETS[target],
+        "num_threads": threads,
+        "letterbox": letterbox,
+        "decode_max_side": decode_max_side,
+        "memory_budget": memory_budget * 1024 * 1024 if memory_budget else None,
+        "gallery_shards": gallery_shards,
+        "match_batch": match_batch,
+        "margin": margin,
+        "calibration_sigmas": calibration_sigmas,
+    }
+    if ctx.invoked_subcommand is not None:
+        return
+
     if gui:
+        # PyQt6 et l'interface ne sont importés que pour l'interface graphique
+        from PyQt6.QtWidgets import QApplication, QStyleFactory
+
+        from .interface import FaceRecoApp
+
         app = QApplication(sys.argv)
         app.setStyle(QStyleFactory.create("Fusion"))
-        window = FaceRecoApp()
+        window = FaceRecoApp(**ctx.obj)
         window.show()
         sys.exit(app.exec())
     else:
         click.echo("CLI mode not implemented yet. Use --gui.")
 
 
+def load_manager(options: Dict[str, Any], encodings: str, model_dir: Optional[str] = None) -> "FaceRecognizerManager":
+    """Create a manager with loaded models and encodings, or abort the command."""
+    from .manager import FaceRecognizerManager
+
+    manager = FaceRecognizerManager(model_dir=model_dir, encoding_file=encodings, **options)
+    if not manager.check_and_download_models(click.echo) or not manager.load_models():
+        raise click.ClickException("Unable to load the ONNX models.")
+    success, count = manager.load_encodings()
+    if not success:
+        raise click.ClickException(f"No encodings found in {encodings}. Run the training first.")
+    click.echo(f"{count} known faces loaded.")
+    return manager
+
+
+@main.command()
+@click.option("--host", default="127.0.0.1", show_default=True, help="Address to listen on.")
+@click.option("--port", type=int, default=8765, show_default=True, help="Port to listen on.")
+@click.option(
+    "--encodings",
+    type=click.Path(dir_okay=False),
+    default=DEFAULT_ENCODING_FILE,
+    show_default=True,
+    help="Encoding store to serve.",
+)
+@click.option("--model-dir", type=click.Path(file_okay=False), default=None,
+              help="Directory of the ONNX models (default: bundled models).")
+@click.option("--max-batch", type=click.IntRange(min=1), default=16, show_default=True,
+              help="Maximum number of images per micro-batch.")
+@click.option("--batch-window-ms", type=float, default=5.0, show_default=True,
+              help="Time window used to group concurrent requests.")
+@click.option("--max-pending", type=click.IntRange(min=1), default=64, show_default=True,
+              help="Maximum number of requests in flight before answering 503.")
+@click.pass_obj
+def serve(
+    options: Dict[str, Any],
+    host: str,
+    port: int,
+    encodings: str,
+    model_dir: Optional[str],
+    max_batch: int,
+    batch_window_ms: float,
+    max_pending: int,
+) -> None:
+    """Run the local recognition service (POST /recognize with image bytes)."""
+    from .service import RecognitionService, create_server
+
+    manager = load_manager(options, encodings, model_dir)
+    service = RecognitionService(
+        manager, max_batch=max_batch, batch_window=batch_window_ms / 1000, max_pending=max_pending
+    )
+    service.start()
+    server = create_server(service, host, port)
+    click.echo(f"Listening on http://{host}:{server.server_port}/recognize")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:  # pragma: no cover
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+@main.command()
+@click.argument("known_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--encodings", type=click.Path(dir_okay=False), default=DEFAULT_ENCODING_FILE, show_default=True)
+@click.option("--model-dir", type=click.Path(file_okay=False), default=None)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of training processes, each with its own models.",
+)
+@click.option(
+    "--archive",
+    type=click.Path(file_okay=False),
+    default=DEFAULT_CROP_ARCHIVE,
+    show_default=True,
+    help="Directory where the aligned faces are kept for `reembed` (empty to disable).",
+)
+@click.pass_obj
+def train(
+    options: Dict[str, Any], known_dir: str, encodings: str, model_dir: Optional[str], workers: int, archive: str
+) -> None:
+    """Rebuild the encoding store from KNOWN_DIR (one sub-directory per person)."""
+    from .manager import FaceRecognizerManager
+
+    manager = FaceRecognizerManager(
+        model_dir=model_dir, encoding_file=encodings, crop_archive=archive or None, **options
+    )
+    if not manager.check_and_download_models(click.echo):
+        raise click.ClickException("Unable to download the ONNX models.")
+    if not manager.train_faces(known_dir, progress_callback=click.echo, workers=workers):
+        raise click.ClickException("Training failed.")
+
+
+@main.command()
+@click.option("--archive", type=click.Path(file_okay=False), default=DEFAULT_CROP_ARCHIVE, show_default=True)
+@click.option("--encodings", type=click.Path(dir_okay=False), default=DEFAULT_ENCODING_FILE, show_default=True)
+@click.option("--model-dir", type=click.Path(file_okay=False), default=None)
+@click.option(
+    "--db",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Results database whose archived faces are re-identified as well.",
+)
+@click.option("--batch-size", type=click.IntRange(min=1), default=256, show_default=True)
+@click.pass_obj
+def reembed(
+    options: Dict[str, Any], archive: str, encodings: str, model_dir: Optional[str], db: Optional[str], batch_size: int
+) -> None:
+    """Rebuild the encoding store from the archived aligned faces, without re-detecting."""
+    from .manager import FaceRecognizerManager
+
+    manager = FaceRecognizerManager(
+        model_dir=model_dir, encoding_file=encodings, results_db=db, crop_archive=archive, **options
+    )
+    if not manager.check_and_download_models(click.echo):
+        raise click.ClickException("Unable to download the ONNX models.")
+    if not manager.reembed(progress_callback=click.echo, batch_size=batch_size):
+        raise click.ClickException("Re-embedding failed.")
+
+
+@main.command()
+@click.argument("unknown_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--encodings", type=click.Path(dir_okay=False), default=DEFAULT_ENCODING_FILE, show_default=True)
+@click.option("--model-dir", type=click.Path(file_okay=False), default=None)
+@click.option(
+    "--export",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write one record per image as it is identified (.jsonl or .csv, add .gz to compress).",
+)
+@click.option("--db", type=click.Path(dir_okay=False), default=None, help="Results database to record the run in.")
+@click.option(
+    "--shortlist",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Recently recognized identities compared first (images processed in capture order).",
+)
+@click.pass_obj
+def sort(
+    options: Dict[str, Any],
+    unknown_dir: str,
+    encodings: str,
+    model_dir: Optional[str],
+    export: Optional[str],
+    db: Optional[str],
+    shortlist: int,
+) -> None:
+    """Identify the people in UNKNOWN_DIR and rename the images."""
+    manager = load_manager(options, encodings, model_dir)
+    manager.results_db = db
+    manager.process_directory(unknown_dir, progress_callback=click.echo, shortlist=shortlist, export=export)
+
+
+@main.group()
+def gallery() -> None:
+    """Add, replace or remove identities without retraining (running processes pick them up)."""
+
+
+@gallery.command("add")
+@click.argument("name")
+@click.argument("images", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--replace", is_flag=True, help="Replace the existing signatures of NAME.")
+@click.option("--encodings", type=click.Path(dir_okay=False), default=DEFAULT_ENCODING_FILE, show_default=True)
+@click.option("--model-dir", type=click.Path(file_okay=False), default=None)
+@click.pass_obj
+def gallery_add(
+    options: Dict[str, Any], name: str, images: Tuple[str, ...], replace: bool, encodings: str, model_dir: Optional[str]
+) -> None:
+    """Encode IMAGES and add them to the identity NAME."""
+    import cv2
+
+    from .manager import FaceRecognizerManager
+
+    manager = FaceRecognizerManager(model_dir=model_dir, encoding_file=encodings, **options)
+    if not manager.check_and_download_models(click.echo) or not manager.load_models():
+        raise click.ClickException("Unable to load the ONNX models.")
+    manager.load_encodings()
+    decoded = [cv2.imread(path) for path in images]
+    update = manager.replace_identity if replace else manager.add_identity
+    count = update(name, decoded)
+    if not count:
+        raise click.ClickException(f"No face found in the images of {name}.")
+    click.echo(f"{count} signatures recorded for {name}.")
+
+
+@gallery.command("remove")
+@click.argument("name")
+@click.option("--encodings", type=click.Path(dir_okay=False), default=DEFAULT_ENCODING_FILE, show_default=True)
+def gallery_remove(name: str, encodings: str) -> None:
+    """Remove the identity NAME."""
+    from .manager import FaceRecognizerManager
+
+    manager = FaceRecognizerManager(encoding_file=encodings)
+    manager.load_encodings()
+    if not manager.remove_identity(name):
+        raise click.ClickException(f"Unknown identity: {name}")
+    click.echo(f"{name} removed.")
+
+
+@gallery.command("compact")
+@click.option("--encodings", type=click.Path(dir_okay=False), default=DEFAULT_ENCODING_FILE, show_default=True)
+@click.pass_obj
+def gallery_compact(options: Dict[str, Any], encodings: str) -> None:
+    """Rewrite the encoding store and empty its change log (and calibrate it with --calibration-sigmas)."""
+    from .manager import FaceRecognizerManager
+
+    manager = FaceRecognizerManager(encoding_file=encodings, **options)
+    success, count = manager.load_encodings()
+    if not success:
+        raise click.ClickException(f"No encodings found in {encodings}.")
+    manager.compact_gallery()
+    click.echo(f"{count} signatures compacted.")
+
+
+@main.group()
+@click.option(
+    "--db",
+    type=click.Path(exists=True, dir_okay=False),
+    default=DEFAULT_RESULTS_DB,
+    show_default=True,
+    help="Results database written by the processing runs.",
+)
+@click.pass_context
+def query(ctx: click.Context, db: str) -> None:
+    """Query the results of previous processing runs."""
+    from .results_db import ResultsDatabase
+
+    ctx.obj = ctx.with_resource(closing(ResultsDatabase(db)))
+
+
+@query.command("person")
+@click.argument("name")
+@click.pass_obj
+def query_person(results: Any, name: str) -> None:
+    """List the photos where NAME appears."""
+    for path in results.photos_of(name):
+        click.echo(path)
+
+
+@query.command("together")
+@click.argument("names", nargs=-1, required=True)
+@click.pass_obj
+def query_together(results: Any, names: Tuple[str, ...]) -> None:
+    """List the photos where all NAMES appear together."""
+    for path in results.photos_with(names):
+        click.echo(path)
+
+
+@query.command("cooccurrence")
+@click.argument("name")
+@click.pass_obj
+def query_cooccurrence(results: Any, name: str) -> None:
+    """List the people photographed with NAME, by number of shared photos."""
+    for other, count in results.co_occurrences(name):
+        click.echo(f"{count}\t{other}")
+
+
+@query.command("unknown")
+@click.option("--limit", type=click.IntRange(min=1), default=100, show_default=True)
+@click.pass_obj
+def query_unknown(results: Any, limit: int) -> None:
+    """List the faces that were not identified, most recent first."""
+    for path, (x, y, w, h), score in results.unknown_faces(limit):
+        click.echo(f"{path}\t{x:.0f},{y:.0f},{w:.0f},{h:.0f}\t{score:.3f}")
+
+
 if __name__ == "__main__":
     main(prog_name="facial-recognition")  # pragma: no cover
@@ -0,0 +1,119 @@
+import cv2
+import numpy as np
+
+# Position des 5 points de repère (yeux, nez, coins de la bouche) dans un visage aligné 112x112,
+# identiques à ceux de cv2.FaceRecognizerSF.alignCrop
+REFERENCE_LANDMARKS = np.array([
+    [38.2946, 51.6963],
+    [73.5318, 51.5014],
+    [56.0252, 71.7366],
+    [41.5493, 92.3655],
+    [70.7299, 92.2041],
+], dtype=np.float32)
+# OpenCV utilise une moyenne arrondie de ces points : on la reprend telle quelle
+REFERENCE_MEAN = np.array([56.0262, 71.9008], dtype=np.float32)
+CROP_SIZE = 112
+
+
+def estimate_similarity_transforms(faces):
+    """
+    Estime en une passe les similitudes (rotation, échelle, translation) de tous les visages d'une image.
+
+    Reproduit l'estimation de Umeyama de `FaceRecognizerSF.alignCrop`, vectorisée
+    sur l'ensemble des détections.
+
+    :param faces: Détections YuNet (F, 15) ; les colonnes 4 à 13 sont les 5 points de repère.
+    :return: Tableau (F, 2, 3) float64 des matrices affines.
+    """
+    src = np.asarray(faces, dtype=np.float32)[:, 4:14].reshape(-1, 5, 2)
+    src_mean = src.mean(axis=1, keepdims=True)
+    src_demean = (src - src_mean).astype(np.float64)
+    dst_demean = (REFERENCE_LANDMARKS - REFERENCE_MEAN).astype(np.float64)
+
+    # Matrice de covariance (F, 2, 2) puis SVD par lot
+    cov = np.einsum('pi,fpj->fij', dst_demean, src_demean) / 5
+    u, s, vt = np.linalg.svd(cov)
+
+    d = np.ones((len(src), 2))
+    d[np.linalg.det(cov) < 0, 1] = -1
+    rotation = np.einsum('fij,fj,fjk->fik', u, d, vt)
+
+    variance = (src_demean ** 2).sum(axis=(1, 2)) / 5
+    scale = (s * d).sum(axis=1) / variance
+
+    transforms = np.empty((len(src), 2, 3))
+    transforms[:, :, :2] = rotation * scale[:, None, None]
+    translation = np.einsum('fij,fj->fi', rotation, src_mean[:, 0].astype(np.float64))
+    transforms[:, :, 2] = REFERENCE_MEAN - scale[:, None] * translation
+    return transforms
+
+
+class CropBatch:
+    """
+    Tampon contigu préalloué de visages alignés (N, 112, 112, 3).
+
+    Les visages d'une ou plusieurs images y sont écrits directement par `cv2.warpAffine`,
+    sans allocation par visage ; le tampon est ensuite transmis tel quel à l'encodage.
+    """
+
+    def __init__(self, capacity=32):
+        """
+        :param capacity: Nombre de visages alloués initialement (le tampon s'agrandit si besoin).
+        """
+        self.buffer = np.empty((max(1, capacity), CROP_SIZE, CROP_SIZE, 3), dtype=np.uint8)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def crops(self):
+        """Vue sur les visages alignés actuellement stockés."""
+        return self.buffer[:self.size]
+
+    def add(self, img, faces):
+        """
+        Aligne tous les visages détectés d'une image à la suite du tampon.
+
+        :param img: Image BGR d'origine.
+        :param faces: Détections YuNet (F, 15).
+        :return: int: Nombre de visages ajoutés.
+        """
+        count = len(faces)
+        if count == 0:
+            return 0
+        self._reserve(self.size + count)
+
+        for i, matrix in enumerate(estimate_similarity_transforms(faces)):
+            cv2.warpAffine(img, matrix, (CROP_SIZE, CROP_SIZE), dst=self.buffer[self.size + i],
+                           flags=cv2.INTER_LINEAR)
+        self.size += count
+        return count
+
+    def clear(self):
+        """Vide le tampon sans libérer la mémoire allouée."""
+        self.size = 0
+
+    def _reserve(self, capacity):
+        """Agrandit le tampon (par doublement) pour contenir au moins `capacity` visages."""
+        if capacity <= len(self.buffer):
+            return
+        new_capacity = len(self.buffer)
+        while new_capacity < capacity:
+            new_capacity *= 2
+        buffer = np.empty((new_capacity, CROP_SIZE, CROP_SIZE, 3), dtype=np.uint8)
+        buffer[:self.size] = self.buffer[:self.size]
+        self.buffer = buffer
+
+
+def align_faces(img, faces):
+    """
+    Aligne tous les visages d'une image (équivalent vectorisé de `alignCrop`).
+
+    :param img: Image BGR d'origine.
+    :param faces: Détections YuNet (F, 15).
+    :return: Tableau (F, 112, 112, 3) uint8 contigu.
+    """
+    batch = CropBatch(len(faces))
+    batch.add(img, faces)
+    return batch.crops
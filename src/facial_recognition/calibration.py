@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+
+# Écarts-types au-dessus de la moyenne des scores d'imposteurs d'une identité : seuil minimal
+# pour la reconnaître (avec SFace sur des visages nets, ~0.1 ± 0.1, soit le seuil global usuel)
+IMPOSTOR_SIGMAS = 3.0
+# Nombre de scores calculés par bloc lors de la comparaison de toutes les paires (64 Mo en float32 :
+# des blocs de quelques centaines de lignes gardent le produit matriciel efficace)
+CALIBRATION_TILE = 1 << 24
+
+
+class Calibration:
+    """
+    Statistiques des scores d'imposteurs de chaque identité de la base.
+
+    Calculées une fois, à l'apprentissage (ou à la compaction de la base), en comparant
+    toutes les paires de signatures par produits matriciels de blocs : pour chaque
+    identité, la moyenne, l'écart-type et le maximum des scores entre ses signatures
+    et celles des autres identités. L'identification n'en retient qu'un seuil minimal
+    par identité, lu dans un dictionnaire : la comparaison n'est pas ralentie. Une
+    identité facile à confondre (scores d'imposteurs élevés) exige un score plus haut.
+    """
+
+    def __init__(self, names, mean, std, maximum):
+        """
+        :param names: Identités calibrées.
+        :param mean: Moyenne des scores d'imposteurs de chaque identité.
+        :param std: Écart-type des scores d'imposteurs de chaque identité.
+        :param maximum: Plus haut score d'imposteur de chaque identité.
+        """
+        self.names = list(names)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.maximum = np.asarray(maximum, dtype=np.float64)
+
+    @classmethod
+    def compute(cls, gallery, tile=CALIBRATION_TILE):
+        """
+        Compare toutes les signatures de la base entre elles, par blocs de lignes.
+
+        :param gallery: Gallery (signatures et noms).
+        :param tile: Nombre maximal de scores calculés par bloc.
+        :return: Calibration (vide si la base compte moins de deux identités).
+        """
+        names = sorted(set(gallery.names))
+        if len(names) < 2:
+            return cls([], [], [], [])
+        index = {name: i for i, name in enumerate(names)}
+        # Triées par identité, les signatures d'une même personne forment une tranche
+        # contiguë de colonnes : les scores authentiques s'écartent par simple découpage
+        labels = np.array([index[name] for name in gallery.names])
+        order = np.argsort(labels, kind="stable")
+        labels = labels[order]
+        matrix = np.vstack([np.asarray(gallery.features[i], dtype=np.float32).reshape(1, -1) for i in order])
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        sizes = np.bincount(labels, minlength=len(names))
+        bounds = np.concatenate(([0], np.cumsum(sizes)))
+
+        total = np.zeros(len(names))
+        squares = np.zeros(len(names))
+        maximum = np.full(len(names), -np.inf)
+        rows = max(1, tile // len(matrix))
+        for start in range(0, len(matrix), rows):
+            stop = min(start + rows, len(matrix))
+            scores = matrix[start:stop] @ matrix.T
+            block_labels = labels[start:stop]
+            genuine = [(label, max(bounds[label], start) - start, min(bounds[label + 1], stop) - start)
+                       for label in np.unique(block_labels)]
+            for label, first, last in genuine:
+                scores[first:last, bounds[label]:bounds[label + 1]] = 0
+            np.add.at(total, block_labels, scores.sum(axis=1))
+            np.add.at(squares, block_labels, np.einsum("ij,ij->i", scores, scores))
+            for label, first, last in genuine:
+                scores[first:last, bounds[label]:bounds[label + 1]] = -np.inf
+            np.maximum.at(maximum, block_labels, scores.max(axis=1))
+
+        count = sizes * (len(labels) - sizes)
+        mean = total / count
+        std = np.sqrt(np.maximum(squares / count - mean ** 2, 0))
+        return cls(names, mean, std, maximum)
+
+    def bounds(self, sigmas=IMPOSTOR_SIGMAS):
+        """
+        :param sigmas: Écarts-types au-dessus de la moyenne des scores d'imposteurs.
+        :return: dict: Score minimal pour reconnaître chaque identité calibrée.
+        """
+        return dict(zip(self.names, (self.mean + sigmas * self.std).tolist()))
+
+    def report(self, threshold, sigmas=IMPOSTOR_SIGMAS):
+        """Résumé lisible : identités dont le seuil calibré dépasse le seuil global."""
+        if not self.names:
+            return "Calibration : moins de deux identités, seuil global seulement."
+        bounds = self.mean + sigmas * self.std
+        raised = int((bounds > threshold).sum())
+        text = (f"Calibration : {len(self.names)} identités, scores d'imposteurs {self.mean.mean():.2f} en "
+                f"moyenne (au plus {self.maximum.max():.2f}) ; seuil relevé au-dessus de {threshold:.2f} "
+                f"pour {raised} identité(s)")
+        if raised:
+            text += f" (jusqu'à {bounds.max():.2f})"
+        return text + "."
+
+    def save(self, path):
+        """Écrit la calibration (fichier NumPy `.npz`), en remplaçant atomiquement l'ancienne."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, names=np.array(self.names, dtype=str), mean=self.mean, std=self.std, maximum=self.maximum)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """:return: Calibration lue dans `path`, ou None si le fichier est absent ou illisible."""
+        try:
+            with np.load(path) as data:
+                return cls(data["names"].tolist(), data["mean"], data["std"], data["maximum"])
+        except (OSError, KeyError, ValueError):
+            return None
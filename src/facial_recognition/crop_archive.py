@@ -0,0 +1,145 @@
+import os
+import sqlite3
+
+import numpy as np
+
+try:
+    from .alignment import CROP_SIZE
+except ImportError:
+    from alignment import CROP_SIZE
+
+CROP_SHAPE = (CROP_SIZE, CROP_SIZE, 3)
+CROP_BYTES = CROP_SIZE * CROP_SIZE * 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crops (
+    row INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    face INTEGER NOT NULL,
+    UNIQUE(hash, face)
+);
+CREATE TABLE IF NOT EXISTS gallery (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    row INTEGER NOT NULL REFERENCES crops(row)
+);
+CREATE INDEX IF NOT EXISTS gallery_name ON gallery(name);
+"""
+
+
+class CropArchive:
+    """
+    Archive des visages alignés 112x112, pour réencoder sans redécoder ni redétecter.
+
+    Les visages sont ajoutés à la suite d'un fichier brut uint8 (`crops.u8`, 37 632 octets
+    par visage) relu par projection mémoire ; un index SQLite associe chaque ligne à
+    l'empreinte du contenu de la photo source et au rang du visage dans ses détections.
+    Les visages de la base de référence sont rattachés à leur identité (table `gallery`).
+    Un changement de modèle d'encodage ne coûte alors que le temps d'encodage.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: Dossier de l'archive (créé si besoin).
+        """
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.data_file = os.path.join(directory, "crops.u8")
+        self.conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM crops").fetchone()[0]
+
+    def add(self, entries):
+        """
+        Ajoute des visages alignés ; un visage déjà archivé (même empreinte, même rang) n'est pas réécrit.
+
+        :param entries: Liste de tuples (empreinte, rang du visage, visage aligné 112x112x3 uint8).
+        :return: list: Ligne de chaque visage dans l'archive, dans l'ordre de `entries`.
+        """
+        rows = []
+        new = []
+        known = {}
+        for digest, face, crop in entries:
+            key = (digest, int(face))
+            if key not in known:
+                found = self.conn.execute(
+                    "SELECT row FROM crops WHERE hash = ? AND face = ?", key
+                ).fetchone()
+                known[key] = found[0] if found else None
+                if found is None:
+                    new.append((key, crop))
+            rows.append(key)
+
+        if new:
+            with open(self.data_file, 'ab') as f:
+                # Une ligne = une position dans le fichier : une fin incomplète (écriture
+                # interrompue) est écrasée
+                first = f.seek(0, os.SEEK_END) // CROP_BYTES
+                f.truncate(first * CROP_BYTES)
+                f.seek(first * CROP_BYTES)
+                for _, crop in new:
+                    f.write(np.ascontiguousarray(crop, dtype=np.uint8).tobytes())
+            for offset, (key, _) in enumerate(new):
+                known[key] = first + offset
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO crops(row, hash, face) VALUES (?, ?, ?)",
+                    [(known[key], *key) for key, _ in new],
+                )
+        return [known[key] for key in rows]
+
+    def set_gallery(self, rows_by_name, names=None):
+        """
+        Rattache des visages archivés aux identités de la base de référence.
+
+        :param rows_by_name: Liste de tuples (identité, ligne), dans l'ordre de la base.
+        :param names: Identités à remplacer ; None remplace toute la base.
+        """
+        with self.conn:
+            if names is None:
+                self.conn.execute("DELETE FROM gallery")
+            else:
+                self.conn.executemany("DELETE FROM gallery WHERE name = ?", [(n,) for n in names])
+            self.conn.executemany("INSERT INTO gallery(name, row) VALUES (?, ?)", rows_by_name)
+
+    def gallery(self):
+        """
+        :return: list: Tuples (identité, ligne) de la base de référence, dans l'ordre de l'apprentissage.
+        """
+        return self.conn.execute("SELECT name, row FROM gallery ORDER BY id").fetchall()
+
+    def faces(self):
+        """
+        :return: list: Tuples (empreinte, rang du visage, ligne) de tous les visages archivés.
+        """
+        return self.conn.execute("SELECT hash, face, row FROM crops ORDER BY row").fetchall()
+
+    def crops(self):
+        """
+        :return: np.memmap (N, 112, 112, 3) uint8 en lecture seule (vide si l'archive l'est).
+        """
+        if not os.path.exists(self.data_file):
+            return np.empty((0,) + CROP_SHAPE, dtype=np.uint8)
+        count = os.path.getsize(self.data_file) // CROP_BYTES
+        if count == 0:
+            return np.empty((0,) + CROP_SHAPE, dtype=np.uint8)
+        return np.memmap(self.data_file, dtype=np.uint8, mode='r', shape=(count,) + CROP_SHAPE)
+
+    def iter_batches(self, rows, batch_size=256):
+        """
+        Parcourt des visages archivés par lots contigus.
+
+        :param rows: Lignes à lire.
+        :param batch_size: Nombre de visages par lot.
+        :return: Générateur de tableaux (n, 112, 112, 3) uint8.
+        """
+        crops = self.crops()
+        for start in range(0, len(rows), batch_size):
+            yield np.ascontiguousarray(crops[np.asarray(rows[start:start + batch_size], dtype=np.int64)])
@@ -0,0 +1,320 @@
+import math
+import os
+import queue
+import struct
+import threading
+import time
+
+import cv2
+
+# Facteur de réduction -> option de décodage réduit d'OpenCV (réduction faite par l'IDCT du JPEG)
+REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Taille minimale (en pixels de l'image décodée) d'un visage aligné sans perte de résolution
+MIN_ALIGN_SIZE = 112
+
+# Nombre d'images décodées d'avance par défaut lors du tri
+PREFETCH_DEPTH = 2
+
+# Marqueurs JPEG SOFn portant les dimensions de l'image (C4, C8 et CC n'en sont pas)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _jpeg_segments(f):
+    """
+    Parcourt les segments d'en-tête d'un JPEG ouvert (positionné après le marqueur SOI).
+
+    :return: Générateur de tuples (code du marqueur, longueur des données) ; le fichier est
+        positionné au début des données du segment, qui peuvent être lues ou ignorées.
+    """
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":  # Octets de remplissage
+            marker = f.read(1)
+        if not marker:
+            return
+        code = marker[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD9:  # Marqueurs sans longueur
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2 or code == 0xDA:  # Début des données compressées
+            return
+        length = struct.unpack(">H", length_bytes)[0] - 2
+        start = f.tell()
+        yield code, length
+        f.seek(start + length)
+
+
+def read_image_header(path):
+    """
+    Lit le format et les dimensions d'une image JPEG ou PNG sans la décoder.
+
+    Seuls les en-têtes sont lus (les segments JPEG, EXIF compris, sont sautés).
+
+    :param path: Chemin du fichier image.
+    :return: (str, int, int): Format ("jpeg" ou "png"), largeur et hauteur, ou None si inconnu.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(24)
+            if head.startswith(_PNG_SIGNATURE) and head[12:16] == b"IHDR":
+                width, height = struct.unpack(">II", head[16:24])
+                return "png", width, height
+            if not head.startswith(b"\xff\xd8"):
+                return None
+
+            f.seek(2)
+            for code, _length in _jpeg_segments(f):
+                if code in _SOF_MARKERS:
+                    segment = f.read(5)
+                    if len(segment) < 5:
+                        return None
+                    height, width = struct.unpack(">HH", segment[1:5])
+                    return "jpeg", width, height
+    except OSError:
+        pass
+    return None
+
+
+def _exif_datetime(tiff):
+    """Extrait DateTimeOriginal (à défaut DateTime) d'un bloc TIFF EXIF, sous forme de date POSIX."""
+    order = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if order is None:
+        return None
+
+    def entries(offset):
+        count = struct.unpack_from(order + "H", tiff, offset)[0]
+        for i in range(count):
+            tag, kind, n, value = struct.unpack_from(order + "HHII", tiff, offset + 2 + 12 * i)
+            yield tag, kind, n, value
+
+    def ascii_value(n, value):
+        raw = tiff[value:value + n] if n > 4 else struct.pack(order + "I", value)[:n]
+        return raw.split(b"\0")[0].decode("ascii")
+
+    ifd0 = dict((tag, (n, value)) for tag, _, n, value in entries(struct.unpack_from(order + "I", tiff, 4)[0]))
+    candidates = []
+    if 0x8769 in ifd0:  # Sous-répertoire EXIF
+        exif = dict((tag, (n, value)) for tag, _, n, value in entries(ifd0[0x8769][1]))
+        if 0x9003 in exif:
+            candidates.append(exif[0x9003])
+    if 0x0132 in ifd0:
+        candidates.append(ifd0[0x0132])
+    for n, value in candidates:
+        try:
+            return time.mktime(time.strptime(ascii_value(n, value), "%Y:%m:%d %H:%M:%S"))
+        except (ValueError, UnicodeDecodeError, OverflowError):
+            continue
+    return None
+
+
+def read_capture_time(path):
+    """
+    Lit la date de prise de vue EXIF d'un JPEG (DateTimeOriginal, à défaut DateTime).
+
+    :param path: Chemin du fichier image.
+    :return: float: Date POSIX (heure locale de l'appareil), ou None si absente ou illisible.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(2) != b"\xff\xd8":
+                return None
+            for code, length in _jpeg_segments(f):
+                if code == 0xE1:
+                    data = f.read(length)
+                    if data.startswith(b"Exif\0\0"):
+                        return _exif_datetime(data[6:])
+                elif code in _SOF_MARKERS:
+                    return None  # L'EXIF précède toujours les données de l'image
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def capture_time(path):
+    """
+    :param path: Chemin du fichier image.
+    :return: float: Date de prise de vue EXIF, ou date de modification du fichier à défaut.
+    """
+    taken = read_capture_time(path)
+    return taken if taken is not None else os.path.getmtime(path)
+
+
+def reduction_factor(width, height, max_side, max_pixels=None):
+    """
+    Choisit la plus forte réduction (1, 2, 4 ou 8) qui garde au moins `max_side` pixels sur le grand côté.
+
+    :param width: Largeur de l'image.
+    :param height: Hauteur de l'image.
+    :param max_side: Taille visée du grand côté pour la détection ; None pour ne jamais réduire.
+    :param max_pixels: Nombre maximal de pixels de l'image décodée (budget mémoire), prioritaire
+        sur `max_side` ; None pour ne pas limiter.
+    :return: int: Facteur de réduction.
+    """
+    factor = 1
+    if max_side:
+        while factor < 8 and max(width, height) // (factor * 2) >= max_side:
+            factor *= 2
+    if max_pixels:
+        while factor < 8 and (width // factor) * (height // factor) > max_pixels:
+            factor *= 2
+    return factor
+
+
+class DecodedImage:
+    """
+    Image décodée à résolution réduite pour la détection, la pleine résolution n'étant décodée qu'au besoin.
+
+    Les détections sont exprimées en coordonnées de l'image réduite (`image`) ;
+    `align_into` les aligne depuis l'image réduite si les visages y sont assez grands,
+    et ne décode sinon l'image complète qu'à ce moment-là.
+    """
+
+    __slots__ = ("path", "image", "scale", "_full")
+
+    def __init__(self, path, image, scale=1):
+        """
+        :param path: Chemin du fichier (pour le décodage complet différé).
+        :param image: Image BGR décodée, éventuellement réduite.
+        :param scale: Facteur de réduction appliqué au décodage.
+        """
+        self.path = path
+        self.image = image
+        self.scale = scale
+        self._full = image if scale == 1 else None
+
+    @classmethod
+    def read(cls, path, max_side=None, max_pixels=None):
+        """
+        Décode une image en choisissant la réduction d'après ses dimensions d'en-tête.
+
+        Seuls les JPEG sont réduits au décodage : pour les autres formats, OpenCV décoderait
+        l'image complète avant de la redimensionner, sans aucun gain.
+
+        :param path: Chemin du fichier image.
+        :param max_side: Taille minimale du grand côté de l'image décodée ; None pour la pleine résolution.
+        :param max_pixels: Nombre maximal de pixels de l'image décodée (budget mémoire) ; au-delà
+            de la réduction au décodage, l'image est redimensionnée.
+        :return: DecodedImage, ou None si l'image est illisible.
+        """
+        header = read_image_header(path)
+        scale = 1
+        if header is not None and header[0] == "jpeg":
+            scale = reduction_factor(header[1], header[2], max_side, max_pixels)
+        image = cv2.imread(path, REDUCED_FLAGS[scale])
+        if image is None:
+            return None
+        height, width = image.shape[:2]
+        if max_pixels and width * height > max_pixels:
+            ratio = math.sqrt(max_pixels / (width * height))
+            size = (max(1, int(width * ratio)), max(1, int(height * ratio)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            scale *= width / size[0]
+        return cls(path, image, scale)
+
+    def full(self):
+        """Retourne l'image en pleine résolution (décodée au premier appel)."""
+        if self._full is None:
+            self._full = cv2.imread(self.path)
+        return self._full
+
+    def to_full_coordinates(self, faces):
+        """
+        :param faces: Détections YuNet (F, 15) dans l'image réduite.
+        :return: Détections dans l'image en pleine résolution (le score est inchangé).
+        """
+        if self.scale == 1:
+            return faces
+        scaled = faces.copy()
+        scaled[:, :14] *= self.scale
+        return scaled
+
+    def align_into(self, batch, faces):
+        """
+        Aligne les visages détectés à la suite d'un CropBatch.
+
+        :param batch: CropBatch recevant les visages alignés.
+        :param faces: Détections YuNet (F, 15) dans l'image réduite.
+        :return: int: Nombre de visages ajoutés.
+        """
+        if self.scale == 1 or faces[:, 2:4].min() >= MIN_ALIGN_SIZE:
+            return batch.add(self.image, faces)
+        # Au moins un visage est trop petit à cette échelle : alignement depuis l'image complète
+        full = self.full()
+        if full is None:
+            return batch.add(self.image, faces)
+        return batch.add(full, self.to_full_coordinates(faces))
+
+
+def prefetch_images(paths, read, depth=PREFETCH_DEPTH, governor=None):
+    """
+    Décode des images d'avance dans un thread, pendant le traitement des précédentes.
+
+    Au plus `depth` images attendent d'être traitées ; avec un MemoryGovernor, leurs octets sont
+    aussi comptés dans la part du budget réservée au préchargement. La place d'une image est
+    libérée quand l'image suivante est demandée.
+
+    :param paths: Chemins des images, dans l'ordre de traitement.
+    :param read: Fonction de décodage (chemin -> DecodedImage ou None).
+    :param depth: Nombre maximal d'images décodées en attente.
+    :param governor: MemoryGovernor du traitement (optionnel).
+    :return: Générateur de tuples (chemin, DecodedImage ou None), dans l'ordre de `paths`.
+    """
+    pending = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for path in paths:
+                img = read(path)
+                nbytes = img.image.nbytes if img is not None else 0
+                if governor is not None and not governor.acquire_prefetch(nbytes):
+                    return
+                if not put((path, img, nbytes)):
+                    return
+        except Exception as e:  # Transmise au traitement
+            put(e)
+            return
+        put(done)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    previous = 0
+    try:
+        while True:
+            item = pending.get()
+            if governor is not None and previous:
+                governor.release_prefetch(previous)
+                previous = 0
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            path, img, previous = item
+            yield path, img
+    finally:
+        stop.set()
+        if governor is not None:
+            governor.close()
+        thread.join()
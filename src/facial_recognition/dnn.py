@@ -0,0 +1,16 @@
+# Backends et cibles DNN d'OpenCV proposés par la ligne de commande et l'interface.
+# Valeurs des énumérations cv2.dnn.Backend / cv2.dnn.Target (identiques en OpenCV 4 et 5),
+# reprises ici pour ne pas importer OpenCV avant d'en avoir besoin
+DNN_BACKENDS = {
+    "default": 0,  # cv2.dnn.DNN_BACKEND_DEFAULT
+    "opencv": 3,  # cv2.dnn.DNN_BACKEND_OPENCV
+    "openvino": 2,  # cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE
+    "cuda": 5,  # cv2.dnn.DNN_BACKEND_CUDA
+}
+DNN_TARGETS = {
+    "cpu": 0,  # cv2.dnn.DNN_TARGET_CPU
+    "opencl": 1,  # cv2.dnn.DNN_TARGET_OPENCL
+    "opencl_fp16": 2,  # cv2.dnn.DNN_TARGET_OPENCL_FP16
+    "cuda": 6,  # cv2.dnn.DNN_TARGET_CUDA
+    "cuda_fp16": 7,  # cv2.dnn.DNN_TARGET_CUDA_FP16
+}
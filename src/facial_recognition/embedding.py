@@ -0,0 +1,122 @@
+import importlib
+
+import numpy as np
+
+
+def _optional_import(name):
+    """
+    Importe une dépendance optionnelle au premier usage (chargement des modèles) plutôt
+    qu'à l'import du package : ONNX Runtime et `onnx` coûtent à eux seuls plus que le reste.
+
+    :return: Module, ou None s'il n'est pas installé.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+class SFaceOnnxEngine:
+    """
+    Calcule les signatures SFace par lots avec ONNX Runtime (CPU).
+
+    Le prétraitement reproduit celui de `cv2.FaceRecognizerSF.feature`
+    (`blobFromImage` avec inversion BGR -> RGB, sans normalisation ni moyenne),
+    les signatures obtenues sont donc équivalentes à celles d'OpenCV.
+    """
+
+    def __init__(self, model_path, batch_size=32, num_threads=None):
+        """
+        :param model_path: Chemin du modèle ONNX SFace.
+        :param batch_size: Nombre maximal de visages par inférence.
+        :param num_threads: Threads intra-opération d'ONNX Runtime (None = automatique).
+        """
+        ort = _optional_import("onnxruntime")
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.batch_size = max(1, batch_size)
+        self.session = ort.InferenceSession(
+            self._dynamic_batch_model(model_path), sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+        # Certains exports figent des dimensions internes à 1 : on le vérifie une fois
+        if not self._supports_batches():
+            self.batch_size = 1
+
+    @staticmethod
+    def _dynamic_batch_model(model_path):
+        """
+        Rend la dimension de lot du modèle dynamique lorsque le paquet `onnx` est disponible.
+
+        :return: Chemin du modèle ou modèle sérialisé (bytes) accepté par InferenceSession.
+        """
+        onnx = _optional_import("onnx")
+        if onnx is None:
+            return model_path
+        model = onnx.load(model_path)
+        for value in list(model.graph.input) + list(model.graph.output):
+            dims = value.type.tensor_type.shape.dim
+            if dims:
+                dims[0].dim_param = "N"
+        return model.SerializeToString()
+
+    def _supports_batches(self):
+        """Vérifie que le modèle accepte un lot de plusieurs visages."""
+        try:
+            out = self.session.run(None, {self.input_name: np.zeros((2, 3, 112, 112), dtype=np.float32)})[0]
+        except Exception:
+            return False
+        return out.shape[0] == 2
+
+    @staticmethod
+    def preprocess(crops):
+        """
+        Convertit des visages alignés en tenseur d'entrée SFace.
+
+        :param crops: Tableau (N, 112, 112, 3) uint8 en BGR, ou liste de visages alignés.
+        :return: Tableau (N, 3, 112, 112) float32 en RGB.
+        """
+        crops = np.asarray(crops)
+        return np.ascontiguousarray(crops[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32)
+
+    def embed(self, crops):
+        """
+        Calcule les signatures d'un ensemble de visages alignés, par lots de `batch_size`.
+
+        :param crops: Tableau (N, 112, 112, 3) uint8 en BGR, ou liste de visages alignés.
+        :return: Tableau (N, 128) float32 des signatures (non normalisées, comme OpenCV).
+        """
+        crops = np.asarray(crops)
+        if len(crops) == 0:
+            return np.empty((0, 128), dtype=np.float32)
+
+        outputs = []
+        for start in range(0, len(crops), self.batch_size):
+            blob = self.preprocess(crops[start:start + self.batch_size])
+            out = self.session.run(None, {self.input_name: blob})[0]
+            outputs.append(out.reshape(len(blob), -1))
+        return np.concatenate(outputs).astype(np.float32, copy=False)
+
+
+def create_embedding_engine(model_path, engine="auto", batch_size=32, num_threads=None):
+    """
+    Instancie le moteur d'encodage par lots demandé.
+
+    :param model_path: Chemin du modèle ONNX SFace.
+    :param engine: "auto" (ONNX Runtime si installé), "onnxruntime" ou "opencv".
+    :param batch_size: Nombre maximal de visages par inférence.
+    :param num_threads: Threads intra-opération (None = automatique).
+    :return: SFaceOnnxEngine, ou None pour utiliser `FaceRecognizerSF.feature` visage par visage.
+    """
+    # Dépendance optionnelle : repli sur FaceRecognizerSF.feature
+    if engine == "opencv" or _optional_import("onnxruntime") is None:
+        return None
+    try:
+        return SFaceOnnxEngine(model_path, batch_size=batch_size, num_threads=num_threads)
+    except Exception as e:
+        print(f"Moteur ONNX Runtime indisponible, repli sur OpenCV : {e}")
+        return None
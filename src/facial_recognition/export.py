@@ -0,0 +1,124 @@
+import csv
+import gzip
+import io
+import json
+
+# Points de repère YuNet, dans l'ordre des colonnes 4 à 13 d'une détection
+LANDMARKS = ("right_eye", "left_eye", "nose", "right_mouth", "left_mouth")
+
+CSV_COLUMNS = (
+    ["file", "path", "status", "face", "x", "y", "w", "h"]
+    + [f"{point}_{axis}" for point in LANDMARKS for axis in ("x", "y")]
+    + ["detection_score", "identity", "score"]
+)
+
+# Statuts d'une image exportée
+OK, NO_FACE, UNREADABLE = "ok", "no_face", "unreadable"
+
+
+class ResultsExporter:
+    """
+    Export en continu des résultats d'un tri, au format JSON Lines ou CSV, éventuellement compressé (gzip).
+
+    Chaque image est écrite dès qu'elle est identifiée, puis oubliée : rien n'est gardé en
+    mémoire en dehors du tampon d'écriture. JSON Lines : une ligne par image, ses visages
+    imbriqués. CSV : une ligne par visage (une ligne aux colonnes de visage vides pour une
+    image sans visage). Le format et la compression se déduisent de l'extension
+    (`.jsonl`, `.csv`, suivie ou non de `.gz`).
+    """
+
+    def __init__(self, path, fmt=None, compress=None, buffer_size=1 << 16, compresslevel=6):
+        """
+        :param path: Fichier d'export (remplacé s'il existe).
+        :param fmt: "jsonl" ou "csv" (None = d'après l'extension, JSON Lines par défaut).
+        :param compress: Compression gzip (None = si l'extension est `.gz`).
+        :param buffer_size: Taille du tampon d'écriture, en octets.
+        :param compresslevel: Niveau de compression gzip (6 : bon compromis taille / temps processeur).
+        """
+        name = path.lower()
+        if compress is None:
+            compress = name.endswith(".gz")
+        if name.endswith(".gz"):
+            name = name[:-3]
+        if fmt is None:
+            fmt = "csv" if name.endswith(".csv") else "jsonl"
+        if fmt not in ("jsonl", "csv"):
+            raise ValueError(f"Format d'export inconnu : {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.images = 0
+        self.faces = 0
+
+        raw = open(path, "wb", buffering=buffer_size)
+        if compress:
+            # L'objet gzip écrit dans le fichier tamponné, qu'il ferme avec lui
+            binary = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=compresslevel)
+            self._raw = raw
+        else:
+            binary, self._raw = raw, None
+        self._stream = io.TextIOWrapper(binary, encoding="utf-8", newline="", write_through=False)
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.writer(self._stream)
+            self._csv.writerow(CSV_COLUMNS)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_image(self, filename, path, faces=(), status=OK):
+        """
+        Écrit les résultats d'une image.
+
+        :param filename: Nom d'origine du fichier.
+        :param path: Chemin final (après un éventuel renommage).
+        :param faces: Séquence de tuples (détection YuNet en pleine résolution, identité, score).
+        :param status: OK, NO_FACE ou UNREADABLE.
+        """
+        self.images += 1
+        self.faces += len(faces)
+        if self._csv is not None:
+            if not faces:
+                self._csv.writerow([filename, path, status] + [""] * (len(CSV_COLUMNS) - 3))
+            for index, (face, identity, score) in enumerate(faces):
+                self._csv.writerow(
+                    [filename, path, status, index]
+                    + [round(float(v), 2) for v in face[:14]]
+                    + [round(float(face[14]), 4), identity, round(float(score), 4)]
+                )
+            return
+        record = {
+            "file": filename,
+            "path": path,
+            "status": status,
+            "faces": [
+                {
+                    "box": [round(float(v), 2) for v in face[:4]],
+                    "landmarks": {
+                        point: [round(float(face[4 + 2 * i]), 2), round(float(face[5 + 2 * i]), 2)]
+                        for i, point in enumerate(LANDMARKS)
+                    },
+                    "detection_score": round(float(face[14]), 4),
+                    "identity": identity,
+                    "score": round(float(score), 4),
+                }
+                for face, identity, score in faces
+            ],
+        }
+        self._stream.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        self._stream.write("\n")
+
+    def report(self):
+        """Résumé lisible de l'export."""
+        return f"Export : {self.images} images, {self.faces} visages écrits dans {self.path}."
+
+    def close(self):
+        """Vide le tampon et ferme le fichier (et le flux gzip)."""
+        if self._stream is None:
+            return
+        self._stream.close()
+        if self._raw is not None:
+            self._raw.close()
+        self._stream = None
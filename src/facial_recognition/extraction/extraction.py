@@ -1,42 +1,41 @@
 import fitz  # PyMuPDF
+import hashlib
+import json
 import os
 import re
 
+import cv2
+import numpy as np
+
+# LISTE NOIRE : Mots à ignorer absolument
+# J'ai ajouté DIP, ING, et d'autres termes techniques courants dans ce type de document
+MOTS_INTERDITS = {
+    "CONTACTER", "L'ÉTUDIANT", "ETUDIANT", "SYNAPSES",
+    "DIP", "ING", "DIPLÔME", "NIVEAU", "PROMO",
+    "1ÈRE", "LÈRE", "ANNÉE", "2027", "2024", "2025"
+}
+
+# Manifeste des extractions précédentes, stocké à la racine du dossier de sortie
+NOM_MANIFESTE = "manifeste_extraction.json"
+
 def nettoyer_texte_dossier(texte):
     """Nettoie le texte pour qu'il soit un nom de dossier valide."""
     # Enlève les caractères interdits
     texte = texte.replace("\n", " ").strip()
     return re.sub(r'[<>:"/\\|?*]', '', texte)
 
-def extraire_photos_clean(pdf_path, output_folder):
-    # Création du dossier racine
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-        print(f"Dossier racine '{output_folder}' créé.")
-
-    try:
-        doc = fitz.open(pdf_path)
-    except Exception as e:
-        print(f"Erreur d'ouverture du fichier : {e}")
-        return
-
-    print(f"Traitement du fichier : {pdf_path}")
-    
-    # LISTE NOIRE : Mots à ignorer absolument
-    # J'ai ajouté DIP, ING, et d'autres termes techniques courants dans ce type de document
-    mots_interdits = {
-        "CONTACTER", "L'ÉTUDIANT", "ETUDIANT", "SYNAPSES", 
-        "DIP", "ING", "DIPLÔME", "NIVEAU", "PROMO", 
-        "1ÈRE", "LÈRE", "ANNÉE", "2027", "2024", "2025"
-    }
-
-    compteur_succes = 0
+def identifier_etudiants(doc):
+    """
+    Associe chaque photo du trombinoscope au nom écrit à sa droite.
 
+    :param doc: Document PyMuPDF ouvert.
+    :return: Générateur de tuples (numéro de page, xref de l'image, nom du dossier).
+    """
     for i, page in enumerate(doc):
         # 1. Récupération des images
         image_list = page.get_images(full=True)
         images_data = []
-        
+
         for img in image_list:
             xref = img[0]
             rects = page.get_image_rects(xref)
@@ -54,31 +53,31 @@ def extraire_photos_clean(pdf_path, output_folder):
         for img_info in images_data:
             img_rect = img_info['rect']
             img_y_center = (img_rect.y0 + img_rect.y1) / 2
-            img_x_max = img_rect.x1 
-            
+            img_x_max = img_rect.x1
+
             # Récupérer les mots sur la même ligne, à droite de la photo
             mots_candidats = []
             for w in words:
                 w_y_center = (w[1] + w[3]) / 2
                 w_x_min = w[0]
                 text = w[4]
-                
+
                 # Alignement vertical (tolérance +/- 10px) et position à droite
                 if abs(w_y_center - img_y_center) < 15 and w_x_min > img_x_max:
                     # FILTRAGE : On vérifie si le mot est dans la liste noire (en majuscule)
-                    if text.upper() not in mots_interdits and len(text) > 1:
+                    if text.upper() not in MOTS_INTERDITS and len(text) > 1:
                         mots_candidats.append({'text': text, 'x': w_x_min})
 
             # Tri des mots de gauche à droite
             mots_candidats.sort(key=lambda x: x['x'])
-            
+
             # 3. Identification Nom / Prénom
             # On s'attend à trouver : [Parties du Nom] [Parties du Prénom]
             # Le reste (DIP ING) a normalement été filtré par la liste noire.
-            
+
             parties_nom = []
             parties_prenom = []
-            
+
             for item in mots_candidats:
                 mot = item['text']
                 # Heuristique : Si TOUT MAJUSCULE -> Partie du NOM
@@ -92,7 +91,7 @@ def extraire_photos_clean(pdf_path, output_folder):
             if parties_nom or parties_prenom:
                 nom_final = " ".join(parties_nom)
                 prenom_final = " ".join(parties_prenom)
-                
+
                 # Format demandé : Prénom_Nom
                 # Si le prénom est vide, on met juste le nom et inversement
                 if prenom_final and nom_final:
@@ -106,30 +105,245 @@ def extraire_photos_clean(pdf_path, output_folder):
                 nom_dossier = f"Inconnu_Page{i+1}_{int(img_y_center)}"
 
             # Nettoyage final du nom de dossier
-            nom_dossier = nettoyer_texte_dossier(nom_dossier)
-
-            # 4. Sauvegarde
-            chemin_sous_dossier = os.path.join(output_folder, nom_dossier)
-            if not os.path.exists(chemin_sous_dossier):
-                os.makedirs(chemin_sous_dossier)
-            
-            # Extraction image
-            pix = fitz.Pixmap(doc, img_info['xref'])
-            # Conversion RGB si nécessaire
-            if pix.n - pix.alpha < 3:
-                pix = fitz.Pixmap(doc, img_info['xref'])
-            else:
-                pix0 = fitz.Pixmap(fitz.csRGB, pix)
-                pix = pix0
-            
-            nom_fichier_img = f"{nom_dossier}.png"
-            pix.save(os.path.join(chemin_sous_dossier, nom_fichier_img))
-            print(f"  -> Sauvegardé : {nom_dossier}")
-            
-            pix = None
-            compteur_succes += 1
-
-    print(f"\nTerminé ! {compteur_succes} étudiants traités.")
+            yield i, img_info['xref'], nettoyer_texte_dossier(nom_dossier)
+
+def extraire_pixmap(doc, xref):
+    """Décode l'image d'un xref en Pixmap, convertie en RGB si nécessaire."""
+    pix = fitz.Pixmap(doc, xref)
+    # Conversion RGB si nécessaire (les niveaux de gris sont conservés)
+    if pix.n - pix.alpha >= 3 and pix.colorspace.name != fitz.csRGB.name:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return pix
+
+def pixmap_vers_tableau(pix):
+    """
+    Convertit un Pixmap en image BGR exploitable par OpenCV, sans ré-encodage.
+
+    Les échantillons du Pixmap sont lus via une vue NumPy sur son tampon
+    (`samples_mv`) ; la seule copie effectuée est la permutation des canaux
+    vers l'ordre BGR attendu par YuNet et SFace. Le tableau renvoyé ne dépend
+    donc plus du Pixmap, qui peut être libéré immédiatement.
+
+    :param pix: Pixmap PyMuPDF (niveaux de gris ou RGB, avec ou sans alpha).
+    :return: Tableau NumPy (h, w, 3) en uint8, ordre BGR.
+    """
+    vue = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+    vue = vue.reshape(pix.h, pix.stride)[:, :pix.w * pix.n].reshape(pix.h, pix.w, pix.n)
+
+    couleurs = pix.n - pix.alpha
+    if couleurs == 1:
+        return cv2.cvtColor(vue[:, :, 0], cv2.COLOR_GRAY2BGR)
+    if pix.alpha:
+        return cv2.cvtColor(vue, cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(vue, cv2.COLOR_RGB2BGR)
+
+def empreinte_fichier(chemin):
+    """Calcule l'empreinte SHA-256 d'un fichier par blocs."""
+    h = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+def charger_manifeste(output_folder):
+    """Charge le manifeste d'extraction du dossier de sortie (vide s'il n'existe pas)."""
+    chemin = os.path.join(output_folder, NOM_MANIFESTE)
+    if not os.path.exists(chemin):
+        return {}
+    try:
+        with open(chemin, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def sauver_manifeste(output_folder, manifeste):
+    """Écrit le manifeste d'extraction de façon atomique."""
+    chemin = os.path.join(output_folder, NOM_MANIFESTE)
+    with open(chemin + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifeste, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(chemin + ".tmp", chemin)
+
+def solder_en_attente(output_folder, encodes=(), retires=()):
+    """
+    Retire du manifeste les étudiants dont la base de signatures est désormais à jour.
+
+    :param output_folder: Dossier racine des visages connus.
+    :param encodes: Noms encodés avec succès.
+    :param retires: Noms retirés de la base.
+    """
+    manifeste = charger_manifeste(output_folder)
+    if not manifeste:
+        return
+    manifeste["a_encoder"] = sorted(set(manifeste.get("a_encoder", [])) - set(encodes))
+    manifeste["a_retirer"] = sorted(set(manifeste.get("a_retirer", [])) - set(retires))
+    sauver_manifeste(output_folder, manifeste)
+
+def extraire_photos_clean(pdf_path, output_folder, forcer=False):
+    """
+    Extrait les photos du trombinoscope dans `output_folder/<nom>/<nom>.png`.
+
+    L'extraction est incrémentale : un manifeste (empreinte du PDF, page et
+    empreinte du flux brut de chaque image -> fichier de sortie) permet de ne
+    réécrire que les images nouvelles ou modifiées. Les étudiants absents du PDF
+    sont signalés mais leurs dossiers sont conservés.
+
+    Le manifeste garde aussi la liste des étudiants à encoder (ajoutés ou modifiés)
+    et à retirer de la base de signatures, jusqu'à ce que `mettre_a_jour_galerie`
+    les solde : un apprentissage échoué ou interrompu est repris au lancement suivant.
+
+    :param pdf_path: Chemin du trombinoscope PDF.
+    :param output_folder: Dossier racine des visages connus.
+    :param forcer: Ignore le manifeste et ré-extrait toutes les images.
+    :return: dict: Noms 'ajoutes', 'modifies', 'inchanges' et 'supprimes', et noms en attente
+        'a_encoder' et 'a_retirer' (voir ci-dessus), ou None en cas d'erreur.
+    """
+    # Création du dossier racine
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+        print(f"Dossier racine '{output_folder}' créé.")
+
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        print(f"Erreur d'ouverture du fichier : {e}")
+        return None
+
+    with doc:
+        return _extraire_photos(doc, pdf_path, output_folder, forcer)
+
+def _extraire_photos(doc, pdf_path, output_folder, forcer):
+    """Corps de `extraire_photos_clean`, sur le document ouvert (fermé par l'appelant)."""
+    print(f"Traitement du fichier : {pdf_path}")
+
+    precedent = charger_manifeste(output_folder)
+    manifeste = {} if forcer else precedent
+    anciennes = manifeste.get("images", {})
+    pdf_hash = empreinte_fichier(pdf_path)
+    rapport = {"ajoutes": [], "modifies": [], "inchanges": [], "supprimes": [],
+               "a_encoder": sorted(precedent.get("a_encoder", [])),
+               "a_retirer": sorted(precedent.get("a_retirer", []))}
+
+    # PDF identique et sorties intactes : rien à ré-extraire
+    if manifeste.get("pdf_sha256") == pdf_hash and all(
+        os.path.exists(os.path.join(output_folder, e["fichier"])) for e in anciennes.values()
+    ):
+        rapport["inchanges"] = sorted(anciennes)
+        print(f"\nPDF inchangé, {len(anciennes)} étudiants déjà extraits.")
+        if rapport["a_encoder"] or rapport["a_retirer"]:
+            print(f"Base de signatures en retard : {len(rapport['a_encoder'])} à encoder, "
+                  f"{len(rapport['a_retirer'])} à retirer.")
+        return rapport
+
+    nouvelles = {}
+
+    for page, xref, nom_dossier in identifier_etudiants(doc):
+        # Empreinte du flux compressé : aucun décodage nécessaire pour comparer
+        digest = hashlib.sha256(doc.xref_stream_raw(xref)).hexdigest()
+        nom_fichier_img = f"{nom_dossier}.png"
+        fichier = os.path.join(nom_dossier, nom_fichier_img)
+        nouvelles[nom_dossier] = {"page": page, "xref": xref, "digest": digest, "fichier": fichier}
+
+        ancienne = anciennes.get(nom_dossier)
+        if ancienne and ancienne["digest"] == digest and os.path.exists(os.path.join(output_folder, fichier)):
+            rapport["inchanges"].append(nom_dossier)
+            continue
+
+        # 4. Sauvegarde
+        chemin_sous_dossier = os.path.join(output_folder, nom_dossier)
+        if not os.path.exists(chemin_sous_dossier):
+            os.makedirs(chemin_sous_dossier)
+
+        # Extraction image
+        pix = extraire_pixmap(doc, xref)
+        pix.save(os.path.join(chemin_sous_dossier, nom_fichier_img))
+        print(f"  -> Sauvegardé : {nom_dossier}")
+        pix = None
+
+        rapport["ajoutes" if ancienne is None else "modifies"].append(nom_dossier)
+
+    rapport["supprimes"] = sorted(set(anciennes) - set(nouvelles))
+    for nom_dossier in rapport["supprimes"]:
+        print(f"  -> Absent du PDF (dossier conservé) : {nom_dossier}")
+
+    # Attentes des lancements précédents, complétées par celui-ci
+    rapport["a_encoder"] = sorted(
+        (set(rapport["a_encoder"]) & set(nouvelles)) | set(rapport["ajoutes"]) | set(rapport["modifies"])
+    )
+    rapport["a_retirer"] = sorted((set(rapport["a_retirer"]) | set(rapport["supprimes"])) - set(nouvelles))
+    sauver_manifeste(output_folder, {"pdf_sha256": pdf_hash, "images": nouvelles,
+                                     "a_encoder": rapport["a_encoder"], "a_retirer": rapport["a_retirer"]})
+
+    print(f"\nTerminé ! {len(rapport['ajoutes'])} ajoutés, {len(rapport['modifies'])} modifiés, "
+          f"{len(rapport['inchanges'])} inchangés, {len(rapport['supprimes'])} absents.")
+    return rapport
+
+def mettre_a_jour_galerie(pdf_path, output_folder, manager, progress_callback=None):
+    """
+    Extraction incrémentale suivie d'un ré-encodage limité aux identités touchées.
+
+    Les étudiants absents du PDF sont retirés de la base de signatures. Les attentes
+    du manifeste ne sont soldées qu'une fois la base à jour : après un apprentissage
+    échoué ou interrompu, les mêmes identités sont réencodées au lancement suivant.
+
+    :param pdf_path: Chemin du trombinoscope PDF.
+    :param output_folder: Dossier racine des visages connus.
+    :param manager: Instance de FaceRecognizerManager utilisée pour l'encodage.
+    :param progress_callback: Fonction de rappel pour le suivi de la progression.
+    :return: dict: Rapport d'extraction (voir `extraire_photos_clean`), ou None en cas d'erreur
+        d'extraction ou d'apprentissage.
+    """
+    rapport = extraire_photos_clean(pdf_path, output_folder)
+    if rapport is None:
+        return None
+
+    for nom_dossier in rapport["a_retirer"]:
+        if manager.remove_identity(nom_dossier):
+            print(f"  -> Retiré de la base de signatures : {nom_dossier}")
+    solder_en_attente(output_folder, retires=rapport["a_retirer"])
+
+    identites = rapport["a_encoder"]
+    if identites:
+        if not manager.train_faces(output_folder, progress_callback=progress_callback, identities=identites):
+            print(f"Apprentissage échoué : {len(identites)} étudiants seront réencodés au prochain lancement.")
+            return None
+        solder_en_attente(output_folder, encodes=identites)
+    return rapport
+
+def extraire_vers_galerie(pdf_path, manager, output_folder=None, progress_callback=None):
+    """
+    Construit la base de signatures directement depuis le trombinoscope PDF.
+
+    Chaque image intégrée est décodée une seule fois puis transmise en mémoire à
+    `FaceRecognizerManager.train_from_images` : seul le fichier de signatures est
+    écrit. L'export PNG dans `known_faces/<nom>/` reste possible via `output_folder`.
+
+    :param pdf_path: Chemin du trombinoscope PDF.
+    :param manager: Instance de FaceRecognizerManager utilisée pour l'encodage.
+    :param output_folder: Dossier d'export PNG optionnel (None pour ne rien écrire).
+    :param progress_callback: Fonction de rappel pour le suivi de la progression.
+    :return: bool: True si la base de signatures a été générée.
+    """
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        print(f"Erreur d'ouverture du fichier : {e}")
+        return False
+
+    def echantillons():
+        for _, xref, nom_dossier in identifier_etudiants(doc):
+            pix = extraire_pixmap(doc, xref)
+
+            if output_folder:
+                chemin_sous_dossier = os.path.join(output_folder, nom_dossier)
+                if not os.path.exists(chemin_sous_dossier):
+                    os.makedirs(chemin_sous_dossier)
+                pix.save(os.path.join(chemin_sous_dossier, f"{nom_dossier}.png"))
+
+            yield nom_dossier, pixmap_vers_tableau(pix)
+
+    # Les images sont lues au fil de l'encodage : le document reste ouvert jusqu'à la fin
+    with doc:
+        return manager.train_from_images(echantillons(), progress_callback=progress_callback)
 
 # --- Lancement ---
 nom_fichier_pdf = "Promo2026_1A.pdf"
@@ -139,4 +353,4 @@ if __name__ == "__main__":
     if os.path.exists(nom_fichier_pdf):
         extraire_photos_clean(nom_fichier_pdf, dossier_sortie)
     else:
-        print(f"Fichier introuvable : {nom_fichier_pdf}")
\ No newline at end of file
+        print(f"Fichier introuvable : {nom_fichier_pdf}")
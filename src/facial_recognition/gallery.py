@@ -0,0 +1,206 @@
+import os
+import pickle
+
+
+class Gallery:
+    """
+    Instantané immuable de la base de signatures connues.
+
+    Les modifications produisent un nouvel instantané (copie sur écriture) : une
+    identification en cours garde la référence qu'elle a prise au départ et n'est
+    jamais bloquée ni perturbée par une mise à jour concurrente.
+    """
+
+    __slots__ = ("features", "names")
+
+    def __init__(self, features=None, names=None):
+        """
+        :param features: Liste des signatures (tableaux 1x128), à ne pas modifier sur place.
+        :param names: Liste des noms associés, dans le même ordre.
+        """
+        self.features = features if features is not None else []
+        self.names = names if names is not None else []
+
+    def __len__(self):
+        return len(self.names)
+
+    def features_of(self, name):
+        """Retourne les signatures d'une identité (liste vide si elle est inconnue)."""
+        return [f for f, n in zip(self.features, self.names) if n == name]
+
+    def apply(self, operation):
+        """
+        Applique une opération du journal et retourne le nouvel instantané.
+
+        Les opérations sont idempotentes, ce qui permet de rejouer le journal sans
+        risque après une compaction :
+            ("set", nom, signatures) : remplace toutes les signatures de l'identité ;
+            ("remove", nom) : retire l'identité.
+
+        :param operation: Tuple décrivant l'opération.
+        :return: Gallery: Nouvel instantané (self est inchangé).
+        """
+        kind, name = operation[0], operation[1]
+        if kind not in ("set", "remove"):
+            raise ValueError(f"Opération inconnue : {kind}")
+
+        kept = [(f, n) for f, n in zip(self.features, self.names) if n != name]
+        features = [f for f, _ in kept]
+        names = [n for _, n in kept]
+        if kind == "set":
+            features.extend(operation[2])
+            names.extend([name] * len(operation[2]))
+        return Gallery(features, names)
+
+
+def file_signature(path):
+    """Identité d'un fichier sur disque (inode, taille, date de modification), ou None."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class GalleryStore:
+    """
+    Stockage de la base : instantané pickle complet + journal des modifications en ajout seul.
+
+    Ajouter ou retirer une personne n'écrit que quelques octets à la fin du journal
+    (`<fichier>.log`) ; la compaction réécrit l'instantané et repart d'un journal vide.
+    Les processus lecteurs détectent les changements par simple `stat` et ne relisent
+    que la fin du journal. Un seul processus doit écrire dans la base à la fois.
+    """
+
+    def __init__(self, encoding_file, compact_every=64):
+        """
+        :param encoding_file: Chemin du fichier pickle des signatures.
+        :param compact_every: Nombre d'opérations journalisées au-delà duquel la base est compactée.
+        """
+        self.encoding_file = encoding_file
+        self.log_file = encoding_file + ".log"
+        self.compact_every = compact_every
+        self.loaded = False
+        self.log_records = 0
+        self._base_signature = None
+        self._log_inode = None
+        self._log_offset = 0
+
+    def exists(self):
+        """Indique si une base (instantané ou journal) est présente sur disque."""
+        return os.path.exists(self.encoding_file) or os.path.exists(self.log_file)
+
+    def load(self):
+        """
+        Lit l'instantané puis rejoue le journal.
+
+        :return: Gallery: Base à jour.
+        """
+        base_signature = file_signature(self.encoding_file)
+        features, names = [], []
+        if os.path.exists(self.encoding_file):
+            with open(self.encoding_file, 'rb') as f:
+                features, names = pickle.load(f)
+
+        self._base_signature = base_signature
+        self._log_inode = None
+        self._log_offset = 0
+        self.log_records = 0
+        self.loaded = True
+        return self._replay(Gallery(features, names))
+
+    def refresh(self, gallery):
+        """
+        Recharge les modifications faites par un autre processus depuis le dernier appel.
+
+        :param gallery: Instantané courant, issu de `load` ou d'un précédent `refresh`.
+        :return: Gallery mise à jour, ou None si rien n'a changé sur disque.
+        """
+        if file_signature(self.encoding_file) != self._base_signature:
+            return self.load()
+
+        log_signature = file_signature(self.log_file)
+        if log_signature is None:
+            return self.load() if self._log_inode is not None else None
+        inode, size, _ = log_signature
+        if (self._log_inode is not None and inode != self._log_inode) or size < self._log_offset:
+            return self.load()
+        if size == self._log_offset:
+            return None
+        return self._replay(gallery)
+
+    def append(self, operations):
+        """
+        Ajoute des opérations à la fin du journal.
+
+        :param operations: Liste d'opérations (voir `Gallery.apply`).
+        """
+        self._ensure_dir()
+        with open(self.log_file, 'ab') as f:
+            for operation in operations:
+                pickle.dump(operation, f)
+            f.flush()
+            os.fsync(f.fileno())
+            # Nos propres écritures sont déjà appliquées en mémoire : on avance le curseur
+            self._log_inode = os.fstat(f.fileno()).st_ino
+            self._log_offset = f.tell()
+        self.log_records += len(operations)
+        self.loaded = True
+
+    def needs_compaction(self):
+        """Indique si le journal a atteint le seuil de compaction."""
+        return self.log_records >= self.compact_every
+
+    def compact(self, gallery):
+        """
+        Réécrit l'instantané complet puis vide le journal.
+
+        Chaque fichier est remplacé atomiquement ; un lecteur qui lirait le nouvel
+        instantané avec l'ancien journal obtient le même résultat, les opérations
+        étant idempotentes.
+
+        :param gallery: Base à écrire.
+        """
+        self._ensure_dir()
+        self._write_atomic(self.encoding_file, lambda f: pickle.dump((gallery.features, gallery.names), f))
+        self._write_atomic(self.log_file, lambda f: None)
+
+        self._base_signature = file_signature(self.encoding_file)
+        log_signature = file_signature(self.log_file)
+        self._log_inode = log_signature[0] if log_signature else None
+        self._log_offset = 0
+        self.log_records = 0
+        self.loaded = True
+
+    def _replay(self, gallery):
+        """Applique les opérations du journal situées après le curseur de lecture."""
+        if file_signature(self.log_file) is None:
+            return gallery
+
+        with open(self.log_file, 'rb') as f:
+            self._log_inode = os.fstat(f.fileno()).st_ino
+            f.seek(self._log_offset)
+            while True:
+                try:
+                    operation = pickle.load(f)
+                except Exception:
+                    # Fin du journal, ou enregistrement en cours d'écriture : il sera relu plus tard
+                    break
+                gallery = gallery.apply(operation)
+                self._log_offset = f.tell()
+                self.log_records += 1
+        return gallery
+
+    def _ensure_dir(self):
+        save_dir = os.path.dirname(self.encoding_file)
+        if save_dir and not os.path.exists(save_dir):
+            os.makedirs(save_dir)
+
+    @staticmethod
+    def _write_atomic(path, write):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
@@ -1,5 +1,8 @@
 import sys
 import os
+import hashlib
+import threading
+from collections import OrderedDict
 
 # --- Correction pour MACOS / ANACONDA ---
 if sys.platform == 'darwin':
@@ -16,28 +19,167 @@ from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QLineEdit, QFileDialog, QTextEdit,
     QProgressBar, QGroupBox, QStyleFactory, QDoubleSpinBox, QMessageBox,
-    QDialog
+    QDialog, QComboBox, QSpinBox, QListView, QCheckBox, QListWidget, QListWidgetItem
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
-from PyQt6.QtGui import QPixmap
+from PyQt6.QtCore import (
+    Qt, QThread, pyqtSignal, QRunnable, QThreadPool, QTimer, QSize, QObject,
+    QAbstractListModel, QBuffer, QByteArray, QIODevice
+)
+from PyQt6.QtGui import QPixmap, QImage, QImageReader, QColor
 
-# Importation du gestionnaire de reconnaissance
 try:
-    from .manager import FaceRecognizerManager
+    from .dnn import DNN_BACKENDS, DNN_TARGETS
+    from .jobs import DONE, QUEUED, RUNNING, JobScheduler
+    from .results_db import ResultsDatabase
 except ImportError:
-    from manager import FaceRecognizerManager
+    from dnn import DNN_BACKENDS, DNN_TARGETS
+    from jobs import DONE, QUEUED, RUNNING, JobScheduler
+    from results_db import ResultsDatabase
+
+
+def _manager_class():
+    """
+    Importation du gestionnaire de reconnaissance, au premier usage : OpenCV et NumPy
+    ne retardent pas l'affichage de la fenêtre.
+    """
+    try:
+        from .manager import FaceRecognizerManager
+    except ImportError:
+        from manager import FaceRecognizerManager
+    return FaceRecognizerManager
+
+
+class ImageCache:
+    """
+    Cache LRU des images décodées à la taille d'affichage, borné en octets.
+
+    Partagé entre le thread de l'interface et les tâches de préchargement : chaque
+    entrée est un tuple (QImage, complète) où `complète` indique que l'image n'a pas
+    été réduite au décodage.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        """
+        :param max_bytes: Taille maximale cumulée des images en cache, en octets.
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Retourne l'entrée (QImage, complète) et la marque comme récemment utilisée, ou None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, image, complete=False):
+        """Ajoute une image et évince les moins récemment utilisées au-delà de la limite."""
+        size = image.sizeInBytes()
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[0].sizeInBytes()
+            self._entries[key] = (image, complete)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.sizeInBytes()
+
+
+def decode_image(source, bound):
+    """
+    Décode une image directement à la taille d'affichage.
+
+    Le décodeur JPEG réduit l'image à la volée, ce qui évite de décoder puis de
+    réduire une photo de plusieurs mégapixels.
+
+    :param source: Chemin de l'image, ou QIODevice ouvert sur son contenu.
+    :param bound: QSize dans laquelle l'image doit tenir.
+    :return: (QImage, bool): Image décodée (nulle en cas d'erreur) et indicateur de pleine résolution.
+    """
+    reader = QImageReader(source)
+    size = reader.size()
+    complete = True
+    if size.isValid() and (size.width() > bound.width() or size.height() > bound.height()):
+        reader.setScaledSize(size.scaled(bound, Qt.AspectRatioMode.KeepAspectRatio))
+        complete = False
+    return reader.read(), complete
+
+
+def cache_covers(entry, bound):
+    """Indique si une entrée du cache suffit pour afficher l'image dans `bound` sans perte de netteté."""
+    if entry is None:
+        return False
+    image, complete = entry
+    return complete or image.width() >= bound.width() or image.height() >= bound.height()
+
+
+class PrefetchTask(QRunnable):
+    """
+    Décode une image en arrière-plan et la place dans le cache.
+
+    Seules des QImage sont manipulées (les QPixmap ne peuvent être créées que dans
+    le thread de l'interface).
+    """
+
+    def __init__(self, filepath, bound, cache, pending):
+        super().__init__()
+        self.filepath = filepath
+        self.bound = bound
+        self.cache = cache
+        self.pending = pending
+
+    def run(self):
+        try:
+            if not cache_covers(self.cache.get(self.filepath), self.bound):
+                image, complete = decode_image(self.filepath, self.bound)
+                if not image.isNull():
+                    self.cache.put(self.filepath, image, complete)
+        finally:
+            self.pending.discard(self.filepath)
+
 
 class ImageViewerWindow(QDialog):
     """
     Fenêtre de visualisation des images traitées avec navigation.
     """
-    def __init__(self, processed_images, parent=None):
+    # Nombre d'images voisines (avant et après) préchargées en arrière-plan
+    PREFETCH_RADIUS = 1
+    # Délai de regroupement des événements de redimensionnement (ms)
+    RESIZE_DEBOUNCE_MS = 120
+    # Granularité (pixels) de la taille de décodage, pour ne pas redécoder à chaque pixel gagné
+    DECODE_STEP = 256
+
+    def __init__(self, processed_images, parent=None, image_cache=None, start_index=0):
         """
         :param processed_images: Liste de tuples (filepath, [noms reconnus])
+        :param image_cache: ImageCache partagé entre les ouvertures successives (optionnel).
+        :param start_index: Index de la première image affichée.
         """
         super().__init__(parent)
         self.processed_images = processed_images
-        self.current_index = 0
+        self.current_index = start_index
+        self.image_cache = image_cache if image_cache is not None else ImageCache()
+        self._pending = set()  # Chemins en cours de préchargement
+
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(2)
+
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(self.RESIZE_DEBOUNCE_MS)
+        self.resize_timer.timeout.connect(self.show_image)
         
         self.setWindowTitle("Visualisation des Résultats")
         self.resize(1000, 800)
@@ -102,7 +244,7 @@ class ImageViewerWindow(QDialog):
             self.title_label.setText("Aucune image à afficher")
             return
         
-        filepath, recognized_names = self.processed_images[self.current_index]
+        _, recognized_names = self.processed_images[self.current_index]
         
         # Afficher le titre avec les noms reconnus
         if recognized_names and recognized_names[0] != "Inconnu":
@@ -111,21 +253,8 @@ class ImageViewerWindow(QDialog):
         else:
             self.title_label.setText("Aucune personne reconnue")
         
-        # Charger et afficher l'image
-        if os.path.exists(filepath):
-            pixmap = QPixmap(filepath)
-            if pixmap.isNull():
-                self.image_label.setText("Impossible de charger l'image")
-            else:
-                # Redimensionner l'image pour s'adapter au label tout en gardant le ratio
-                scaled_pixmap = pixmap.scaled(
-                    self.image_label.size(),
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                )
-                self.image_label.setPixmap(scaled_pixmap)
-        else:
-            self.image_label.setText("Fichier introuvable")
+        self.show_image()
+        self.prefetch_neighbours()
         
         # Mettre à jour le compteur
         self.counter_label.setText(
@@ -136,6 +265,55 @@ class ImageViewerWindow(QDialog):
         self.btn_prev.setEnabled(self.current_index > 0)
         self.btn_next.setEnabled(self.current_index < len(self.processed_images) - 1)
     
+    def decode_bound(self):
+        """Taille de décodage des images : zone d'affichage arrondie au palier supérieur."""
+        size = self.image_label.size().expandedTo(self.image_label.minimumSize())
+        ratio = self.devicePixelRatioF()
+        step = self.DECODE_STEP
+        return QSize(
+            -(-int(size.width() * ratio) // step) * step,
+            -(-int(size.height() * ratio) // step) * step,
+        )
+
+    def show_image(self):
+        """Affiche l'image courante à partir du cache, en ne la décodant qu'en cas d'absence."""
+        if not self.processed_images:
+            return
+        filepath, _ = self.processed_images[self.current_index]
+        if not os.path.exists(filepath):
+            self.image_label.setText("Fichier introuvable")
+            return
+
+        bound = self.decode_bound()
+        entry = self.image_cache.get(filepath)
+        if not cache_covers(entry, bound):
+            entry = decode_image(filepath, bound)
+            if entry[0].isNull():
+                self.image_label.setText("Impossible de charger l'image")
+                return
+            self.image_cache.put(filepath, *entry)
+
+        # Redimensionner l'image pour s'adapter au label tout en gardant le ratio
+        scaled_pixmap = QPixmap.fromImage(entry[0]).scaled(
+            self.image_label.size(),
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
+        self.image_label.setPixmap(scaled_pixmap)
+
+    def prefetch_neighbours(self):
+        """Précharge en arrière-plan les images voisines de l'image courante."""
+        bound = self.decode_bound()
+        for offset in range(1, self.PREFETCH_RADIUS + 1):
+            for index in (self.current_index + offset, self.current_index - offset):
+                if not 0 <= index < len(self.processed_images):
+                    continue
+                filepath, _ = self.processed_images[index]
+                if filepath in self._pending or cache_covers(self.image_cache.get(filepath), bound):
+                    continue
+                self._pending.add(filepath)
+                self.thread_pool.start(PrefetchTask(filepath, bound, self.image_cache, self._pending))
+
     def show_previous(self):
         """Affiche l'image précédente."""
         if self.current_index > 0:
@@ -149,57 +327,411 @@ class ImageViewerWindow(QDialog):
             self.load_image()
     
     def resizeEvent(self, event):
-        """Redimensionne l'image quand la fenêtre est redimensionnée."""
+        """Redimensionne l'image quand la fenêtre est redimensionnée (une fois le redimensionnement terminé)."""
         super().resizeEvent(event)
-        self.load_image()
+        self.resize_timer.start()
 
-class WorkerThread(QThread):
+    def closeEvent(self, event):
+        """Abandonne les préchargements en attente à la fermeture."""
+        self.resize_timer.stop()
+        self.thread_pool.clear()
+        super().closeEvent(event)
+
+class ThumbnailDiskCache:
     """
-    Gère l'exécution des tâches lourdes en arrière-plan pour éviter de figer l'interface.
+    Miniatures persistantes sur disque, indexées par l'empreinte du contenu de l'image.
+
+    Une image renommée par le tri garde ainsi sa miniature d'une session à l'autre.
     """
-    progress_signal = pyqtSignal(str)
-    """Signal émettant des messages de log (str) vers l'interface utilisateur."""
-    
-    finished_signal = pyqtSignal()
-    """Signal émis lorsque la tâche en arrière-plan est terminée."""
 
-    def __init__(self, task_function, *args, **kwargs):
+    def __init__(self, cache_dir, size=160):
+        """
+        :param cache_dir: Dossier des miniatures.
+        :param size: Côté maximal des miniatures, en pixels.
+        """
+        self.cache_dir = cache_dir
+        self.size = size
+
+    def path_for(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.jpg")
+
+    def load(self, digest):
+        """Retourne la miniature enregistrée (QImage nulle si absente)."""
+        path = self.path_for(digest)
+        return QImage(path) if os.path.exists(path) else QImage()
+
+    def save(self, digest, image):
+        """Enregistre une miniature (écriture puis renommage, jamais de fichier partiel)."""
+        path = self.path_for(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        if image.save(tmp_path, "JPG", 85):
+            os.replace(tmp_path, path)
+
+
+class ThumbnailSignals(QObject):
+    """Signaux des tâches de miniatures (un QRunnable ne peut pas émettre lui-même)."""
+    ready = pyqtSignal(str, QImage)
+
+
+class ThumbnailTask(QRunnable):
+    """
+    Produit la miniature d'une image en arrière-plan : cache disque, ou décodage réduit.
+    """
+
+    def __init__(self, filepath, disk_cache, signals, digest=None):
+        """
+        :param filepath: Chemin de l'image.
+        :param disk_cache: ThumbnailDiskCache.
+        :param signals: ThumbnailSignals recevant le résultat.
+        :param digest: Empreinte du contenu si elle est déjà connue (évite de relire le fichier).
+        """
         super().__init__()
-        self.task_function = task_function
-        self.args = args
-        self.kwargs = kwargs
+        self.filepath = filepath
+        self.disk_cache = disk_cache
+        self.signals = signals
+        self.digest = digest
 
     def run(self):
-        # Injecte signal.emit comme fonction de rappel (callback) pour la logique métier,
-        # permettant à FaceRecognizerManager de communiquer avec l'interface.
-        try:
-            self.task_function(*self.args, **self.kwargs, progress_callback=self.progress_signal.emit)
-        except Exception as e:
-            self.progress_signal.emit(f"[ERREUR CRITIQUE] {str(e)}")
-        finally:
-            self.finished_signal.emit()
+        image = QImage()
+        if self.digest is not None:
+            image = self.disk_cache.load(self.digest)
+
+        if image.isNull():
+            try:
+                with open(self.filepath, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                data = None
+
+            if data is not None:
+                # Même empreinte que la base des résultats (results_db.file_hash)
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+                image = self.disk_cache.load(digest)
+                if image.isNull():
+                    buffer = QBuffer()
+                    buffer.setData(QByteArray(data))
+                    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+                    image, _ = decode_image(buffer, QSize(self.disk_cache.size, self.disk_cache.size))
+                    if not image.isNull():
+                        self.disk_cache.save(digest, image)
+
+        self.signals.ready.emit(self.filepath, image)
+
+
+class ResultsListModel(QAbstractListModel):
+    """
+    Modèle paresseux des images traitées pour la grille de miniatures.
+
+    Les miniatures ne sont produites que lorsque la vue les demande, c'est-à-dire
+    pour les lignes visibles ; les demandes les plus récentes sont servies en premier
+    et celles des lignes sorties de l'écran sont abandonnées. Le filtrage par nom est
+    fait dans le modèle, en une passe, plutôt que ligne à ligne par un modèle proxy.
+    """
+    # Nombre maximal de miniatures en attente avant d'abandonner les plus anciennes demandes
+    MAX_QUEUED = 256
+
+    def __init__(self, images, disk_cache, digests=None, parent=None):
+        """
+        :param images: Liste de tuples (filepath, [noms reconnus]).
+        :param disk_cache: ThumbnailDiskCache.
+        :param digests: Dictionnaire chemin -> empreinte du contenu, si elles sont connues.
+        """
+        super().__init__(parent)
+        self.all_images = images
+        self.images = images  # Images affichées (après filtrage)
+        self.disk_cache = disk_cache
+        self.digests = digests or {}
+        self.memory_cache = ImageCache(max_bytes=64 * 1024 * 1024)
+        self._search_keys = None  # Noms en minuscules, calculés au premier filtrage
+        self._rows = {path: row for row, (path, _) in enumerate(images)}
+        self._pending = set()
+        self._failed = set()
+        self._priority = 0
+
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(max(2, QThread.idealThreadCount() - 1))
+        self.signals = ThumbnailSignals(self)
+        self.signals.ready.connect(self._on_thumbnail_ready)
+
+        self.placeholder = QImage(disk_cache.size, disk_cache.size, QImage.Format.Format_RGB32)
+        self.placeholder.fill(QColor("#ecf0f1"))
+
+    def rowCount(self, parent=None):
+        return 0 if parent is not None and parent.isValid() else len(self.images)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        path, names = self.images[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return os.path.basename(path)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{path}\n{', '.join(names)}"
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.thumbnail(path)
+        return None
+
+    def set_name_filter(self, text):
+        """
+        Restreint les images affichées à celles dont un nom reconnu contient `text`.
+
+        :param text: Texte recherché, sans distinction de casse (vide = toutes les images).
+        """
+        text = text.strip().casefold()
+        if text and self._search_keys is None:
+            self._search_keys = ["\n".join(names).casefold() for _, names in self.all_images]
+
+        self.beginResetModel()
+        if text:
+            self.images = [item for item, key in zip(self.all_images, self._search_keys) if text in key]
+        else:
+            self.images = self.all_images
+        self._rows = {path: row for row, (path, _) in enumerate(self.images)}
+        self.endResetModel()
+
+    def thumbnail(self, path):
+        """Retourne la miniature si elle est prête, sinon la demande et retourne un emplacement vide."""
+        entry = self.memory_cache.get(path)
+        if entry is not None:
+            return entry[0]
+        if path not in self._pending and path not in self._failed:
+            self._request(path)
+        return self.placeholder
+
+    def cancel(self):
+        """Abandonne les miniatures en attente (fermeture de la fenêtre)."""
+        self.thread_pool.clear()
+        self._pending.clear()
+
+    def _request(self, path):
+        if len(self._pending) >= self.MAX_QUEUED:
+            # Défilement rapide : les demandes en attente concernent des lignes déjà sorties
+            # de l'écran. On les abandonne, puis la vue redemande ses lignes visibles.
+            self.cancel()
+            QTimer.singleShot(0, self._refresh_visible)
+        self._pending.add(path)
+        self._priority += 1
+        # Priorité croissante : la dernière ligne demandée est traitée en premier
+        self.thread_pool.start(
+            ThumbnailTask(path, self.disk_cache, self.signals, self.digests.get(path)), self._priority
+        )
+
+    def _refresh_visible(self):
+        if self.images:
+            self.dataChanged.emit(self.index(0), self.index(len(self.images) - 1),
+                                  [Qt.ItemDataRole.DecorationRole])
+
+    def _on_thumbnail_ready(self, path, image):
+        self._pending.discard(path)
+        if image.isNull():
+            self._failed.add(path)
+        else:
+            self.memory_cache.put(path, image, True)
+        row = self._rows.get(path)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+
+class ThumbnailGridWindow(QDialog):
+    """
+    Grille de miniatures des images traitées, filtrable par nom reconnu.
+
+    La vue ne demande que les lignes visibles : la fenêtre reste fluide quel que soit
+    le nombre d'images. Un double-clic ouvre l'image dans la visualisation.
+    """
+    # Délai de regroupement des frappes du filtre (ms)
+    FILTER_DEBOUNCE_MS = 200
+
+    def __init__(self, images, thumbnail_dir, parent=None, image_cache=None, digests=None):
+        """
+        :param images: Liste de tuples (filepath, [noms reconnus]).
+        :param thumbnail_dir: Dossier du cache disque des miniatures.
+        :param image_cache: ImageCache transmis à la visualisation (optionnel).
+        :param digests: Dictionnaire chemin -> empreinte du contenu, si elles sont connues.
+        """
+        super().__init__(parent)
+        self.image_cache = image_cache
+        self.model = ResultsListModel(images, ThumbnailDiskCache(thumbnail_dir), digests, self)
+
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(self.FILTER_DEBOUNCE_MS)
+        self.filter_timer.timeout.connect(self.apply_filter)
+
+        self.setWindowTitle("Grille des Résultats")
+        self.resize(1100, 800)
+        self.init_ui()
+        self.update_counter()
+
+    def init_ui(self):
+        """Construit la grille et le champ de filtre."""
+        layout = QVBoxLayout(self)
+
+        filter_layout = QHBoxLayout()
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filtrer par nom reconnu...")
+        self.filter_input.textChanged.connect(self.filter_timer.start)
+        self.counter_label = QLabel()
+        self.counter_label.setStyleSheet("color: #7f8c8d; font-size: 12px; padding: 5px;")
+        filter_layout.addWidget(self.filter_input, 1)
+        filter_layout.addWidget(self.counter_label)
+        layout.addLayout(filter_layout)
+
+        size = self.model.disk_cache.size
+        self.view = QListView()
+        self.view.setViewMode(QListView.ViewMode.IconMode)
+        self.view.setIconSize(QSize(size, size))
+        self.view.setGridSize(QSize(size + 20, size + 40))
+        # Tailles uniformes : seules les lignes visibles sont interrogées
+        self.view.setUniformItemSizes(True)
+        self.view.setMovement(QListView.Movement.Static)
+        self.view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.view.setBatchSize(2000)
+        self.view.setTextElideMode(Qt.TextElideMode.ElideMiddle)
+        self.view.setModel(self.model)
+        self.view.doubleClicked.connect(self.open_image)
+        layout.addWidget(self.view, 1)
+
+    def apply_filter(self):
+        self.model.set_name_filter(self.filter_input.text())
+        self.update_counter()
+
+    def update_counter(self):
+        self.counter_label.setText(f"{len(self.model.images)} images sur {len(self.model.all_images)}")
+
+    def open_image(self, index):
+        """Ouvre l'image double-cliquée dans la visualisation (navigation limitée aux images filtrées)."""
+        viewer = ImageViewerWindow(self.model.images, self, image_cache=self.image_cache, start_index=index.row())
+        viewer.exec()
+
+    def closeEvent(self, event):
+        self.filter_timer.stop()
+        self.model.cancel()
+        super().closeEvent(event)
+
 
 class FaceRecoApp(QMainWindow):
     """
     Fenêtre principale de l'application de reconnaissance faciale.
     """
-    def __init__(self):
+    # Intervalle de rafraîchissement de la progression et du journal (ms)
+    PROGRESS_REFRESH_MS = 100
+    # Nombre maximal de lignes conservées dans le journal
+    MAX_LOG_LINES = 5000
+    # Nombre d'identités récentes comparées en premier en mode chronologique
+    SHORTLIST_SIZE = 16
+    # Réglages de l'interface appliqués au gestionnaire au démarrage de chaque tâche
+    JOB_SETTINGS = ("threshold", "margin", "calibration_sigmas", "memory_budget")
+
+    def __init__(self, backend_id=DNN_BACKENDS["default"], target_id=DNN_TARGETS["cpu"], num_threads=None,
+                 letterbox=False, decode_max_side=None, memory_budget=None, gallery_shards=0, match_batch=0, margin=0.0,
+                 calibration_sigmas=None):
+        """
+        :param backend_id: Backend DNN d'OpenCV initial.
+        :param target_id: Cible DNN d'OpenCV initiale.
+        :param num_threads: Nombre de threads OpenCV initial (None = automatique).
+        :param letterbox: Détection dans un jeu réduit de tailles d'entrée fixes.
+        :param decode_max_side: Décodage réduit des grands JPEG pour la détection (None = pleine résolution).
+        :param memory_budget: Budget mémoire initial des traitements, en octets (None = illimité).
+        :param gallery_shards: Comparaison à la base en mémoire partagée, en autant de tranches (0 = désactivée).
+        :param match_batch: Visages accumulés sur plusieurs images avant d'être comparés ensemble (0 = désactivé).
+        :param margin: Écart minimal avec la deuxième identité pour reconnaître un visage (0 = désactivé).
+        :param calibration_sigmas: Seuils par identité calibrés à l'apprentissage (None ou 0 = désactivés).
+        """
         super().__init__()
 
         self.setWindowTitle("Leomine - Reconnaissance Faciale Automatisée")
         self.resize(900, 700)
         
-        # Initialisation du gestionnaire avec les chemins par défaut
+        # Réglages du gestionnaire, avec les chemins par défaut. Le gestionnaire (et OpenCV) n'est
+        # créé qu'au premier usage, normalement par la préparation lancée une fois la fenêtre affichée
         self.base_dir = os.getcwd()
-        self.manager = FaceRecognizerManager(
+        self.manager_settings = dict(
             model_dir=None,  # Utilise le dossier dans le package par défaut
-            encoding_file=os.path.join(self.base_dir, "encodings_data", "visages_connus.pkl")
+            encoding_file=os.path.join(self.base_dir, "encodings_data", "visages_connus.pkl"),
+            results_db=os.path.join(self.base_dir, "encodings_data", "resultats.sqlite3"),
+            crop_archive=os.path.join(self.base_dir, "encodings_data", "visages_alignes"),
+            threshold=0.4,
+            backend_id=backend_id,
+            target_id=target_id,
+            num_threads=num_threads,
+            letterbox=letterbox,
+            decode_max_side=decode_max_side,
+            memory_budget=memory_budget,
+            gallery_shards=gallery_shards,
+            match_batch=match_batch,
+            margin=margin,
+            calibration_sigmas=calibration_sigmas
         )
+        self._manager = None
+        self._manager_lock = threading.Lock()
 
-        self.worker = None 
+        # File des tâches : apprentissages, tris, etc. s'exécutent l'un après l'autre sur le même
+        # gestionnaire (modèles et base partagés), chacun avec sa progression et son résultat
+        self.scheduler = JobScheduler()
+        self._job_items = {}  # Numéro de tâche -> ligne de la liste des tâches
+        self._job_states = {}  # Numéro de tâche -> dernier état affiché
+        self._dnn_job = None  # Dernier changement de configuration DNN placé dans la file
+        self.results_job = None  # Dernier tri terminé
+        # Relevé de la progression des tâches à fréquence fixe, indépendante du débit du traitement
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(self.PROGRESS_REFRESH_MS)
+        self.progress_timer.timeout.connect(self.refresh_progress)
+        # Images décodées conservées d'une ouverture de la visualisation à l'autre
+        self.image_cache = ImageCache()
 
         self.init_ui()
         self.apply_styles()
+        # Préparation dès que la boucle d'événements tourne, donc après le premier affichage
+        QTimer.singleShot(0, self.start_warm_up)
+
+    @property
+    def manager(self):
+        """
+        FaceRecognizerManager, créé au premier accès. Réservé aux tâches : depuis l'interface,
+        ce premier accès importerait OpenCV ou attendrait la fin de la préparation.
+        """
+        with self._manager_lock:
+            if self._manager is None:
+                self._manager = _manager_class()(**self.manager_settings)
+            return self._manager
+
+    def job_manager(self):
+        """
+        Gestionnaire d'une tâche, à appeler à son démarrage : les réglages modifiés dans
+        l'interface (`manager_settings`) s'appliquent ainsi entre deux tâches, jamais pendant.
+        """
+        manager = self.manager
+        for key in self.JOB_SETTINGS:
+            setattr(manager, key, self.manager_settings[key])
+        return manager
+
+    def start_warm_up(self):
+        """Place la préparation du gestionnaire en tête de la file des tâches."""
+        if self._manager is None or self._manager.detector is None:
+            self.submit_job("Préparation", self.warm_up)
+
+    def warm_up(self, progress_callback=None):
+        """
+        Prépare le gestionnaire : import d'OpenCV, chargement des modèles s'ils sont déjà
+        téléchargés (rien n'est téléchargé ici) et des signatures connues.
+
+        :param progress_callback: Fonction de rappel pour le suivi de la progression.
+        """
+        manager = self.job_manager()
+        if not all(os.path.exists(os.path.join(manager.model_dir, f)) for f in manager.models_files):
+            if progress_callback: progress_callback("Modèles absents : utilisez « Vérifier Modèles » pour les télécharger.")
+            return
+        if manager.detector is None and not manager.load_models():
+            if progress_callback: progress_callback("Erreur : Impossible de charger les modèles.")
+            return
+        success, count = manager.load_encodings()
+        if progress_callback:
+            progress_callback(f"Modèles prêts. Base de données chargée : {count} visages." if success
+                              else "Modèles prêts. Aucune signature : lancez l'apprentissage.")
 
     def init_ui(self):
         """Construit et initialise l'interface utilisateur graphique."""
@@ -226,16 +758,101 @@ class FaceRecoApp(QMainWindow):
         self.threshold_spin = QDoubleSpinBox()
         self.threshold_spin.setRange(0.1, 0.9)
         self.threshold_spin.setSingleStep(0.05)
-        self.threshold_spin.setValue(0.4)
+        self.threshold_spin.setValue(self.manager_settings["threshold"])
         self.threshold_spin.setToolTip("Plus bas = Plus strict (Moins de faux positifs). Plus haut = Plus tolérant.")
         
         self.threshold_spin.valueChanged.connect(self.update_threshold)
         
         threshold_layout.addWidget(threshold_label)
         threshold_layout.addWidget(self.threshold_spin)
+
+        # Marge avec la deuxième identité : deux identités presque ex aequo laissent le visage inconnu
+        margin_label = QLabel("Marge :")
+        margin_label.setStyleSheet("color: black;")
+        self.margin_spin = QDoubleSpinBox()
+        self.margin_spin.setRange(0.0, 0.3)
+        self.margin_spin.setSingleStep(0.01)
+        self.margin_spin.setSpecialValueText("Aucune")
+        self.margin_spin.setValue(self.manager_settings["margin"])
+        self.margin_spin.setToolTip("Écart minimal entre la personne reconnue et la suivante. "
+                                    "Évite les renommages erronés entre deux personnes qui se ressemblent.")
+        self.margin_spin.valueChanged.connect(self.update_margin)
+        threshold_layout.addWidget(margin_label)
+        threshold_layout.addWidget(self.margin_spin)
+
+        # Seuils par identité : relevés pour les personnes qui ressemblent à beaucoup d'autres
+        sigmas_label = QLabel("Seuils par personne :")
+        sigmas_label.setStyleSheet("color: black;")
+        self.sigmas_spin = QDoubleSpinBox()
+        self.sigmas_spin.setRange(0.0, 6.0)
+        self.sigmas_spin.setSingleStep(0.5)
+        self.sigmas_spin.setSpecialValueText("Non")
+        self.sigmas_spin.setValue(self.manager_settings["calibration_sigmas"] or 0.0)
+        self.sigmas_spin.setToolTip("Nombre d'écarts-types au-dessus des scores d'imposteurs de chaque personne "
+                                    "(3 conseillé). Calculés au prochain apprentissage.")
+        self.sigmas_spin.valueChanged.connect(self.update_calibration_sigmas)
+        threshold_layout.addWidget(sigmas_label)
+        threshold_layout.addWidget(self.sigmas_spin)
+
+        # Photos d'un même événement : ordre de prise de vue et identités récentes comparées en premier
+        self.shortlist_check = QCheckBox("Ordre chronologique (liste courte)")
+        self.shortlist_check.setStyleSheet("color: black;")
+        self.shortlist_check.setToolTip(
+            "Trie les photos par date de prise de vue et compare d'abord chaque visage aux "
+            f"{self.SHORTLIST_SIZE} dernières personnes reconnues. Résultats identiques ; la comparaison n'est "
+            "plus rapide que visage par visage (sans comparaison par blocs ni base partagée), le journal "
+            "indique le temps économisé."
+        )
+        threshold_layout.addWidget(self.shortlist_check)
         threshold_layout.addStretch()
         config_layout.addLayout(threshold_layout)
 
+        # Backend, cible et threads des réseaux DNN
+        dnn_layout = QHBoxLayout()
+        dnn_label = QLabel("Backend / Cible / Threads / Processus / Mémoire :")
+        dnn_label.setStyleSheet("color: black;")
+        self.backend_combo = QComboBox()
+        for name, value in DNN_BACKENDS.items():
+            self.backend_combo.addItem(name, value)
+        self.backend_combo.setCurrentIndex(self.backend_combo.findData(self.manager_settings["backend_id"]))
+        self.target_combo = QComboBox()
+        for name, value in DNN_TARGETS.items():
+            self.target_combo.addItem(name, value)
+        self.target_combo.setCurrentIndex(self.target_combo.findData(self.manager_settings["target_id"]))
+        self.threads_spin = QSpinBox()
+        self.threads_spin.setRange(0, os.cpu_count() or 1)
+        self.threads_spin.setSpecialValueText("Auto")
+        self.threads_spin.setValue(self.manager_settings["num_threads"] or 0)
+        self.threads_spin.setToolTip("Limiter les threads évite la sur-souscription quand plusieurs instances tournent sur la même machine.")
+
+        # Processus d'apprentissage parallèles (chacun charge ses propres modèles)
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, os.cpu_count() or 1)
+        self.workers_spin.setToolTip("Nombre de processus utilisés pour l'apprentissage ; la base produite est identique quel que soit ce nombre.")
+
+        # Budget mémoire des traitements (0 = illimité)
+        self.memory_spin = QSpinBox()
+        self.memory_spin.setRange(0, 1024 * 1024)
+        self.memory_spin.setSingleStep(256)
+        self.memory_spin.setSuffix(" Mo")
+        self.memory_spin.setSpecialValueText("Illimitée")
+        self.memory_spin.setValue((self.manager_settings["memory_budget"] or 0) // (1024 * 1024))
+        self.memory_spin.setToolTip("Résolution de détection, lots, préchargement et processus sont adaptés pour tenir dans ce budget.")
+        self.memory_spin.valueChanged.connect(self.update_memory_budget)
+
+        self.backend_combo.currentIndexChanged.connect(self.update_dnn_settings)
+        self.target_combo.currentIndexChanged.connect(self.update_dnn_settings)
+        self.threads_spin.valueChanged.connect(self.update_dnn_settings)
+
+        dnn_layout.addWidget(dnn_label)
+        dnn_layout.addWidget(self.backend_combo)
+        dnn_layout.addWidget(self.target_combo)
+        dnn_layout.addWidget(self.threads_spin)
+        dnn_layout.addWidget(self.workers_spin)
+        dnn_layout.addWidget(self.memory_spin)
+        dnn_layout.addStretch()
+        config_layout.addLayout(dnn_layout)
+
         config_group.setLayout(config_layout)
         main_layout.addWidget(config_group)
 
@@ -256,32 +873,68 @@ class FaceRecoApp(QMainWindow):
         self.btn_view_results.clicked.connect(self.show_results)
         self.btn_view_results.setEnabled(False)  # Désactivé par défaut
 
+        self.btn_grid_results = QPushButton("5. Grille des Résultats")
+        self.btn_grid_results.clicked.connect(self.show_results_grid)
+
         # Style spécifique pour les boutons
         self.btn_process.setStyleSheet("background-color: #2ecc71; color: white; font-weight: bold;")
         self.btn_view_results.setStyleSheet("background-color: #9b59b6; color: white; font-weight: bold;")
+        self.btn_grid_results.setStyleSheet("background-color: #9b59b6; color: white; font-weight: bold;")
         
         actions_layout.addWidget(self.btn_check_models)
         actions_layout.addWidget(self.btn_train)
         actions_layout.addWidget(self.btn_process)
         actions_layout.addWidget(self.btn_view_results)
+        actions_layout.addWidget(self.btn_grid_results)
         
         actions_group.setLayout(actions_layout)
         main_layout.addWidget(actions_group)
 
-        # --- SECTION 3 : LOGS ET PROGRESSION ---
+        # --- SECTION 3 : FILE DES TÂCHES ---
+        jobs_group = QGroupBox("File des tâches")
+        jobs_layout = QHBoxLayout()
+
+        self.jobs_list = QListWidget()
+        self.jobs_list.setMaximumHeight(110)
+        self.jobs_list.setToolTip("Les tâches s'exécutent dans l'ordre. Sélectionnez un tri terminé "
+                                  "pour en voir les résultats.")
+
+        jobs_buttons = QVBoxLayout()
+        self.btn_cancel_job = QPushButton("Annuler la tâche")
+        self.btn_cancel_job.setToolTip("Annule la tâche sélectionnée (à défaut, la tâche en cours). "
+                                       "Le travail déjà fait est conservé.")
+        self.btn_cancel_job.clicked.connect(self.cancel_job)
+        self.btn_clear_jobs = QPushButton("Retirer les terminées")
+        self.btn_clear_jobs.clicked.connect(self.clear_finished_jobs)
+        jobs_buttons.addWidget(self.btn_cancel_job)
+        jobs_buttons.addWidget(self.btn_clear_jobs)
+        jobs_buttons.addStretch()
+
+        jobs_layout.addWidget(self.jobs_list)
+        jobs_layout.addLayout(jobs_buttons)
+        jobs_group.setLayout(jobs_layout)
+        main_layout.addWidget(jobs_group)
+
+        # --- SECTION 4 : LOGS ET PROGRESSION ---
         log_group = QGroupBox("Journal d'activité")
         log_layout = QVBoxLayout()
 
         self.log_area = QTextEdit()
         self.log_area.setReadOnly(True)
+        self.log_area.document().setMaximumBlockCount(self.MAX_LOG_LINES)
         
         self.progress_bar = QProgressBar()
-        self.progress_bar.setRange(0, 0) # Mode indéterminé par défaut
+        self.progress_bar.setRange(0, 0) # Mode indéterminé jusqu'à ce que le total soit connu
         self.progress_bar.setTextVisible(False)
         self.progress_bar.hide()
 
+        self.progress_label = QLabel()
+        self.progress_label.setStyleSheet("color: #7f8c8d; font-size: 12px;")
+        self.progress_label.hide()
+
         log_layout.addWidget(self.log_area)
         log_layout.addWidget(self.progress_bar)
+        log_layout.addWidget(self.progress_label)
         log_group.setLayout(log_layout)
         main_layout.addWidget(log_group)
 
@@ -315,44 +968,181 @@ class FaceRecoApp(QMainWindow):
 
     def log_message(self, message):
         """Ajoute un message à la zone de texte et fait défiler vers le bas."""
-        self.log_area.append(f"> {message}")
+        self.log_messages([message])
+
+    def log_messages(self, messages):
+        """Ajoute plusieurs messages en une seule mise à jour de la zone de texte."""
+        if not messages:
+            return
+        self.log_area.append("\n".join(f"> {message}" for message in messages))
         sb = self.log_area.verticalScrollBar()
         sb.setValue(sb.maximum())
 
+    def refresh_progress(self):
+        """
+        Relève l'état des tâches : journal par paquets, liste des tâches et barre de progression
+        déterminée de la tâche en cours.
+        """
+        # Relevé avant la boucle : une tâche qui se termine pendant celle-ci sera affichée au relevé suivant
+        active = self.scheduler.active()
+        running = None
+        for job in list(self.scheduler.jobs):
+            self.log_messages([f"[#{job.id}] {message}" for message in job.progress.drain_logs()])
+            item = self._job_items.get(job.id)
+            if item is not None:
+                text = job.describe()
+                if item.text() != text:
+                    item.setText(text)
+            if job.state == RUNNING and running is None:
+                running = job
+            if self._job_states.get(job.id) != job.state:
+                self._job_states[job.id] = job.state
+                if job.finished:
+                    self.on_job_finished(job)
+
+        if running is not None and running.progress.total > 0:
+            snapshot = running.progress.snapshot()
+            self.progress_bar.setRange(0, snapshot["total"])
+            self.progress_bar.setValue(snapshot["done"])
+            self.progress_bar.setTextVisible(True)
+            self.progress_label.setText(f"#{running.id} " + running.progress.format(snapshot))
+            self.progress_label.show()
+        elif running is not None:
+            self.progress_bar.setRange(0, 0)  # Mode indéterminé jusqu'à ce que le total soit connu
+            self.progress_bar.setTextVisible(False)
+            self.progress_label.hide()
+        if not active:
+            self.progress_timer.stop()
+            self.progress_bar.hide()
+            self.progress_label.hide()
+
     def update_threshold(self, value):
-        """Met à jour le seuil dans le gestionnaire."""
-        self.manager.threshold = value
+        """Met à jour le seuil des prochaines tâches."""
+        self.manager_settings["threshold"] = value
         self.log_message(f"Seuil mis à jour : {value:.2f}")
 
-    def toggle_buttons(self, enable):
-        """Active ou désactive les boutons d'action pendant le traitement."""
-        self.btn_check_models.setEnabled(enable)
-        self.btn_train.setEnabled(enable)
-        self.btn_process.setEnabled(enable)
-        # Note: btn_view_results reste géré séparément
-        
-        if not enable:
-            self.progress_bar.show()
-        else:
-            self.progress_bar.hide()
+    def update_margin(self, value):
+        """Met à jour la marge avec la deuxième identité pour les prochaines tâches."""
+        self.manager_settings["margin"] = value
+        self.log_message(f"Marge mise à jour : {value:.2f}")
 
-    # --- Gestion des Threads ---
+    def update_calibration_sigmas(self, value):
+        """Active, règle ou désactive (0) les seuils par identité pour les prochaines tâches."""
+        self.manager_settings["calibration_sigmas"] = value
+        self.log_message(f"Seuils par personne : {value:.1f} écarts-types" if value else "Seuils par personne désactivés")
 
-    def start_worker(self, func, *args):
-        """Démarre un thread de travail (Worker)."""
-        if self.worker is not None and self.worker.isRunning():
-            self.log_message("Une tâche est déjà en cours...")
+    def update_dnn_settings(self):
+        """
+        Place dans la file le changement de backend, de cible et de threads : les modèles ne
+        changent pas sous une tâche en cours, mais entre deux tâches. Un changement encore en
+        attente est remplacé par le nouveau (un seul rechargement pour plusieurs crans du réglage).
+        """
+        self.manager_settings.update(
+            backend_id=self.backend_combo.currentData(),
+            target_id=self.target_combo.currentData(),
+            num_threads=self.threads_spin.value() or None,
+        )
+        if self._dnn_job is not None and self._dnn_job.state == QUEUED:
+            self.scheduler.cancel(self._dnn_job)
+        label = (f"Configuration DNN : {self.backend_combo.currentText()} / "
+                 f"{self.target_combo.currentText()} / {self.threads_spin.text()} thread(s)")
+        self._dnn_job = self.submit_job(label, self.apply_dnn_settings)
+
+    def apply_dnn_settings(self, progress_callback=None):
+        """Applique le backend, la cible et les threads DNN ; les modèles seront rechargés à la tâche suivante."""
+        if self._manager is None:
+            # Le gestionnaire sera créé avec ces réglages
             return
+        manager = self._manager
+        manager.backend_id = self.manager_settings["backend_id"]
+        manager.target_id = self.manager_settings["target_id"]
+        manager.num_threads = self.manager_settings["num_threads"]
+        manager.detector = None
+        manager.recognizer = None
+        if progress_callback: progress_callback("Configuration DNN appliquée : modèles rechargés à la prochaine tâche.")
+
+    def update_memory_budget(self, value):
+        """Applique le budget mémoire choisi (en Mo) aux prochaines tâches."""
+        self.manager_settings["memory_budget"] = value * 1024 * 1024 or None
+
+    # --- File des tâches ---
+
+    def submit_job(self, label, func, *args, **kwargs):
+        """
+        Ajoute une tâche à la file ; les boutons restent actifs pour en ajouter d'autres.
+
+        :param label: Libellé affiché dans la liste des tâches et le journal.
+        :param func: Fonction à exécuter, appelée avec `progress_callback`.
+        :return: Job.
+        """
+        job = self.scheduler.submit(label, func, *args, **kwargs)
+        item = QListWidgetItem(job.describe())
+        item.setData(Qt.ItemDataRole.UserRole, job.id)
+        self.jobs_list.addItem(item)
+        self._job_items[job.id] = item
+        self.log_message(f"--- Tâche #{job.id} ajoutée : {label} ---")
+        if not self.progress_timer.isActive():
+            self.progress_bar.setRange(0, 0)
+            self.progress_bar.setTextVisible(False)
+            self.progress_bar.show()
+            self.progress_timer.start()
+        return job
+
+    def selected_job(self):
+        """:return: Job sélectionné dans la liste des tâches, ou None."""
+        item = self.jobs_list.currentItem()
+        if item is None or not item.isSelected():
+            return None
+        job_id = item.data(Qt.ItemDataRole.UserRole)
+        return next((job for job in self.scheduler.jobs if job.id == job_id), None)
+
+    def cancel_job(self):
+        """Annule la tâche sélectionnée, ou à défaut la tâche en cours."""
+        job = self.selected_job()
+        if job is None:
+            job = next((job for job in self.scheduler.jobs if job.state == RUNNING), None)
+        if job is not None and self.scheduler.cancel(job):
+            self.log_message(f"Annulation de la tâche #{job.id} demandée.")
+
+    def clear_finished_jobs(self):
+        """Retire de la liste les tâches terminées ; les résultats du dernier tri restent visibles."""
+        self.scheduler.clear_finished()
+        kept = {job.id for job in self.scheduler.jobs}
+        for job_id in list(self._job_items):
+            if job_id not in kept:
+                self.jobs_list.takeItem(self.jobs_list.row(self._job_items.pop(job_id)))
+                self._job_states.pop(job_id, None)
 
-        self.toggle_buttons(False)
-        self.worker = WorkerThread(func, *args)
-        self.worker.progress_signal.connect(self.log_message)
-        self.worker.finished_signal.connect(lambda: self.toggle_buttons(True))
-        self.worker.start()
+    def on_job_finished(self, job):
+        """Appelé (depuis la boucle d'événements) quand une tâche se termine."""
+        if job.func == self.sort_directory and job.state == DONE and job.result:
+            self.results_job = job
+            self.btn_view_results.setEnabled(True)
+            self.log_message(f"{len(job.result)} images disponibles pour visualisation (tâche #{job.id}).")
+
+    def selected_results(self):
+        """
+        :return: list: Images (chemin, noms) du tri sélectionné dans la liste des tâches,
+            ou à défaut du dernier tri terminé.
+        """
+        job = self.selected_job()
+        if job is not None and job.func == self.sort_directory and job.state == DONE:
+            return job.result or []
+        return self.results_job.result if self.results_job is not None else []
+
+    def closeEvent(self, event):
+        """
+        Annule les tâches et ferme sans attendre : la tâche en cours s'arrête d'elle-même à sa
+        prochaine image (un téléchargement de modèle, lui, va à son terme avant la sortie).
+        """
+        self.progress_timer.stop()
+        self.scheduler.shutdown(wait=False)
+        super().closeEvent(event)
 
     def run_check_models(self):
-        self.log_message("--- Démarrage de la vérification des modèles ---")
-        self.start_worker(self.manager.check_and_download_models)
+        # Le gestionnaire est obtenu dans la tâche, jamais depuis l'interface
+        self.submit_job("Vérification des modèles",
+                        lambda **kwargs: self.job_manager().check_and_download_models(**kwargs))
 
     def run_training(self):
         directory = self.path_known['input'].text()
@@ -360,54 +1150,48 @@ class FaceRecoApp(QMainWindow):
             QMessageBox.warning(self, "Erreur", "Le dossier des visages connus n'existe pas.")
             return
             
-        self.log_message(f"--- Démarrage de l'apprentissage sur : {directory} ---")
-        self.start_worker(self.manager.train_faces, directory)
+        self.submit_job(f"Apprentissage : {directory}",
+                        lambda *args, **kwargs: self.job_manager().train_faces(*args, **kwargs), directory,
+                        workers=self.workers_spin.value())
 
     def run_processing(self):
-        # S'assurer que les modèles sont chargés
-        if self.manager.detector is None:
-            loaded = self.manager.load_models()
-            if not loaded:
-                self.log_message("Erreur : Impossible de charger les modèles.")
-                return
-
-        # S'assurer que les encodages (signatures) sont chargés
-        if not self.manager.known_features:
-            success, count = self.manager.load_encodings()
-            if success:
-                self.log_message(f"Base de données chargée automatiquement : {count} visages.")
-            else:
-                self.log_message("ATTENTION : Aucune signature de visage chargée. Veuillez lancer l'apprentissage d'abord.")
-                return
-
         directory = self.path_unknown['input'].text()
         if not os.path.isdir(directory):
             QMessageBox.warning(self, "Erreur", "Le dossier cible n'existe pas.")
             return
 
-        self.log_message(f"--- Démarrage du tri sur : {directory} ---")
-        # Créer un worker avec callback pour activer le bouton une fois terminé
-        if self.worker is not None and self.worker.isRunning():
-            self.log_message("Une tâche est déjà en cours...")
-            return
+        shortlist = self.SHORTLIST_SIZE if self.shortlist_check.isChecked() else 0
+        self.submit_job(f"Tri : {directory}", self.sort_directory, directory, shortlist=shortlist)
+
+    def sort_directory(self, directory, shortlist=0, progress_callback=None):
+        """
+        Tâche de tri : charge au besoin les modèles et les signatures (au moment où elle s'exécute,
+        donc après un apprentissage placé avant elle dans la file), puis trie le dossier.
+
+        :param directory: Dossier à trier.
+        :param shortlist: Nombre d'identités récentes comparées en premier (0 = recherche exhaustive).
+        :param progress_callback: Fonction de rappel pour le suivi de la progression.
+        :return: list: Images (chemin, noms) de ce tri, ou False si les modèles ou la base manquent.
+        """
+        manager = self.job_manager()
+        if manager.detector is None and not manager.load_models():
+            if progress_callback: progress_callback("Erreur : Impossible de charger les modèles.")
+            return False
+
+        # S'assurer que les encodages (signatures) sont chargés
+        if not manager.known_features:
+            success, count = manager.load_encodings()
+            if not success:
+                if progress_callback: progress_callback("ATTENTION : Aucune signature de visage chargée. Veuillez lancer l'apprentissage d'abord.")
+                return False
+            if progress_callback: progress_callback(f"Base de données chargée automatiquement : {count} visages.")
+
+        return manager.process_directory(directory, progress_callback=progress_callback, shortlist=shortlist)
 
-        self.toggle_buttons(False)
-        self.worker = WorkerThread(self.manager.process_directory, directory)
-        self.worker.progress_signal.connect(self.log_message)
-        self.worker.finished_signal.connect(self.on_processing_finished)
-        self.worker.start()
-
-    def on_processing_finished(self):
-        """Appelé quand le traitement est terminé."""
-        self.toggle_buttons(True)
-        # Activer le bouton de visualisation si des images ont été traitées
-        if self.manager.processed_images:
-            self.btn_view_results.setEnabled(True)
-            self.log_message(f"{len(self.manager.processed_images)} images disponibles pour visualisation.")
-    
     def show_results(self):
-        """Affiche la fenêtre de visualisation des résultats."""
-        if not self.manager.processed_images:
+        """Affiche la fenêtre de visualisation des résultats (tri sélectionné ou dernier tri)."""
+        images = self.selected_results()
+        if not images:
             QMessageBox.information(
                 self,
                 "Aucun résultat",
@@ -415,8 +1199,41 @@ class FaceRecoApp(QMainWindow):
             )
             return
         
-        viewer = ImageViewerWindow(self.manager.processed_images, self)
+        viewer = ImageViewerWindow(images, self, image_cache=self.image_cache)
         viewer.exec()
+
+    def show_results_grid(self):
+        """
+        Affiche la grille des résultats : ceux du tri sélectionné ou du dernier tri, ou à défaut
+        toute la base des résultats.
+        """
+        images, digests = self.selected_results(), None
+        results_db = self.manager_settings["results_db"]
+        if not images and results_db and os.path.exists(results_db):
+            db = ResultsDatabase(results_db)
+            try:
+                rows = db.images()
+            finally:
+                db.close()
+            images = [(path, names) for path, names, _ in rows]
+            digests = {path: digest for path, _, digest in rows}
+
+        if not images:
+            QMessageBox.information(
+                self,
+                "Aucun résultat",
+                "Aucune image n'a été traitée. Veuillez d'abord lancer le tri."
+            )
+            return
+
+        grid = ThumbnailGridWindow(
+            images,
+            os.path.join(self.base_dir, "encodings_data", "miniatures"),
+            self,
+            image_cache=self.image_cache,
+            digests=digests,
+        )
+        grid.exec()
     
     def apply_styles(self):
         """Applique les styles CSS globaux."""
@@ -0,0 +1,157 @@
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+try:
+    from .progress import Cancelled, ProgressTracker
+except ImportError:
+    from progress import Cancelled, ProgressTracker
+
+# États d'une tâche
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "en attente", "en cours", "terminée", "échouée", "annulée"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class Job:
+    """
+    Tâche de la file : une fonction du gestionnaire, avec sa progression, son annulation et son résultat.
+    """
+
+    def __init__(self, job_id, label, func, args, kwargs):
+        """
+        :param job_id: Numéro de la tâche (ordre de soumission).
+        :param label: Libellé affiché (ex. "Tri : /photos/mariage").
+        :param func: Fonction à exécuter ; elle reçoit `progress_callback=progress`.
+        :param args: Arguments positionnels de `func`.
+        :param kwargs: Arguments nommés de `func`.
+        """
+        self.id = job_id
+        self.label = label
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.progress = ProgressTracker()
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self._future = None
+
+    @property
+    def finished(self):
+        """True si la tâche est terminée, en échec ou annulée."""
+        return self.state in FINISHED
+
+    def describe(self):
+        """Résumé lisible : numéro, libellé, état et avancement de l'étape en cours."""
+        text = f"#{self.id} {self.label} - {self.state}"
+        if self.state == RUNNING and self.progress.total:
+            text += f" ({self.progress.format()})"
+        return text
+
+
+class JobScheduler:
+    """
+    File de tâches exécutées en arrière-plan par un pool de threads, dans l'ordre de soumission.
+
+    Les tâches partagent un même gestionnaire : modèles chargés une fois, base de signatures
+    lue par instantanés (copie sur écriture). Les réseaux d'OpenCV d'un gestionnaire n'étant
+    pas réentrants, les tâches qui s'en servent s'exécutent l'une après l'autre (`workers=1`) ;
+    l'apprentissage répartit lui-même son travail entre processus (`train_faces(workers=...)`).
+    Chaque tâche a son propre ProgressTracker, relevé par l'interface à intervalle fixe, et
+    peut être annulée, qu'elle soit en attente ou en cours.
+    """
+
+    def __init__(self, workers=1):
+        """
+        :param workers: Nombre de tâches exécutées en même temps.
+        """
+        self.jobs = []  # Toutes les tâches, dans l'ordre de soumission
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tache")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def submit(self, label, func, *args, **kwargs):
+        """
+        Ajoute une tâche à la file.
+
+        :param label: Libellé affiché.
+        :param func: Fonction à exécuter, appelée avec `progress_callback` (ProgressTracker de la tâche).
+        :return: Job.
+        """
+        with self._lock:
+            job = Job(next(self._ids), label, func, args, kwargs)
+            self.jobs.append(job)
+            job._future = self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        with self._lock:
+            if job.state != QUEUED:
+                return
+            job.state = RUNNING
+        try:
+            result = job.func(*job.args, **job.kwargs, progress_callback=job.progress)
+        except Cancelled:
+            job.progress.log("Tâche annulée.")
+            state = CANCELLED
+        except Exception as e:
+            job.error = e
+            job.progress.log(f"[ERREUR CRITIQUE] {str(e)}")
+            state = FAILED
+        else:
+            job.result = result
+            # Les traitements signalent leurs erreurs en retournant False
+            state = FAILED if result is False else DONE
+        with self._lock:
+            job.state = state
+
+    def cancel(self, job):
+        """
+        Annule une tâche : retirée de la file si elle attend, arrêtée à la prochaine image sinon.
+
+        :return: bool: False si la tâche était déjà terminée.
+        """
+        with self._lock:
+            if job.finished:
+                return False
+            if job.state == QUEUED and job._future.cancel():
+                job.state = CANCELLED
+                return True
+        job.progress.cancel()
+        return True
+
+    def cancel_all(self):
+        """Annule toutes les tâches en attente ou en cours."""
+        for job in list(self.jobs):
+            self.cancel(job)
+
+    def active(self):
+        """:return: list: Tâches en attente ou en cours."""
+        with self._lock:
+            return [job for job in self.jobs if not job.finished]
+
+    def clear_finished(self):
+        """Oublie les tâches terminées (leurs résultats avec elles)."""
+        with self._lock:
+            self.jobs = [job for job in self.jobs if not job.finished]
+
+    def wait(self, timeout=None):
+        """
+        Attend la fin des tâches soumises jusqu'ici.
+
+        :return: bool: True si toutes sont terminées.
+        """
+        with self._lock:
+            futures = [job._future for job in self.jobs]
+        return not wait_futures(futures, timeout=timeout).not_done
+
+    def shutdown(self, cancel=True, wait=True):
+        """
+        Arrête le pool après avoir annulé (par défaut) les tâches restantes.
+
+        :param wait: Attend la fin de la tâche en cours ; sinon elle s'achève en arrière-plan
+            (à sa prochaine image si elle est annulée).
+        """
+        if cancel:
+            self.cancel_all()
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,113 @@
+import math
+
+import cv2
+
+try:
+    from .decoding import read_image_header, reduction_factor
+except ImportError:
+    from decoding import read_image_header, reduction_factor
+
+# Grand côté des formats d'entrée du détecteur (couvre les images décodées réduites,
+# dont le grand côté reste inférieur au double de `decode_max_side`)
+BUCKET_LONG_SIDES = (320, 480, 640, 960, 1280, 1600, 1920, 2560, 3200, 3840)
+# Rapports petit côté / grand côté (carré, 4:3, 3:2, 16:9)
+BUCKET_RATIOS = (1.0, 3 / 4, 2 / 3, 9 / 16)
+# Les côtés sont multiples de 32 : YuNet complète de toute façon son entrée à ce multiple
+BUCKET_ALIGN = 32
+# Réduction maximale acceptée pour entrer dans un format plus petit (au-delà : bordure seule)
+MIN_BUCKET_SCALE = 0.9
+
+
+def _align(side):
+    return int(math.ceil(side / BUCKET_ALIGN) * BUCKET_ALIGN)
+
+
+class DetectionBuckets:
+    """
+    Jeu réduit de tailles d'entrée fixes pour le détecteur (mise en boîte, « letterbox »).
+
+    Chaque image est placée en haut à gauche d'un format fixe, complétée par une bordure
+    noire et, si cela évite un format nettement plus grand, légèrement réduite. Le
+    détecteur ne change ainsi de taille d'entrée (et ne réalloue son réseau) qu'en
+    changeant de format ; les détections sont ramenées aux coordonnées de l'image.
+    """
+
+    def __init__(self, long_sides=BUCKET_LONG_SIDES, ratios=BUCKET_RATIOS, min_scale=MIN_BUCKET_SCALE):
+        """
+        :param long_sides: Grands côtés des formats.
+        :param ratios: Rapports petit côté / grand côté des formats.
+        :param min_scale: Réduction maximale appliquée pour entrer dans un format plus petit.
+        """
+        self.min_scale = min_scale
+        sizes = set()
+        for side in long_sides:
+            for ratio in ratios:
+                short = _align(side * ratio)
+                sizes.add((side, short))
+                sizes.add((short, side))
+        # Du plus petit au plus grand : le premier format qui convient est le moins coûteux
+        self.sizes = sorted(sizes, key=lambda size: (size[0] * size[1], size))
+
+    def choose(self, width, height):
+        """
+        :param width: Largeur de l'image.
+        :param height: Hauteur de l'image.
+        :return: ((int, int), float): Format (largeur, hauteur) et facteur d'échelle (<= 1) de
+            l'image dans ce format, ou (None, 1.0) si l'image dépasse tous les formats.
+        """
+        for bucket_w, bucket_h in self.sizes:
+            scale = min(1.0, bucket_w / width, bucket_h / height)
+            if scale >= self.min_scale:
+                return (bucket_w, bucket_h), scale
+        return None, 1.0
+
+    def key(self, path, max_side=None):
+        """
+        Format d'une image d'après les dimensions de son en-tête, sans la décoder (pour
+        regrouper les images par format).
+
+        :param path: Chemin du fichier image.
+        :param max_side: `decode_max_side` du gestionnaire (réduction des JPEG au décodage).
+        :return: (int, int): Format prévu, ou (0, 0) si inconnu.
+        """
+        header = read_image_header(path)
+        if header is None:
+            return 0, 0
+        kind, width, height = header
+        factor = reduction_factor(width, height, max_side) if kind == "jpeg" else 1
+        size, _ = self.choose(-(-width // factor), -(-height // factor))
+        return size or (0, 0)
+
+    def fit(self, image):
+        """
+        Place une image dans son format.
+
+        :param image: Image BGR.
+        :return: (np.ndarray, float): Image au format (ou l'image elle-même si aucun format ne
+            convient) et facteur d'échelle appliqué.
+        """
+        height, width = image.shape[:2]
+        size, scale = self.choose(width, height)
+        if size is None:
+            return image, 1.0
+        if scale < 1.0:
+            width = min(size[0], int(round(width * scale)))
+            height = min(size[1], int(round(height * scale)))
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        if (width, height) == size:
+            return image, scale
+        boxed = cv2.copyMakeBorder(image, 0, size[1] - height, 0, size[0] - width, cv2.BORDER_CONSTANT, value=0)
+        return boxed, scale
+
+    @staticmethod
+    def to_image_coordinates(faces, scale):
+        """
+        :param faces: Détections YuNet (F, 15) dans l'image mise au format.
+        :param scale: Facteur d'échelle retourné par `fit`.
+        :return: Détections dans l'image d'origine (le score est inchangé).
+        """
+        if scale == 1.0:
+            return faces
+        faces = faces.copy()
+        faces[:, :14] /= scale
+        return faces
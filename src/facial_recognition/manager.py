@@ -1,9 +1,65 @@
 import cv2
+import multiprocessing
 import numpy as np
 import os
-import urllib.request
-import pickle
 import shutil
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from .alignment import CropBatch
+    from .calibration import Calibration
+    from .crop_archive import CropArchive
+    from .decoding import DecodedImage, capture_time, prefetch_images
+    from .dnn import DNN_BACKENDS, DNN_TARGETS  # noqa: F401 (réexportés)
+    from .embedding import create_embedding_engine
+    from .export import NO_FACE, UNREADABLE, ResultsExporter
+    from .letterbox import DetectionBuckets
+    from .memory import MemoryGovernor, format_peak_rss
+    from .gallery import Gallery, GalleryStore, file_signature
+    from .progress import Cancelled, ProgressTracker
+    from .results_db import ResultsDatabase, array_hash, file_hash
+    from .shared_gallery import ShardedMatcher
+    from .shortlist import RecentIdentities
+    from .video import FaceTracker, build_timeline
+except ImportError:
+    from alignment import CropBatch
+    from calibration import Calibration
+    from crop_archive import CropArchive
+    from decoding import DecodedImage, capture_time, prefetch_images
+    from dnn import DNN_BACKENDS, DNN_TARGETS  # noqa: F401 (réexportés)
+    from embedding import create_embedding_engine
+    from export import NO_FACE, UNREADABLE, ResultsExporter
+    from letterbox import DetectionBuckets
+    from memory import MemoryGovernor, format_peak_rss
+    from gallery import Gallery, GalleryStore, file_signature
+    from progress import Cancelled, ProgressTracker
+    from results_db import ResultsDatabase, array_hash, file_hash
+    from shared_gallery import ShardedMatcher
+    from shortlist import RecentIdentities
+    from video import FaceTracker, build_timeline
+
+# Nombre d'identités par tranche d'apprentissage. Fixe, pour que la composition des lots
+# d'encodage (et donc les signatures) ne dépende pas du nombre de processus.
+TRAIN_CHUNK_IDENTITIES = 16
+
+# Gestionnaire propre à chaque processus d'apprentissage parallèle (modèles chargés une fois)
+_worker_manager = None
+
+
+def _init_train_worker(settings):
+    """Initialise un processus d'apprentissage : un gestionnaire et ses modèles par processus."""
+    global _worker_manager
+    _worker_manager = FaceRecognizerManager(**settings)
+    if not _worker_manager.load_models():
+        raise RuntimeError("Impossible de charger les modèles dans le processus d'apprentissage")
+
+
+def _train_worker_chunk(chunk):
+    """Encode une tranche d'identités dans un processus d'apprentissage."""
+    return _worker_manager._encode_chunk(chunk)
 
 class FaceRecognizerManager:
     """
@@ -12,13 +68,48 @@ class FaceRecognizerManager:
     d'images dans un répertoire donné.
     """
 
-    def __init__(self, model_dir=None, encoding_file="visages_connus.pkl", threshold=0.4):
+    def __init__(self, model_dir=None, encoding_file="visages_connus.pkl", threshold=0.4,
+                 backend_id=cv2.dnn.DNN_BACKEND_DEFAULT, target_id=cv2.dnn.DNN_TARGET_CPU,
+                 num_threads=None, engine="auto", batch_size=32, results_db=None, decode_max_side=None,
+                 crop_archive=None, letterbox=False, memory_budget=None, gallery_shards=0, match_batch=0,
+                 margin=0.0, calibration_sigmas=None):
         """
         Initialise le gestionnaire de reconnaissance faciale.
         
         :param model_dir: Répertoire de stockage des modèles ONNX.
         :param encoding_file: Chemin du fichier pickle stockant les signatures faciales.
         :param threshold: Seuil de similarité cosinus pour la validation d'une correspondance.
+        :param backend_id: Backend DNN d'OpenCV utilisé par YuNet et SFace (voir `DNN_BACKENDS`).
+        :param target_id: Cible DNN d'OpenCV (voir `DNN_TARGETS`).
+        :param num_threads: Nombre de threads intra-opération d'OpenCV (None = valeur par défaut).
+        :param engine: Moteur d'encodage SFace : "auto" (ONNX Runtime par lots si installé),
+            "onnxruntime" ou "opencv" (FaceRecognizerSF.feature visage par visage).
+        :param batch_size: Nombre de visages alignés regroupés par inférence d'encodage.
+        :param results_db: Chemin de la base SQLite où enregistrer les résultats (None = pas d'enregistrement).
+        :param decode_max_side: Les JPEG plus grands sont décodés réduits (1/2, 1/4 ou 1/8) pour la
+            détection, en gardant au moins cette taille sur le grand côté (1920 convient aux photos
+            d'appareil) ; None = pleine résolution, comme avant.
+        :param crop_archive: Dossier où archiver les visages alignés (apprentissage et tri) pour
+            pouvoir changer de modèle d'encodage sans redétecter (None = pas d'archive).
+        :param letterbox: Détection dans un jeu réduit de tailles d'entrée fixes (voir
+            `DetectionBuckets`) plutôt qu'à la taille exacte de chaque image, pour éviter
+            que le détecteur ne se redimensionne à chaque image d'un dossier hétérogène.
+        :param memory_budget: Budget mémoire d'un traitement, en octets (None = illimité). La
+            résolution de détection, la taille des lots, le préchargement des images et le
+            nombre de processus d'apprentissage sont adaptés pour tenir dans ce budget.
+        :param gallery_shards: Comparaison vectorisée à la base placée en mémoire partagée : 1 dans
+            le processus courant, au-delà par autant de processus se partageant la même copie de
+            la base (0 = comparaison signature par signature avec SFace).
+        :param match_batch: Tri : nombre de visages, sur autant d'images que nécessaire, accumulés
+            avant d'être comparés ensemble à la base, par produits matriciels de blocs (0 = chaque lot
+            d'encodage est comparé aussitôt). Les images sont renommées à chaque comparaison. Sans
+            effet en mode liste courte, où chaque visage dépend des précédents.
+        :param margin: Écart minimal entre le meilleur score et celui de la meilleure autre identité ;
+            en deçà, deux identités sont presque ex aequo et le visage reste inconnu (0 = désactivé).
+        :param calibration_sigmas: Le seuil d'une identité est relevé à la moyenne de ses scores
+            d'imposteurs plus ce nombre d'écarts-types (voir `Calibration`, calculée à l'apprentissage et
+            à chaque compaction, `IMPOSTOR_SIGMAS` étant un bon point de départ). None ou 0 (par défaut) :
+            seuil global pour toutes les identités, sans calcul de calibration.
         """
         if model_dir is None:
             # Chemin par défaut vers le dossier des modèles dans le package
@@ -27,15 +118,41 @@ class FaceRecognizerManager:
         self.model_dir = model_dir
         self.encoding_file = encoding_file
         self.threshold = threshold
+        self.backend_id = backend_id
+        self.target_id = target_id
+        self.num_threads = num_threads
+        self.engine = engine
+        self.batch_size = batch_size
+        self.results_db = results_db
+        self.decode_max_side = decode_max_side
+        self.crop_archive = crop_archive
+        self.letterbox = letterbox
+        self.buckets = DetectionBuckets() if letterbox else None
+        self.memory_budget = memory_budget
+        self.gallery_shards = gallery_shards
+        self.match_batch = match_batch
+        self.margin = margin
+        self.calibration_sigmas = calibration_sigmas
+        self.calibration = None  # Calibration de la base (fichier `calibration_file`)
+        self._calibration_signature = None
+        self._bounds = (None, None, {})  # (calibration, écarts-types, seuil par identité)
+        self._top_k_depth = (None, 1)  # (instantané, profondeur du top-k pour la marge)
+        self._matcher = None  # ShardedMatcher ouvert (modes gallery_shards et match_batch)
         
         self.detector = None
         self.recognizer = None
+        self.embedder = None  # Moteur d'encodage par lots (None = OpenCV)
         
-        self.known_features = []
-        self.known_names = []
+        # Base des signatures connues : instantané remplacé en bloc à chaque modification,
+        # les écritures sont sérialisées mais les identifications en cours ne sont jamais bloquées
+        self.gallery = Gallery()
+        self._gallery_lock = threading.Lock()
+        self._gallery_store = None
         
         # Pour stocker les résultats du traitement (chemin, noms reconnus)
         self.processed_images = []
+        # Rapports des vidéos traitées (chronologie des personnes par vidéo)
+        self.processed_videos = []
         
         # URLs des modèles provenant d'OpenCV Zoo
         self.models_files = {
@@ -43,6 +160,31 @@ class FaceRecognizerManager:
             "face_recognition_sface_2021dec.onnx": "https://github.com/opencv/opencv_zoo/blob/main/models/face_recognition_sface/face_recognition_sface_2021dec.onnx?raw=true"
         }
 
+    @property
+    def known_features(self):
+        """Signatures connues de l'instantané courant."""
+        return self.gallery.features
+
+    @known_features.setter
+    def known_features(self, features):
+        self.gallery = Gallery(features, self.gallery.names)
+
+    @property
+    def known_names(self):
+        """Noms associés aux signatures de l'instantané courant."""
+        return self.gallery.names
+
+    @known_names.setter
+    def known_names(self, names):
+        self.gallery = Gallery(self.gallery.features, names)
+
+    @property
+    def gallery_store(self):
+        """Stockage (instantané + journal) associé à `encoding_file`."""
+        if self._gallery_store is None or self._gallery_store.encoding_file != self.encoding_file:
+            self._gallery_store = GalleryStore(self.encoding_file)
+        return self._gallery_store
+
     def check_and_download_models(self, progress_callback=None):
         """
         Vérifie la présence des modèles ONNX et les télécharge si nécessaire.
@@ -59,6 +201,7 @@ class FaceRecognizerManager:
             filepath = os.path.join(self.model_dir, filename)
             if not os.path.exists(filepath):
                 if progress_callback: progress_callback(f"Téléchargement de {filename}...")
+                import urllib.request  # Seulement pour un téléchargement (~35 ms d'import)
                 try:
                     urllib.request.urlretrieve(url, filepath)
                 except Exception as e:
@@ -75,6 +218,10 @@ class FaceRecognizerManager:
         :return: bool: True si le chargement réussit.
         """
         try:
+            # Le nombre de threads d'OpenCV est un réglage global au processus : None rétablit
+            # la valeur par défaut (-1), après un réglage explicite d'un autre gestionnaire
+            cv2.setNumThreads(-1 if self.num_threads is None else self.num_threads)
+
             # Création du détecteur de visages YuNet
             self.detector = cv2.FaceDetectorYN.create(
                 model=os.path.join(self.model_dir, "face_detection_yunet_2023mar.onnx"),
@@ -82,150 +229,929 @@ class FaceRecognizerManager:
                 input_size=(320, 320), # Ajusté dynamiquement lors du traitement
                 score_threshold=0.8,
                 nms_threshold=0.3,
-                top_k=5000
+                top_k=5000,
+                backend_id=self.backend_id,
+                target_id=self.target_id
             )
             
             # Création du reconnaisseur SFace
             self.recognizer = cv2.FaceRecognizerSF.create(
                 model=os.path.join(self.model_dir, "face_recognition_sface_2021dec.onnx"),
-                config=""
+                config="",
+                backend_id=self.backend_id,
+                target_id=self.target_id
+            )
+
+            # Moteur d'encodage par lots optionnel (repli sur SFace/OpenCV s'il est indisponible)
+            self.embedder = create_embedding_engine(
+                os.path.join(self.model_dir, "face_recognition_sface_2021dec.onnx"),
+                engine=self.engine,
+                batch_size=self.batch_size,
+                num_threads=self.num_threads
             )
+
+            self._warm_up()
             return True
         except Exception as e:
             print(f"Erreur lors de l'initialisation des modèles : {e}")
             return False
 
+    def _warm_up(self):
+        """
+        Exécute une inférence à vide sur chaque réseau.
+
+        L'allocation des couches et l'initialisation du backend ont lieu au premier
+        appel : on les paie ici, au chargement, plutôt que sur la première image.
+        """
+        self.detector.setInputSize((320, 320))
+        self.detector.detect(np.zeros((320, 320, 3), dtype=np.uint8))
+        self.recognizer.feature(np.zeros((112, 112, 3), dtype=np.uint8))
+
     def load_encodings(self):
         """
         Charge les signatures faciales connues depuis le fichier de stockage.
         
+        Les modifications journalisées depuis la dernière compaction sont rejouées.
+
         :return: (bool, int): Statut du chargement et nombre de visages chargés.
         """
-        if os.path.exists(self.encoding_file):
+        store = self.gallery_store
+        if store.exists():
             try:
-                with open(self.encoding_file, 'rb') as f:
-                    self.known_features, self.known_names = pickle.load(f)
+                with self._gallery_lock:
+                    self.gallery = store.load()
+                self._load_calibration()
                 return True, len(self.known_names)
             except Exception:
                 return False, 0
         return False, 0
 
-    def train_faces(self, known_dir, progress_callback=None):
+    def refresh_gallery(self):
+        """
+        Prend en compte les modifications de la base faites par un autre processus.
+
+        Ne coûte qu'un `stat` par fichier lorsque rien n'a changé ; sans effet si la
+        base n'a pas été chargée depuis le disque.
+
+        :return: bool: True si la base a été mise à jour.
+        """
+        store = self.gallery_store
+        if not store.loaded:
+            return False
+        self._load_calibration()
+        with self._gallery_lock:
+            try:
+                gallery = store.refresh(self.gallery)
+            except Exception as e:
+                print(f"Erreur lors du rechargement des signatures : {e}")
+                return False
+            if gallery is None:
+                return False
+            self.gallery = gallery
+        return True
+
+    def add_identity(self, name, images):
+        """
+        Ajoute des signatures à une identité (créée si besoin) sans réencoder le reste de la base.
+
+        :param name: Nom de la personne.
+        :param images: Images BGR (tableaux NumPy) ; le premier visage de chacune est encodé.
+        :return: int: Nombre de signatures ajoutées.
+        """
+        archived = [] if self.crop_archive else None
+        features = self._encode_identity_images(name, images, archived)
+        if features is None or not features:
+            return 0
+        with self._gallery_lock:
+            self._commit_gallery([("set", name, self.gallery.features_of(name) + features)])
+            if archived is not None:
+                self._archive_gallery_crops(archived, identities=())
+        return len(features)
+
+    def replace_identity(self, name, images):
+        """
+        Remplace toutes les signatures d'une identité.
+
+        :param name: Nom de la personne.
+        :param images: Images BGR (tableaux NumPy) ; le premier visage de chacune est encodé.
+        :return: int: Nombre de signatures enregistrées (0 : l'identité est inchangée).
+        """
+        archived = [] if self.crop_archive else None
+        features = self._encode_identity_images(name, images, archived)
+        if features is None or not features:
+            return 0
+        with self._gallery_lock:
+            self._commit_gallery([("set", name, features)])
+            if archived is not None:
+                self._archive_gallery_crops(archived, identities=[name])
+        return len(features)
+
+    def remove_identity(self, name):
+        """
+        Retire une identité de la base.
+
+        :param name: Nom de la personne.
+        :return: bool: True si l'identité était connue.
+        """
+        if not self.gallery_store.loaded and self.gallery_store.exists():
+            self.load_encodings()
+        with self._gallery_lock:
+            if name not in self.gallery.names:
+                return False
+            self._commit_gallery([("remove", name)])
+            if self.crop_archive and os.path.exists(self.crop_archive):
+                self._archive_gallery_crops([], identities=[name])
+        return True
+
+    def compact_gallery(self):
+        """
+        Réécrit l'instantané complet des signatures, vide le journal des modifications et
+        recalcule la calibration.
+        """
+        with self._gallery_lock:
+            self.gallery_store.compact(self.gallery)
+            self._calibrate(self.gallery)
+
+    @property
+    def calibration_file(self):
+        """Calibration associée à `encoding_file`."""
+        return self.encoding_file + ".calibration.npz"
+
+    def _calibrate(self, gallery):
+        """
+        Calcule la calibration d'un instantané de la base et l'écrit à côté des signatures,
+        si les seuils par identité sont activés (`calibration_sigmas`).
+
+        Les identités ajoutées ou remplacées ensuite par le journal gardent leurs anciennes
+        statistiques (ou le seuil global) jusqu'à la prochaine compaction.
+        """
+        if not self.calibration_sigmas:
+            return
+        calibration = Calibration.compute(gallery)
+        try:
+            if calibration.names:
+                calibration.save(self.calibration_file)
+            elif os.path.exists(self.calibration_file):
+                os.remove(self.calibration_file)
+            self._calibration_signature = file_signature(self.calibration_file)
+        except OSError as e:
+            print(f"Erreur lors de l'écriture de la calibration : {e}")
+        self.calibration = calibration
+
+    def _load_calibration(self):
+        """Relit la calibration si son fichier a changé (un `stat` sinon)."""
+        signature = file_signature(self.calibration_file)
+        if signature != self._calibration_signature:
+            self.calibration = Calibration.load(self.calibration_file) if signature else None
+            self._calibration_signature = signature
+
+    def _encode_identity_images(self, name, images, archived=None):
+        """
+        Encode le premier visage de chaque image ; None si les modèles ne peuvent être chargés.
+
+        :param archived: Liste recevant les visages alignés à archiver (voir `_queue_first_face`).
+        """
+        if not self.detector or not self.recognizer:
+            if not self.load_models():
+                return None
+        if not self.gallery_store.loaded and self.gallery_store.exists():
+            self.load_encodings()
+
+        features, names = [], []
+        pending_crops, pending_names = CropBatch(self.batch_size), []
+        for img in images:
+            if img is None: continue
+            self._queue_first_face(img, name, pending_crops, pending_names, features, names, archived)
+        self._store_features(pending_crops, pending_names, features, names)
+        return features
+
+    def _commit_gallery(self, operations):
+        """
+        Applique des opérations à la base en mémoire, les journalise et compacte si nécessaire.
+
+        L'appelant doit détenir `_gallery_lock`.
+
+        :param operations: Liste d'opérations (voir `Gallery.apply`).
+        """
+        gallery = self.gallery
+        for operation in operations:
+            gallery = gallery.apply(operation)
+        self.gallery = gallery
+
+        store = self.gallery_store
+        store.append(operations)
+        if store.needs_compaction():
+            store.compact(gallery)
+            self._calibrate(gallery)
+
+    def train_faces(self, known_dir, progress_callback=None, identities=None, workers=1):
         """
         Parcourt le répertoire des visages connus pour générer les signatures (encodage).
         
         :param known_dir: Répertoire contenant des sous-dossiers nommés par personne.
+        :param progress_callback: Fonction de rappel pour le suivi de la progression, ou ProgressTracker
+            pour un suivi structuré (avancement image par image, comptes par étape).
+        :param identities: Noms à (ré)encoder uniquement. Les signatures des autres
+            personnes sont conservées ; une identité dont le dossier a disparu est retirée.
+            None (par défaut) reconstruit toute la base.
+        :param workers: Nombre de processus d'apprentissage. Au-delà de 1, les identités sont
+            réparties par tranches entre des processus ayant chacun leurs modèles (chargés par ces
+            seuls processus). Les tranches étant fusionnées dans l'ordre, deux exécutions sur les
+            mêmes dossiers produisent un fichier de signatures identique octet pour octet, quel
+            que soit le nombre de processus.
+        """
+
+        progress = ProgressTracker.wrap(progress_callback)
+
+        if identities is not None:
+            # Entraînement incrémental : on repart de la base existante
+            if not self.known_features:
+                self.load_encodings()
+            identities = set(identities)
+
+        if not os.path.exists(known_dir):
+            progress.log(f"Erreur : Le dossier {known_dir} est introuvable.")
+            return False
+
+        # Ordre trié des identités et des images : la base produite ne dépend pas de l'ordre
+        # de listage du système de fichiers
+        if identities is None:
+            people_dirs = sorted(d for d in os.listdir(known_dir) if os.path.isdir(os.path.join(known_dir, d)))
+        else:
+            people_dirs = [d for d in sorted(identities) if os.path.isdir(os.path.join(known_dir, d))]
+
+        # Liste préalable des images, pour connaître le total à traiter
+        work = []
+        for name in people_dirs:
+            dir_path = os.path.join(known_dir, name)
+            files = sorted(f for f in os.listdir(dir_path) if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+            work.append((name, dir_path, files))
+        progress.start("Apprentissage", sum(len(files) for _, _, files in work))
+
+        # La nouvelle base est construite à part, tranche par tranche, puis publiée en une fois
+        chunks = [work[i:i + TRAIN_CHUNK_IDENTITIES] for i in range(0, len(work), TRAIN_CHUNK_IDENTITIES)]
+        if self.memory_budget and workers > 1:
+            governor = MemoryGovernor(self.memory_budget)
+            allowed = governor.workers(workers, self.batch_size, self.decode_max_side)
+            if allowed < workers:
+                progress.log(f"Budget mémoire : {allowed} processus d'apprentissage au lieu de {workers}.")
+                workers = allowed
+        if workers > 1 and len(chunks) > 1:
+            chunk_results = self._encode_chunks_parallel(chunks, workers, progress)
+            if chunk_results is None:
+                return False
+        else:
+            if not self.detector or not self.recognizer:
+                if not self.load_models():
+                    return False
+            chunk_results = []
+            for chunk in chunks:
+                chunk_results.append(self._encode_chunk(chunk, progress))
+
+        # Fusion dans l'ordre des tranches (donc des identités), quel que soit l'ordre de fin
+        features, names, archived = [], [], []
+        for chunk_features, chunk_names, _, chunk_archived in chunk_results:
+            features.extend(chunk_features)
+            names.extend(chunk_names)
+            archived.extend(chunk_archived)
+        if self.crop_archive:
+            self._archive_gallery_crops(archived, identities)
+
+        if identities is None:
+            self.gallery = Gallery(features, names)
+            self.save_encodings()
+        else:
+            # Seules les identités concernées sont journalisées, sans réécrire toute la base
+            operations = []
+            for name in sorted(identities):
+                identity_features = [f for f, n in zip(features, names) if n == name]
+                if identity_features:
+                    operations.append(("set", name, identity_features))
+                elif name in self.known_names:
+                    operations.append(("remove", name))
+            if operations:
+                with self._gallery_lock:
+                    self._commit_gallery(operations)
+
+        progress.log(f"Entraînement terminé. {len(self.known_features)} signatures sauvegardées.")
+        if self.calibration is not None and self.calibration_sigmas:
+            progress.log(self.calibration.report(self.threshold, self.calibration_sigmas))
+        progress.log(format_peak_rss(workers=workers > 1 and len(chunks) > 1))
+        return True
+
+    def _archive_gallery_crops(self, archived, identities=None):
+        """
+        Archive les visages alignés de l'apprentissage et les rattache à leur identité.
+
+        L'archive suit chaque modification de la base (apprentissage, ajout, remplacement et
+        retrait d'identité), pour que `reembed` reconstruise la même base.
+
+        :param archived: Liste de tuples (empreinte, identité, visage aligné), dans l'ordre de la base.
+        :param identities: Identités remplacées (leurs anciens visages sont détachés) ; vide pour un
+            simple ajout, None pour toute la base.
+        """
+        archive = CropArchive(self.crop_archive)
+        try:
+            rows = archive.add([(digest, 0, crop) for digest, _, crop in archived])
+            archive.set_gallery(
+                [(name, row) for (_, name, _), row in zip(archived, rows)],
+                names=None if identities is None else sorted(identities),
+            )
+        finally:
+            archive.close()
+
+    def _encode_chunk(self, chunk, progress=None):
+        """
+        Encode le premier visage de chaque image d'une tranche d'identités.
+
+        :param chunk: Liste de tuples (nom, dossier, fichiers triés).
+        :param progress: ProgressTracker (mode séquentiel) ; None dans un processus d'apprentissage.
+        :return: (list, list, dict, list): Signatures, noms associés, comptes (images, visages, etc.)
+            et visages alignés à archiver (empreinte, nom, visage) si `crop_archive` est défini.
+        """
+        features, names = [], []
+        archived = [] if self.crop_archive else None
+        counts = {"identités": 0, "visages": 0, "sans visage": 0, "illisibles": 0}
+        max_pixels, batch_size = self._memory_limits()
+        # Les visages alignés sont accumulés dans un tampon contigu puis encodés par lots
+        pending_crops, pending_names = CropBatch(batch_size), []
+
+        def tally(label):
+            counts[label] += 1
+            if progress is not None:
+                progress.count(label)
+
+        for name, dir_path, files in chunk:
+            if progress is not None:
+                progress.log(f"Analyse de : {name}")
+            tally("identités")
+
+            for filename in files:
+                img = DecodedImage.read(os.path.join(dir_path, filename), self.decode_max_side, max_pixels)
+                if img is None:
+                    tally("illisibles")
+                elif self._queue_first_face(img, name, pending_crops, pending_names, features, names, archived,
+                                            batch_size):
+                    tally("visages")
+                else:
+                    tally("sans visage")
+                if progress is not None:
+                    progress.advance()
+
+        self._store_features(pending_crops, pending_names, features, names)
+        return features, names, counts, archived or []
+
+    def _encode_chunks_parallel(self, chunks, workers, progress):
+        """
+        Encode des tranches d'identités dans un pool de processus.
+
+        Chaque processus charge ses propres modèles avec un seul thread OpenCV (pas de
+        sursouscription des cœurs). La progression est agrégée à chaque tranche terminée.
+
+        :return: list: Résultats de `_encode_chunk`, dans l'ordre des tranches, ou None en cas d'erreur.
+        """
+        settings = {
+            "model_dir": self.model_dir,
+            "backend_id": self.backend_id,
+            "target_id": self.target_id,
+            "num_threads": 1,
+            "engine": self.engine,
+            "batch_size": self.batch_size,
+            "decode_max_side": self.decode_max_side,
+            "crop_archive": self.crop_archive,
+            "letterbox": self.letterbox,
+            "memory_budget": self.memory_budget,
+        }
+        results = [None] * len(chunks)
+        # "spawn" : pas de fork d'un processus qui a déjà démarré des threads (Qt, OpenCV)
+        context = multiprocessing.get_context("spawn")
+        progress.log(f"Apprentissage sur {workers} processus ({len(chunks)} tranches)...")
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_train_worker, initargs=(settings,)) as executor:
+                futures = {executor.submit(_train_worker_chunk, chunk): idx for idx, chunk in enumerate(chunks)}
+                try:
+                    for future in as_completed(futures):
+                        idx = futures[future]
+                        chunk_features, chunk_names, counts, archived = future.result()
+                        # Type numpy canonique : le fichier écrit est le même qu'en mode séquentiel
+                        results[idx] = ([f.astype(np.float32) for f in chunk_features], chunk_names, counts, archived)
+                        chunk = chunks[idx]
+                        for label, n in counts.items():
+                            progress.count(label, n)
+                        progress.advance(sum(len(files) for _, _, files in chunk))
+                        progress.log(f"Analysé : {chunk[0][0]} ... {chunk[-1][0]}")
+                except Cancelled:
+                    # Les tranches pas encore commencées sont abandonnées
+                    executor.shutdown(cancel_futures=True)
+                    raise
+        except Cancelled:
+            raise
+        except Exception as e:
+            progress.log(f"Erreur lors de l'apprentissage parallèle : {e}")
+            return None
+        return results
+
+    def train_from_images(self, samples, progress_callback=None):
+        """
+        Génère les signatures à partir d'images déjà décodées en mémoire.
+
+        Variante de `train_faces` qui évite tout passage par le disque : les images
+        (tableaux BGR, par exemple extraits directement d'un trombinoscope PDF) sont
+        encodées telles quelles puis seul le fichier de signatures est écrit.
+
+        :param samples: Itérable de tuples (nom, image BGR sous forme de tableau NumPy).
         :param progress_callback: Fonction de rappel pour le suivi de la progression.
+        :return: bool: True si l'entraînement a abouti.
         """
         if not self.detector or not self.recognizer:
             if not self.load_models():
                 return False
 
-        self.known_features = []
-        self.known_names = []
+        features, names = [], []
+        archived = [] if self.crop_archive else None
+        pending_crops, pending_names = CropBatch(self.batch_size), []
 
-        if not os.path.exists(known_dir):
-            if progress_callback: progress_callback(f"Erreur : Le dossier {known_dir} est introuvable.")
-            return False
+        for idx, (name, img) in enumerate(samples):
+            if progress_callback: progress_callback(f"Analyse de : {name} ({idx+1})")
+            if img is None: continue
 
-        people_dirs = [d for d in os.listdir(known_dir) if os.path.isdir(os.path.join(known_dir, d))]
-        total_people = len(people_dirs)
+            self._queue_first_face(img, name, pending_crops, pending_names, features, names, archived)
+
+        self._store_features(pending_crops, pending_names, features, names)
+        if archived is not None:
+            self._archive_gallery_crops(archived)
+        self.gallery = Gallery(features, names)
+        self.save_encodings()
 
-        for idx, name in enumerate(people_dirs):
-            dir_path = os.path.join(known_dir, name)
-            if progress_callback: progress_callback(f"Analyse de : {name} ({idx+1}/{total_people})")
-            
-            for filename in os.listdir(dir_path):
-                if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-                    continue
-                    
-                filepath = os.path.join(dir_path, filename)
-                img = cv2.imread(filepath)
-                if img is None: continue
-
-                # Détection faciale
-                h, w, _ = img.shape
-                self.detector.setInputSize((w, h))
-                _, faces = self.detector.detect(img)
-                
-                if faces is not None and len(faces) > 0:
-                    # Alignement et extraction des caractéristiques (features)
-                    face_align = self.recognizer.alignCrop(img, faces[0])
-                    face_feature = self.recognizer.feature(face_align)
-                    
-                    self.known_features.append(face_feature)
-                    self.known_names.append(name)
-        
-        # Persistance des données
-        save_dir = os.path.dirname(self.encoding_file)
-        if save_dir and not os.path.exists(save_dir):
-            os.makedirs(save_dir)
-            
-        with open(self.encoding_file, 'wb') as f:
-            pickle.dump((self.known_features, self.known_names), f)
-            
         if progress_callback: progress_callback(f"Entraînement terminé. {len(self.known_features)} signatures sauvegardées.")
         return True
 
-    def process_directory(self, unknown_dir, progress_callback=None):
+    def save_encodings(self):
+        """
+        Écrit toutes les signatures connues dans le fichier de stockage (compaction du journal).
+        """
+        self.compact_gallery()
+
+    def reembed(self, progress_callback=None, batch_size=256):
+        """
+        Reconstruit la base de signatures à partir de l'archive des visages alignés, sans relire
+        ni redétecter les photos (par exemple après un changement de modèle d'encodage).
+
+        Les visages archivés sont encodés par grands lots. Si une base de résultats est
+        configurée, les visages des photos triées y sont aussi réidentifiés avec la nouvelle
+        base (les fichiers ne sont pas renommés).
+
+        :param progress_callback: Fonction de rappel pour le suivi de la progression, ou ProgressTracker.
+        :param batch_size: Nombre de visages encodés par lot.
+        :return: bool: True si la base a été reconstruite.
+        """
+        progress = ProgressTracker.wrap(progress_callback)
+        if not self.crop_archive or not os.path.exists(self.crop_archive):
+            progress.log("Erreur : Aucune archive de visages alignés. Lancez l'entraînement d'abord.")
+            return False
+        if not self.recognizer:
+            if not self.load_models():
+                return False
+
+        archive = CropArchive(self.crop_archive)
+        results = ResultsDatabase(self.results_db) if self.results_db else None
+        try:
+            gallery_rows = archive.gallery()
+            if not gallery_rows:
+                progress.log("Erreur : L'archive ne contient aucun visage de référence.")
+                return False
+            # Une base modifiée sans l'archive (créée plus tard, ou par un processus sans archive)
+            # serait écrasée : mieux vaut refuser
+            if not self.gallery_store.loaded and self.gallery_store.exists():
+                self.load_encodings()
+            if self.gallery_store.loaded:
+                self.refresh_gallery()
+                current, stored = Counter(self.known_names), Counter(name for name, _ in gallery_rows)
+                if current != stored:
+                    differing = sorted(set((current - stored) + (stored - current)))
+                    progress.log("Erreur : La base de signatures ne correspond pas à l'archive des visages "
+                                 f"({', '.join(differing)}). Relancez l'apprentissage complet.")
+                    return False
+            # Seuls les visages des photos présentes dans la base de résultats sont réidentifiés
+            faces = []
+            if results is not None:
+                known_hashes = results.hashes()
+                faces = [face for face in archive.faces() if face[0] in known_hashes]
+            progress.start("Réencodage", len(gallery_rows) + len(faces))
+
+            features = []
+            for crops in archive.iter_batches([row for _, row in gallery_rows], batch_size):
+                features.extend(self._embed_crops(crops))
+                progress.advance(len(crops))
+            self.gallery = Gallery(features, [name for name, _ in gallery_rows])
+            self.save_encodings()
+            progress.log(f"Réencodage terminé. {len(features)} signatures sauvegardées.")
+
+            if faces:
+                gallery = self.gallery
+                updates = []
+                for start, crops in zip(range(0, len(faces), batch_size),
+                                        archive.iter_batches([row for _, _, row in faces], batch_size)):
+                    for (digest, face, _), feat in zip(faces[start:start + batch_size], self._embed_crops(crops)):
+                        updates.append((digest, face, *self._match_feature(feat, gallery)))
+                    progress.advance(len(crops))
+                updated = results.update_identities(updates)
+                progress.log(f"{updated} visages réidentifiés dans la base de résultats.")
+        finally:
+            archive.close()
+            if results is not None:
+                results.close()
+        return True
+
+    def _queue_first_face(self, img, name, pending_crops, pending_names, features, names, archived=None,
+                          batch_size=None):
+        """
+        Aligne le premier visage détecté d'une image d'apprentissage et le met en attente d'encodage.
+
+        Le lot est encodé dès qu'il atteint `batch_size` visages.
+
+        :param img: Image BGR (tableau NumPy) ou DecodedImage.
+        :param name: Identité associée à l'image.
+        :param pending_crops: CropBatch des visages alignés en attente (modifié sur place).
+        :param pending_names: Liste des identités en attente (modifiée sur place).
+        :param features: Liste recevant les signatures encodées.
+        :param names: Liste recevant les identités correspondantes.
+        :param archived: Liste recevant (empreinte, nom, visage aligné) pour l'archive des visages
+            (optionnel). L'empreinte est celle du fichier source, ou à défaut de l'image décodée.
+        :param batch_size: Taille des lots d'encodage (par défaut, `batch_size` du gestionnaire).
+        :return: bool: True si un visage a été trouvé.
+        """
+        if not isinstance(img, DecodedImage):
+            img = DecodedImage(None, img)
+
+        # Détection faciale
+        faces = self._detect(img.image)
+        if len(faces) == 0:
+            return False
+
+        # Alignement ; l'extraction des caractéristiques (features) est faite par lots
+        img.align_into(pending_crops, faces[:1])
+        if archived is not None:
+            digest = file_hash(img.path) if img.path is not None else array_hash(img.image)
+            archived.append((digest, name, pending_crops.crops[-1].copy()))
+        pending_names.append(name)
+        if len(pending_crops) >= (batch_size or self.batch_size):
+            self._store_features(pending_crops, pending_names, features, names)
+        return True
+
+    def _store_features(self, pending_crops, pending_names, features, names):
+        """Encode les visages en attente, les ajoute à `features`/`names` et vide le lot."""
+        if not pending_crops:
+            return
+        features.extend(self._embed_crops(pending_crops.crops))
+        names.extend(pending_names)
+        pending_crops.clear()
+        pending_names.clear()
+
+    def _memory_limits(self):
+        """
+        :return: (int, int): Nombre maximal de pixels d'une image à détecter (None = illimité) et
+            taille des lots d'encodage, d'après `memory_budget`.
+        """
+        if not self.memory_budget:
+            return None, self.batch_size
+        governor = MemoryGovernor(self.memory_budget)
+        return governor.detection_pixels(), governor.batch_size(self.batch_size)
+
+    def _detect(self, image):
+        """
+        Détecte les visages d'une image, à sa taille exacte ou dans son format fixe (mode `letterbox`).
+
+        :param image: Image BGR.
+        :return: Détections YuNet (F, 15) dans les coordonnées de l'image (tableau vide si aucune).
+        """
+        scale = 1.0
+        if self.buckets is not None:
+            image, scale = self.buckets.fit(image)
+        h, w = image.shape[:2]
+        self.detector.setInputSize((w, h))
+        _, faces = self.detector.detect(image)
+        if faces is None:
+            return np.empty((0, 15), dtype=np.float32)
+        return DetectionBuckets.to_image_coordinates(faces, scale)
+
+    def _embed_crops(self, crops):
+        """
+        Calcule les signatures d'une liste de visages alignés.
+
+        :param crops: Visages alignés (N, 112, 112, 3), BGR.
+        :return: Liste de signatures au format de `FaceRecognizerSF.feature` (tableaux 1x128).
+        """
+        if self.embedder is not None:
+            features = self.embedder.embed(crops)
+            return [features[i:i + 1] for i in range(len(features))]
+        return [self.recognizer.feature(crop) for crop in crops]
+
+    def _match_feature(self, unknown_feat, gallery=None):
+        """
+        Compare une signature à la base connue.
+
+        :param unknown_feat: Signature du visage à identifier.
+        :param gallery: Instantané de la base à utiliser (par défaut, l'instantané courant).
+        :return: (str, float): Nom reconnu (ou "Inconnu") et meilleur score cosinus.
+        """
+        if gallery is None:
+            gallery = self.gallery
+
+        # Comparaison avec les signatures connues
+        scores = [self.recognizer.match(known_feat, unknown_feat, cv2.FaceRecognizerSF_FR_COSINE)
+                  for known_feat in gallery.features]
+        if not scores:
+            return "Inconnu", 0.0
+        best = int(np.argmax(scores))  # Premier meilleur score
+        name = gallery.names[best]
+        runner_up = None
+        if self.margin:
+            runner_up = max((score for score, other in zip(scores, gallery.names) if other != name), default=None)
+        return self._decide(name, scores[best], runner_up)
+
+    def _decide(self, name, score, runner_up=None):
+        """
+        Règle de décision appliquée au meilleur score d'un visage, à partir de scores déjà calculés.
+
+        :param name: Identité de la signature la plus proche.
+        :param score: Score cosinus de cette signature.
+        :param runner_up: Meilleur score d'une autre identité (None si inconnu ou sans objet).
+        :return: (str, float): `name`, ou "Inconnu" si le score ne dépasse pas le seuil de l'identité
+            (seuil global, relevé par la calibration) ou si une autre identité est à moins de `margin` ;
+            et le meilleur score (0.0 s'il n'est pas positif).
+        """
+        if score <= 0:
+            return "Inconnu", 0.0
+        if score <= max(self.threshold, self._identity_bounds().get(name, self.threshold)):
+            return "Inconnu", score
+        if self.margin and runner_up is not None and score - runner_up < self.margin:
+            return "Inconnu", score
+        return name, score
+
+    def _identity_bounds(self):
+        """:return: dict: Score minimal calibré de chaque identité (vide sans calibration)."""
+        if self.calibration is None or not self.calibration_sigmas:
+            return {}
+        calibration, sigmas, bounds = self._bounds
+        if calibration is not self.calibration or sigmas != self.calibration_sigmas:
+            bounds = self.calibration.bounds(self.calibration_sigmas)
+            self._bounds = (self.calibration, self.calibration_sigmas, bounds)
+        return bounds
+
+    def _match_features(self, features, gallery, recent=None):
+        """
+        Identifie un lot de signatures : liste courte, comparaison vectorisée (modes `gallery_shards`
+        et `match_batch`, produits matriciels de blocs pour tout le lot) ou signature par signature.
+
+        :param features: Signatures des visages à identifier.
+        :param gallery: Instantané de la base.
+        :param recent: RecentIdentities à consulter avant la recherche complète (optionnel).
+        :return: list: Tuples (nom, score), comme `_match_feature`.
+        """
+        if recent is not None:
+            return [recent.match(self, feat, gallery) for feat in features]
+        if self._matcher is None or not len(features) or not gallery.features:
+            return [self._match_feature(feat, gallery) for feat in features]
+        # Avec une marge, le top-k doit contenir la meilleure autre identité : une signature de plus
+        # que l'identité qui en compte le plus
+        if self._top_k_depth[0] is not gallery:
+            self._top_k_depth = (gallery, 1 + max(Counter(gallery.names).values()))
+        indices, scores = self._matcher.top_k(gallery, features, k=self._top_k_depth[1] if self.margin else 1)
+        results = []
+        for row_indices, row_scores in zip(indices.tolist(), scores.tolist()):
+            name = gallery.names[row_indices[0]]
+            runner_up = next((score for idx, score in zip(row_indices[1:], row_scores[1:])
+                              if gallery.names[idx] != name), None)
+            results.append(self._decide(name, row_scores[0], runner_up))
+        return results
+
+    def open_matcher(self):
+        """
+        Ouvre la comparaison vectorisée à la base (modes `gallery_shards` et `match_batch`) si elle ne
+        l'est pas déjà ; sans `gallery_shards`, elle a lieu dans le processus courant.
+
+        :return: bool: True si elle vient d'être ouverte (l'appelant la ferme avec `close_matcher`).
+        """
+        if not (self.gallery_shards or self.match_batch) or self._matcher is not None:
+            return False
+        self._matcher = ShardedMatcher(max(1, self.gallery_shards))
+        return True
+
+    def close_matcher(self):
+        """Arrête les processus de comparaison et libère la base partagée."""
+        if self._matcher is not None:
+            self._matcher.close()
+            self._matcher = None
+
+    def process_directory(self, unknown_dir, progress_callback=None, shortlist=0, export=None):
         """
         Traite les images d'un répertoire cible, identifie les personnes et renomme les fichiers.
         
         :param unknown_dir: Répertoire contenant les images à identifier.
-        :param progress_callback: Fonction de rappel pour le suivi de la progression.
+        :param progress_callback: Fonction de rappel pour le suivi de la progression, ou ProgressTracker
+            pour un suivi structuré (avancement image par image, comptes par étape).
+        :param shortlist: Nombre d'identités récentes comparées en premier (0 = recherche exhaustive).
+            Les images sont alors traitées dans l'ordre de prise de vue (EXIF, à défaut date de
+            modification) ; les résultats sont identiques à ceux de la recherche exhaustive.
+            Sinon, en mode `letterbox`, les images sont traitées par format d'entrée du détecteur.
+        :param export: Fichier où exporter les résultats au fil du traitement (`.jsonl` ou `.csv`,
+            suivi de `.gz` pour compresser), ou None.
+        :return: list: Tuples (chemin final, noms reconnus) des images de ce tri, aussi conservés
+            dans `processed_images` jusqu'au tri suivant (liste vide si le tri n'a pas eu lieu).
         """
+        progress = ProgressTracker.wrap(progress_callback)
+        self.refresh_gallery()
         if not self.known_features:
-            if progress_callback: progress_callback("Erreur : Aucune signature chargée. Lancez l'entraînement d'abord.")
-            return
+            progress.log("Erreur : Aucune signature chargée. Lancez l'entraînement d'abord.")
+            return []
 
         if not os.path.exists(unknown_dir):
-            if progress_callback: progress_callback(f"Dossier introuvable : {unknown_dir}")
-            return
+            progress.log(f"Dossier introuvable : {unknown_dir}")
+            return []
 
-        # Réinitialiser la liste des images traitées
-        self.processed_images = []
+        # Nouvelle liste des images traitées : celle d'un tri précédent reste à qui l'a reçue
+        processed = self.processed_images = []
 
         files = [f for f in os.listdir(unknown_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
         total_files = len(files)
+
+        # Mode liste courte : les photos d'un même événement, prises à la suite, montrent
+        # souvent les mêmes personnes
+        recent = None
+        if shortlist:
+            recent = RecentIdentities(shortlist)
+            files.sort(key=lambda f: (capture_time(os.path.join(unknown_dir, f)), f))
+        elif self.buckets is not None:
+            # Images regroupées par format d'entrée du détecteur (lu dans l'en-tête) : le
+            # détecteur ne change de taille qu'une fois par format
+            files.sort(key=lambda f: (self.buckets.key(os.path.join(unknown_dir, f), self.decode_max_side), f))
+
+        # Résultats enregistrés en base, une transaction par lot
+        results = None
+        if self.results_db:
+            results = ResultsDatabase(self.results_db)
+            results.start_run(unknown_dir)
+        archive = CropArchive(self.crop_archive) if self.crop_archive else None
+        governor = MemoryGovernor(self.memory_budget) if self.memory_budget else None
+        exporter = ResultsExporter(export) if export else None
+        opened_matcher = self.open_matcher()
+
+        try:
+            renamed_count = self._process_files(unknown_dir, files, results, progress, recent, archive, governor,
+                                                exporter)
+            if self._matcher is not None:
+                progress.log(self._matcher.report())
+        finally:
+            if exporter is not None:
+                exporter.close()
+            if opened_matcher:
+                self.close_matcher()
+            if results is not None:
+                results.finish_run()
+                results.close()
+            if archive is not None:
+                archive.close()
+
+        progress.log(f"Traitement terminé. {renamed_count} images identifiées sur {total_files}.")
+        if exporter is not None:
+            progress.log(exporter.report())
+        if recent is not None:
+            progress.log(recent.report())
+        if governor is not None:
+            progress.log(governor.report())
+        progress.log(format_peak_rss())
+        return processed
+
+    def _process_files(self, unknown_dir, files, results=None, progress_callback=None, recent=None, archive=None,
+                       governor=None, exporter=None):
+        """
+        Détecte les visages de chaque image et identifie les images par lots.
+
+        :param unknown_dir: Répertoire des images.
+        :param files: Noms des fichiers image à traiter.
+        :param results: ResultsDatabase où enregistrer les résultats (optionnel).
+        :param progress_callback: Fonction de rappel ou ProgressTracker pour le suivi de la progression.
+        :param recent: RecentIdentities à consulter avant la recherche complète (optionnel).
+        :param archive: CropArchive recevant les visages alignés (optionnel).
+        :param governor: MemoryGovernor limitant la résolution de détection, les lots et le préchargement (optionnel).
+        :param exporter: ResultsExporter recevant les résultats de chaque image (optionnel).
+        :return: int: Nombre d'images renommées.
+        """
+        progress = ProgressTracker.wrap(progress_callback)
+        progress.start("Tri", len(files))
         renamed_count = 0
+        if governor is not None:
+            max_pixels, batch_size = governor.detection_pixels(), governor.batch_size(self.batch_size)
+        else:
+            max_pixels, batch_size = None, self.batch_size
 
-        for idx, filename in enumerate(files):
-            filepath = os.path.join(unknown_dir, filename)
-            
-            if progress_callback and idx % 5 == 0: 
-                progress_callback(f"Traitement en cours : {idx+1}/{total_files}...")
+        # Images en attente : les visages de plusieurs images sont alignés dans un même tampon
+        # puis encodés ensemble
+        pending_images, pending_crops = [], CropBatch(batch_size)
+        # Mode match_batch : images encodées et leurs signatures, en attente de comparaison
+        probes = ([], []) if self.match_batch and recent is None else None
 
-            img = cv2.imread(filepath)
-            if img is None: continue
+        # Décodage réduit pour la détection, fait d'avance dans un thread ; la pleine résolution
+        # n'est décodée que si un visage est trop petit pour être aligné à cette échelle
+        images = prefetch_images(
+            [os.path.join(unknown_dir, filename) for filename in files],
+            lambda path: DecodedImage.read(path, self.decode_max_side, max_pixels),
+            governor=governor,
+        )
+        for filepath, img in images:
+            filename = os.path.basename(filepath)
+            if img is None:
+                progress.advance()
+                progress.count("illisibles")
+                if exporter is not None:
+                    exporter.write_image(filename, filepath, status=UNREADABLE)
+                continue
 
-            # Mise à jour de la taille d'entrée pour le détecteur
-            h, w, _ = img.shape
-            self.detector.setInputSize((w, h))
-            _, faces = self.detector.detect(img)
+            faces = self._detect(img.image)
+            progress.advance()
 
-            if faces is None or len(faces) == 0:
+            if len(faces) == 0:
+                progress.count("sans visage")
+                if exporter is not None:
+                    exporter.write_image(filename, filepath, status=NO_FACE)
                 continue
+            progress.count("visages", len(faces))
+
+            # Empreinte du contenu, calculée avant un éventuel renommage
+            digest = file_hash(filepath) if results is not None or archive is not None else None
+            pending_images.append((filename, img.to_full_coordinates(faces), digest))
+            img.align_into(pending_crops, faces)
+
+            if len(pending_crops) >= batch_size:
+                renamed = self._identify_pending(unknown_dir, pending_images, pending_crops, progress, results, recent,
+                                                 archive, exporter, probes, final=False)
+                progress.count("renommées", renamed)
+                renamed_count += renamed
+
+        renamed = self._identify_pending(unknown_dir, pending_images, pending_crops, progress, results, recent,
+                                         archive, exporter, probes)
+        progress.count("renommées", renamed)
+        return renamed_count + renamed
 
+    def _identify_pending(self, unknown_dir, pending_images, pending_crops, progress_callback=None, results=None,
+                          recent=None, archive=None, exporter=None, probes=None, final=True):
+        """
+        Encode les visages en attente, identifie les personnes et renomme les images correspondantes.
+
+        :param unknown_dir: Répertoire des images traitées.
+        :param pending_images: Liste de tuples (nom de fichier, détections YuNet en pleine résolution,
+            empreinte du contenu ou None), vidée après traitement.
+        :param pending_crops: CropBatch des visages de ces images, dans le même ordre, vidé après traitement.
+        :param progress_callback: Fonction de rappel pour le suivi de la progression.
+        :param results: ResultsDatabase où enregistrer le lot (optionnel).
+        :param recent: RecentIdentities à consulter avant la recherche complète (optionnel).
+        :param archive: CropArchive recevant les visages alignés du lot (optionnel).
+        :param exporter: ResultsExporter recevant les résultats du lot, image par image (optionnel).
+        :param probes: Mode `match_batch` : tuple (images, signatures) où les lots encodés s'accumulent ;
+            la comparaison n'a lieu qu'au-delà de `match_batch` visages, ou pour le dernier lot.
+        :param final: Dernier lot du traitement (les visages accumulés sont comparés quel que soit leur nombre).
+        :return: int: Nombre d'images renommées.
+        """
+        if archive is not None:
+            entries = []
+            start = 0
+            for _, faces, digest in pending_images:
+                for face_idx in range(len(faces)):
+                    entries.append((digest, face_idx, pending_crops.crops[start + face_idx]))
+                start += len(faces)
+            archive.add(entries)
+        features = self._embed_crops(pending_crops.crops)
+        if probes is not None:
+            probe_images, probe_features = probes
+            probe_images.extend(pending_images)
+            probe_features.extend(features)
+            pending_images.clear()
+            pending_crops.clear()
+            if not final and len(probe_features) < self.match_batch:
+                return 0
+            pending_images, features = probe_images[:], probe_features[:]
+            probe_images.clear()
+            probe_features.clear()
+        # Un même instantané pour tout le lot, même si la base est modifiée entre-temps
+        gallery = self.gallery
+        matches = self._match_features(features, gallery, recent)
+        renamed_count = 0
+        offset = 0
+        records = []
+
+        for filename, faces, digest in pending_images:
+            filepath = os.path.join(unknown_dir, filename)
             found_names_in_image = set()
+            face_results = []
 
-            for face in faces:
-                face_align = self.recognizer.alignCrop(img, face)
-                unknown_feat = self.recognizer.feature(face_align)
-                
-                best_score = 0.0
-                best_name = "Inconnu"
-                
-                # Comparaison avec les signatures connues
-                for i, known_feat in enumerate(self.known_features):
-                    score = self.recognizer.match(known_feat, unknown_feat, cv2.FaceRecognizerSF_FR_COSINE)
-                    
-                    if score > best_score:
-                        best_score = score
-                        if score > self.threshold:
-                            best_name = self.known_names[i]
-                
+            image_matches = matches[offset:offset + len(faces)]
+            for face, (best_name, best_score) in zip(faces, image_matches):
+                face_results.append((face[:4], best_name, best_score))
                 if best_name != "Inconnu":
                     found_names_in_image.add(best_name)
+            offset += len(faces)
 
             # Renommage du fichier si des visages sont identifiés
             new_filepath = filepath  # Par défaut, le fichier n'est pas renommé
@@ -239,8 +1165,106 @@ class FaceRecognizerManager:
             # Stocker le résultat (chemin final, noms reconnus)
             sorted_names = sorted(list(found_names_in_image)) if found_names_in_image else ["Inconnu"]
             self.processed_images.append((new_filepath, sorted_names))
+            if results is not None:
+                records.append((new_filepath, digest, face_results))
+            if exporter is not None:
+                exporter.write_image(filename, new_filepath,
+                                     [(face, name, score) for face, (name, score) in zip(faces, image_matches)])
+
+        if results is not None:
+            results.record_images(records)
+        pending_images.clear()
+        pending_crops.clear()
+        return renamed_count
 
-        if progress_callback: progress_callback(f"Traitement terminé. {renamed_count} images identifiées sur {total_files}.")
+    def process_video(self, video_path, sample_fps=2.0, progress_callback=None):
+        """
+        Identifie les personnes apparaissant dans une vidéo et construit leur chronologie.
+
+        Les images sont échantillonnées à `sample_fps` (les autres sont sautées sans
+        être décodées), les visages sont suivis d'une image à l'autre et l'encodage
+        SFace n'a lieu qu'une fois par piste plutôt qu'à chaque image.
+
+        :param video_path: Chemin du fichier vidéo.
+        :param sample_fps: Nombre d'images analysées par seconde de vidéo.
+        :param progress_callback: Fonction de rappel pour le suivi de la progression.
+        :return: dict: Rapport (chronologie nom -> [(début, fin)] en secondes, statistiques), ou None en cas d'erreur.
+        """
+        self.refresh_gallery()
+        if not self.known_features:
+            if progress_callback: progress_callback("Erreur : Aucune signature chargée. Lancez l'entraînement d'abord.")
+            return None
+
+        capture = cv2.VideoCapture(video_path)
+        if not capture.isOpened():
+            if progress_callback: progress_callback(f"Vidéo illisible : {video_path}")
+            return None
+
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = max(1, int(round(fps / sample_fps)))
+
+        tracker = FaceTracker()
+        crops = CropBatch(self.batch_size)
+        frame_idx = 0
+        sampled = 0
+        detections = 0
+        embeddings = 0
+        start = time.perf_counter()
+
+        while True:
+            # Les images non échantillonnées sont seulement avancées (pas de décodage)
+            if frame_idx % step:
+                if not capture.grab():
+                    break
+                frame_idx += 1
+                continue
+
+            ok, frame = capture.read()
+            if not ok:
+                break
+
+            faces = self._detect(frame)
+            detections += len(faces)
+
+            to_embed = tracker.update(faces, frame_idx)
+            if to_embed:
+                crops.add(frame, faces[[f_idx for f_idx, _ in to_embed]])
+                for (_, track), feature in zip(to_embed, self._embed_crops(crops.crops)):
+                    track.name, track.score = self._match_feature(feature)
+                embeddings += len(to_embed)
+                crops.clear()
+
+            sampled += 1
+            if progress_callback and sampled % 50 == 0:
+                progress_callback(f"Vidéo : image {frame_idx+1}/{total_frames}...")
+            frame_idx += 1
+
+        capture.release()
+        tracker.close()
+        elapsed = time.perf_counter() - start
+
+        report = {
+            "video": video_path,
+            "timeline": build_timeline(tracker.finished, fps, gap=step / fps),
+            "frames": frame_idx,
+            "frames_sampled": sampled,
+            "frames_per_second": sampled / elapsed if elapsed > 0 else 0.0,
+            "tracks": len(tracker.finished),
+            "embeddings": embeddings,
+            "embeddings_skipped": detections - embeddings,
+        }
+        self.processed_videos.append(report)
+
+        if progress_callback:
+            progress_callback(
+                f"Vidéo traitée : {sampled} images analysées ({report['frames_per_second']:.1f} img/s), "
+                f"{report['tracks']} pistes, {embeddings} encodages ({report['embeddings_skipped']} évités par le suivi)."
+            )
+            for name, spans in sorted(report["timeline"].items()):
+                periods = ", ".join(f"{a:.1f}s-{b:.1f}s" for a, b in spans)
+                progress_callback(f"  {name} : {periods}")
+        return report
 
     def _rename_file(self, directory, filename, found_names):
         """
@@ -0,0 +1,145 @@
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+# Mémoire d'un processus au repos : Python, OpenCV, NumPy et les deux modèles chargés (~140 Mo mesurés)
+PROCESS_BASELINE_BYTES = 160 * MB
+# Mémoire de travail de YuNet par pixel d'entrée (~62 o/px mesurés en 640x480, ~85 o/px en 4K)
+DETECTOR_BYTES_PER_PIXEL = 85
+# Image BGR décodée, par pixel
+DECODED_BYTES_PER_PIXEL = 3
+# Par visage d'un lot d'encodage : visage aligné, activations de SFace et résultats en attente
+EMBED_BYTES_PER_FACE = 2 * MB
+# La détection n'est jamais réduite en deçà, quel que soit le budget
+MIN_DETECTION_PIXELS = 640 * 480
+# Répartition de la marge du budget (au-delà de PROCESS_BASELINE_BYTES) entre la détection
+# (image décodée et réseau), les images décodées d'avance et le lot d'encodage
+DETECTION_SHARE = 0.5
+PREFETCH_SHARE = 0.25
+BATCH_SHARE = 0.25
+
+
+def peak_rss(children=False):
+    """
+    :param children: Pic des processus enfants terminés (processus d'apprentissage) plutôt que du processus courant.
+    :return: int: Pic de mémoire résidente en octets, ou None si indisponible (Windows).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Kio sous Linux, octets sous macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def format_peak_rss(workers=False):
+    """Pic de mémoire résidente, lisible, pour le résumé d'un traitement."""
+    peak = peak_rss()
+    if peak is None:
+        return "Pic de mémoire : indisponible sur ce système."
+    text = f"Pic de mémoire : {peak / MB:.0f} Mo"
+    children = peak_rss(children=True) if workers else None
+    if children:
+        text += f" (processus d'apprentissage : {children / MB:.0f} Mo chacun au plus)"
+    return text + "."
+
+
+class MemoryGovernor:
+    """
+    Budget mémoire d'un traitement : résolution de détection, taille des lots d'encodage,
+    profondeur de préchargement et nombre de processus.
+
+    Les décisions ne dépendent que du budget (et non de la mémoire mesurée) : chaque
+    processus d'apprentissage en déduit les mêmes réglages, et les signatures ne
+    dépendent pas du nombre de processus. La détection et les lots d'encodage sont
+    seulement dimensionnés (plafonds de pixels et de visages), pas comptés. Seules les
+    images décodées d'avance sont comptées en octets, pendant le traitement : le
+    préchargement attend qu'une place se libère dans sa part du budget
+    (`acquire_prefetch`, `release_prefetch`). Le budget est donc une cible de
+    dimensionnement, pas une limite garantie de la mémoire du processus.
+    """
+
+    def __init__(self, budget):
+        """
+        :param budget: Budget mémoire total du traitement, en octets.
+        """
+        self.budget = budget
+        self.available = max(0, budget - PROCESS_BASELINE_BYTES)
+        self.prefetch_bytes = int(self.available * PREFETCH_SHARE)
+        self.prefetched = 0
+        self.peak_prefetched = 0
+        self.waits = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def detection_pixels(self):
+        """:return: int: Nombre maximal de pixels d'une image passée au détecteur."""
+        per_pixel = DETECTOR_BYTES_PER_PIXEL + DECODED_BYTES_PER_PIXEL
+        return max(MIN_DETECTION_PIXELS, int(self.available * DETECTION_SHARE / per_pixel))
+
+    def batch_size(self, requested):
+        """:return: int: Taille des lots d'encodage, au plus `requested`."""
+        return max(1, min(requested, int(self.available * BATCH_SHARE // EMBED_BYTES_PER_FACE)))
+
+    def workers(self, requested, batch_size, max_side=None):
+        """
+        :param requested: Nombre de processus demandé.
+        :param batch_size: Taille de lot demandée.
+        :param max_side: `decode_max_side` du gestionnaire : le grand côté d'une image décodée reste
+            inférieur au double (None = pleine résolution, limitée par le budget seulement).
+        :return: int: Nombre de processus d'apprentissage tenant dans le budget, au plus `requested`
+            (chacun avec ses modèles, une détection de la plus grande image possible et un lot
+            d'encodage en cours).
+        """
+        pixels = self.detection_pixels()
+        if max_side:
+            # Pire cas 4:3 d'une image décodée réduite
+            pixels = min(pixels, (2 * max_side) ** 2 * 3 // 4)
+        per_worker = (
+            PROCESS_BASELINE_BYTES
+            + pixels * (DETECTOR_BYTES_PER_PIXEL + DECODED_BYTES_PER_PIXEL)
+            + self.batch_size(batch_size) * EMBED_BYTES_PER_FACE
+        )
+        return max(1, min(requested, int(self.available // per_worker)))
+
+    def acquire_prefetch(self, nbytes):
+        """
+        Réserve la place d'une image décodée d'avance, en attendant si la part du préchargement
+        est pleine (une image est toujours admise si aucune n'est en attente).
+
+        :param nbytes: Taille de l'image en octets.
+        :return: bool: False si le traitement est terminé (`close`).
+        """
+        with self._cond:
+            while self.prefetched and self.prefetched + nbytes > self.prefetch_bytes and not self._closed:
+                self.waits += 1
+                self._cond.wait()
+            if self._closed:
+                return False
+            self.prefetched += nbytes
+            self.peak_prefetched = max(self.peak_prefetched, self.prefetched)
+            return True
+
+    def release_prefetch(self, nbytes):
+        """Libère la place d'une image décodée d'avance, une fois traitée."""
+        with self._cond:
+            self.prefetched -= nbytes
+            self._cond.notify_all()
+
+    def close(self):
+        """Débloque un préchargement en attente (fin ou interruption du traitement)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def report(self):
+        """Résumé lisible des réglages déduits du budget et de l'occupation du préchargement (seule mesurée)."""
+        return (f"Budget mémoire {self.budget / MB:.0f} Mo : détection limitée à "
+                f"{self.detection_pixels() / 1e6:.1f} Mpx, préchargement au plus {self.peak_prefetched / MB:.0f} Mo "
+                f"en attente (sur {self.prefetch_bytes / MB:.0f} Mo, {self.waits} attentes).")
+
@@ -0,0 +1,147 @@
+import threading
+import time
+
+
+class Cancelled(Exception):
+    """Levée dans un traitement dont le suivi a été annulé (voir `ProgressTracker.cancel`)."""
+
+
+class ProgressTracker:
+    """
+    Canal de progression structuré partagé entre un traitement et son interface.
+
+    Le traitement met à jour des compteurs (avancement, comptes par étape) et ajoute
+    des lignes de journal sans rien afficher lui-même ; l'interface relève l'état à
+    intervalle fixe (`snapshot`, `drain_logs`), quel que soit le débit du traitement.
+
+    Utilisé avec une fonction de rappel texte (console, `print`), il lui transmet les
+    lignes de journal et un résumé de l'avancement au plus une fois par `text_interval`.
+    L'objet est appelable : `tracker(message)` équivaut à `tracker.log(message)`, ce
+    qui le rend utilisable partout où un `progress_callback` est attendu.
+
+    Il transmet aussi l'annulation : après `cancel()`, le prochain `advance()` du
+    traitement lève `Cancelled`, qui remonte à travers ses blocs `finally` (fichiers
+    fermés, base des résultats terminée). Le travail déjà fait est conservé.
+    """
+
+    def __init__(self, callback=None, text_interval=1.0):
+        """
+        :param callback: Fonction recevant les messages texte ; None pour les conserver
+            jusqu'au prochain `drain_logs` (mode interface graphique).
+        :param text_interval: Intervalle minimal, en secondes, entre deux résumés texte.
+        """
+        self.callback = callback
+        self.text_interval = text_interval
+        self._lock = threading.Lock()
+        self._logs = []
+        self._last_text = None  # Date du dernier résumé texte (None : aucun pour cette étape)
+        self.stage = ""
+        self.done = 0
+        self.total = 0
+        self.counts = {}
+        self._start = time.perf_counter()
+        self._cancelled = threading.Event()
+
+    @classmethod
+    def wrap(cls, progress_callback):
+        """
+        Retourne un ProgressTracker pour un `progress_callback` quelconque.
+
+        :param progress_callback: ProgressTracker (retourné tel quel), fonction texte ou None.
+        """
+        if isinstance(progress_callback, cls):
+            return progress_callback
+        return cls(progress_callback or (lambda message: None))
+
+    def __call__(self, message):
+        self.log(message)
+
+    def log(self, message):
+        """Ajoute une ligne au journal."""
+        if self.callback is not None:
+            self.callback(message)
+            return
+        with self._lock:
+            self._logs.append(message)
+
+    def start(self, stage, total):
+        """
+        Démarre une nouvelle étape.
+
+        :param stage: Libellé de l'étape (ex. "Tri").
+        :param total: Nombre d'éléments à traiter.
+        """
+        with self._lock:
+            self.stage = stage
+            self.done = 0
+            self.total = total
+            self.counts = {}
+            self._start = time.perf_counter()
+            self._last_text = None
+
+    def advance(self, n=1):
+        """Signale `n` éléments supplémentaires traités ; lève `Cancelled` si le suivi a été annulé."""
+        if self._cancelled.is_set():
+            raise Cancelled()
+        with self._lock:
+            self.done += n
+        self._maybe_report()
+
+    def cancel(self):
+        """Demande l'arrêt du traitement suivi, au prochain `advance()` (appelable depuis un autre thread)."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        """True si l'arrêt a été demandé."""
+        return self._cancelled.is_set()
+
+    def count(self, label, n=1):
+        """Incrémente un compteur de l'étape (ex. "visages", "renommées")."""
+        with self._lock:
+            self.counts[label] = self.counts.get(label, 0) + n
+
+    def snapshot(self):
+        """
+        :return: dict: stage, done, total, elapsed (s), rate (éléments/s), eta (s ou None), counts.
+        """
+        with self._lock:
+            elapsed = time.perf_counter() - self._start
+            rate = self.done / elapsed if elapsed > 0 else 0.0
+            remaining = self.total - self.done
+            return {
+                "stage": self.stage,
+                "done": self.done,
+                "total": self.total,
+                "elapsed": elapsed,
+                "rate": rate,
+                "eta": remaining / rate if rate > 0 and remaining > 0 else None,
+                "counts": dict(self.counts),
+            }
+
+    def drain_logs(self):
+        """Retourne et vide les lignes de journal accumulées."""
+        with self._lock:
+            logs, self._logs = self._logs, []
+        return logs
+
+    def format(self, snapshot=None):
+        """Résumé lisible de l'avancement, ex. "Tri : 120/500 (24.1 img/s, reste 0:16) - visages : 130"."""
+        snapshot = snapshot or self.snapshot()
+        text = f"{snapshot['stage']} : {snapshot['done']}/{snapshot['total']} ({snapshot['rate']:.1f} img/s"
+        if snapshot["eta"] is not None:
+            minutes, seconds = divmod(int(snapshot["eta"]), 60)
+            text += f", reste {minutes}:{seconds:02d}"
+        text += ")"
+        if snapshot["counts"]:
+            text += " - " + ", ".join(f"{label} : {n}" for label, n in snapshot["counts"].items())
+        return text
+
+    def _maybe_report(self):
+        """Transmet un résumé texte à la fonction de rappel, au plus une fois par intervalle."""
+        if self.callback is None:
+            return
+        now = time.perf_counter()
+        if self._last_text is None or now - self._last_text >= self.text_interval or self.done == self.total:
+            self._last_text = now
+            self.callback(self.format())
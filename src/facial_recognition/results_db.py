@@ -0,0 +1,253 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+UNKNOWN = "Inconnu"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    directory TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    images INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs(id)
+);
+CREATE TABLE IF NOT EXISTS faces (
+    id INTEGER PRIMARY KEY,
+    image_id INTEGER NOT NULL REFERENCES images(id),
+    identity TEXT NOT NULL,
+    score REAL NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    w REAL NOT NULL,
+    h REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS faces_identity ON faces(identity, image_id);
+CREATE INDEX IF NOT EXISTS faces_image ON faces(image_id, identity);
+CREATE INDEX IF NOT EXISTS images_path ON images(path);
+"""
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    Empreinte du contenu d'un fichier, indépendante de son nom (les images sont renommées).
+
+    :param path: Chemin du fichier.
+    :return: str: Empreinte BLAKE2b (128 bits) en hexadécimal.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def array_hash(image):
+    """
+    Empreinte du contenu d'une image décodée sans fichier source (par exemple extraite d'un PDF).
+
+    :param image: Tableau NumPy.
+    :return: str: Empreinte BLAKE2b (128 bits) en hexadécimal.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(image.shape).encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class ResultsDatabase:
+    """
+    Base SQLite des résultats d'identification (une ligne par image et par visage).
+
+    Une image est identifiée par l'empreinte de son contenu : la traiter à nouveau
+    (même renommée) remplace ses résultats précédents. Les index sur l'identité
+    permettent de répondre en quelques millisecondes sur des centaines de milliers
+    de photos.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Chemin du fichier SQLite (créé si besoin).
+        """
+        db_dir = os.path.dirname(path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        # WAL : les lectures (requêtes, interface) ne sont pas bloquées par un traitement en cours
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.run_id = None
+
+    def close(self):
+        self.conn.close()
+
+    def start_run(self, directory):
+        """
+        Enregistre le début d'un traitement.
+
+        :param directory: Répertoire traité.
+        :return: int: Identifiant du traitement.
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs(directory, started_at) VALUES (?, ?)", (directory, time.time())
+            )
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def finish_run(self):
+        """Enregistre la fin du traitement en cours et le nombre d'images enregistrées."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE runs SET finished_at = ?, images = (SELECT COUNT(*) FROM images WHERE run_id = ?) WHERE id = ?",
+                (time.time(), self.run_id, self.run_id),
+            )
+
+    def record_images(self, records):
+        """
+        Enregistre les résultats d'un lot d'images en une seule transaction.
+
+        :param records: Liste de tuples (chemin, empreinte, visages) où visages est une
+            liste de tuples (boîte (x, y, w, h), nom, score).
+        """
+        if not records:
+            return
+        hashes = [digest for _, digest, _ in records]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO images(hash, path, run_id) VALUES (?, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET path = excluded.path, run_id = excluded.run_id",
+                [(digest, path, self.run_id) for path, digest, _ in records],
+            )
+            ids = {}
+            # Limite du nombre de paramètres SQLite : requêtes par tranches
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                ids.update(self.conn.execute(
+                    f"SELECT hash, id FROM images WHERE hash IN ({placeholders})", chunk
+                ))
+            self.conn.executemany("DELETE FROM faces WHERE image_id = ?", [(ids[h],) for h in hashes])
+            self.conn.executemany(
+                "INSERT INTO faces(image_id, identity, score, x, y, w, h) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (ids[digest], name, float(score), *(float(v) for v in box[:4]))
+                    for _, digest, faces in records
+                    for box, name, score in faces
+                ],
+            )
+
+    def update_identities(self, updates):
+        """
+        Remplace l'identité et le score de visages déjà enregistrés (après un réencodage).
+
+        :param updates: Liste de tuples (empreinte de l'image, rang du visage, nom, score) ; le rang
+            est l'ordre du visage dans les détections de l'image. Un visage inconnu est ignoré.
+        :return: int: Nombre de visages mis à jour.
+        """
+        face_ids = {}
+        rows = []
+        for digest, face, name, score in updates:
+            if digest not in face_ids:
+                face_ids[digest] = [row[0] for row in self.conn.execute(
+                    "SELECT faces.id FROM faces JOIN images ON images.id = faces.image_id "
+                    "WHERE images.hash = ? ORDER BY faces.id", (digest,)
+                )]
+            if face < len(face_ids[digest]):
+                rows.append((name, float(score), face_ids[digest][face]))
+        with self.conn:
+            self.conn.executemany("UPDATE faces SET identity = ?, score = ? WHERE id = ?", rows)
+        return len(rows)
+
+    def hashes(self):
+        """
+        :return: set: Empreintes de toutes les images enregistrées.
+        """
+        return {row[0] for row in self.conn.execute("SELECT hash FROM images")}
+
+    def photos_of(self, name):
+        """
+        :param name: Identité recherchée.
+        :return: list: Chemins des photos où la personne apparaît, triés.
+        """
+        rows = self.conn.execute(
+            "SELECT path FROM images WHERE id IN (SELECT image_id FROM faces WHERE identity = ?) ORDER BY path",
+            (name,),
+        )
+        return [path for path, in rows]
+
+    def photos_with(self, names):
+        """
+        :param names: Identités devant toutes apparaître sur la photo.
+        :return: list: Chemins des photos où toutes ces personnes apparaissent ensemble, triés.
+        """
+        names = sorted(set(names))
+        placeholders = ",".join("?" * len(names))
+        rows = self.conn.execute(
+            f"SELECT path FROM images WHERE id IN ("
+            f"  SELECT image_id FROM faces WHERE identity IN ({placeholders})"
+            f"  GROUP BY image_id HAVING COUNT(DISTINCT identity) = ?"
+            f") ORDER BY path",
+            (*names, len(names)),
+        )
+        return [path for path, in rows]
+
+    def co_occurrences(self, name):
+        """
+        :param name: Identité de référence.
+        :return: list: Tuples (autre identité, nombre de photos communes), par fréquence décroissante.
+        """
+        rows = self.conn.execute(
+            "SELECT other.identity, COUNT(DISTINCT other.image_id) AS n "
+            "FROM faces AS ref JOIN faces AS other ON other.image_id = ref.image_id "
+            "WHERE ref.identity = ? AND other.identity NOT IN (?, ?) "
+            "GROUP BY other.identity ORDER BY n DESC, other.identity",
+            (name, name, UNKNOWN),
+        )
+        return rows.fetchall()
+
+    def unknown_faces(self, limit=100):
+        """
+        :param limit: Nombre maximal de visages retournés.
+        :return: list: Tuples (chemin, boîte (x, y, w, h), score) des visages non identifiés, les plus récents d'abord.
+        """
+        rows = self.conn.execute(
+            "SELECT images.path, faces.x, faces.y, faces.w, faces.h, faces.score "
+            "FROM faces JOIN images ON images.id = faces.image_id "
+            "WHERE faces.identity = ? ORDER BY faces.image_id DESC, faces.id LIMIT ?",
+            (UNKNOWN, limit),
+        )
+        return [(path, (x, y, w, h), score) for path, x, y, w, h, score in rows]
+
+    def images(self):
+        """
+        :return: list: Tuples (chemin, [noms reconnus], empreinte) de toutes les images, triés par chemin.
+            Comme `processed_images`, la liste des noms vaut ["Inconnu"] si personne n'est reconnu.
+        """
+        rows = self.conn.execute(
+            "SELECT images.path, images.hash, ("
+            "  SELECT group_concat(identity, char(31)) FROM ("
+            "    SELECT DISTINCT identity FROM faces WHERE image_id = images.id AND identity != ? ORDER BY identity"
+            "  )"
+            ") FROM images ORDER BY images.path",
+            (UNKNOWN,),
+        )
+        return [(path, names.split("\x1f") if names else [UNKNOWN], digest) for path, digest, names in rows]
+
+    def identities(self):
+        """
+        :return: list: Tuples (identité, nombre de photos), par identité.
+        """
+        rows = self.conn.execute(
+            "SELECT identity, COUNT(DISTINCT image_id) FROM faces GROUP BY identity ORDER BY identity"
+        )
+        return rows.fetchall()
@@ -0,0 +1,98 @@
+"""
+Matrice de benchmark des configurations DNN (backend / cible / threads) de YuNet et SFace.
+
+Chaque configuration disponible sur la machine est chargée via FaceRecognizerManager,
+puis on mesure le temps de chargement (warm-up compris), la latence de détection et
+la latence d'extraction de signature. Usage :
+
+    python bench_backends.py [dossier_images]
+"""
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from facial_recognition.manager import FaceRecognizerManager, DNN_BACKENDS, DNN_TARGETS
+
+# --- CONFIGURATION ---
+THREADS = sorted({1, 2, 4, os.cpu_count() or 1})
+REPETITIONS = 20
+IMAGE_SIZE = (640, 480)  # Utilisée si aucun dossier d'images n'est fourni
+
+
+def charger_images(dossier):
+    """Charge les images du dossier ou génère une image synthétique."""
+    images = []
+    if dossier and os.path.isdir(dossier):
+        for filename in sorted(os.listdir(dossier)):
+            if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+                img = cv2.imread(os.path.join(dossier, filename))
+                if img is not None:
+                    images.append(img)
+    if not images:
+        rng = np.random.default_rng(0)
+        images.append(rng.integers(0, 256, (IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.uint8))
+    return images
+
+
+def configurations_disponibles():
+    """Liste les couples (backend, cible) réellement utilisables par cette build d'OpenCV."""
+    cibles_par_id = {v: k for k, v in DNN_TARGETS.items()}
+    configs = []
+    for backend_name, backend_id in DNN_BACKENDS.items():
+        try:
+            cibles = cv2.dnn.getAvailableTargets(backend_id)
+        except cv2.error:
+            continue
+        for target_id in cibles:
+            if target_id in cibles_par_id:
+                configs.append((backend_name, cibles_par_id[target_id]))
+    return configs
+
+
+def mesurer(backend_name, target_name, threads, images):
+    """Mesure chargement, détection et encodage pour une configuration."""
+    manager = FaceRecognizerManager(
+        backend_id=DNN_BACKENDS[backend_name],
+        target_id=DNN_TARGETS[target_name],
+        num_threads=threads
+    )
+    t0 = time.perf_counter()
+    if not manager.load_models():
+        return None
+    t_load = time.perf_counter() - t0
+
+    crop = np.zeros((112, 112, 3), dtype=np.uint8)
+    t_detect = 0.0
+    t_feature = 0.0
+    for i in range(REPETITIONS):
+        img = images[i % len(images)]
+        h, w = img.shape[:2]
+        t0 = time.perf_counter()
+        manager.detector.setInputSize((w, h))
+        manager.detector.detect(img)
+        t_detect += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        manager.recognizer.feature(crop)
+        t_feature += time.perf_counter() - t0
+
+    return t_load, t_detect / REPETITIONS, t_feature / REPETITIONS
+
+
+if __name__ == "__main__":
+    images = charger_images(sys.argv[1] if len(sys.argv) > 1 else None)
+    FaceRecognizerManager().check_and_download_models(print)
+
+    print(f"{'backend':<10} {'cible':<12} {'threads':>7} {'chargement':>11} {'détection':>10} {'signature':>10}")
+    for backend_name, target_name in configurations_disponibles():
+        for threads in THREADS:
+            res = mesurer(backend_name, target_name, threads, images)
+            if res is None:
+                print(f"{backend_name:<10} {target_name:<12} {threads:>7}  indisponible")
+                continue
+            t_load, t_detect, t_feature = res
+            print(f"{backend_name:<10} {target_name:<12} {threads:>7} "
+                  f"{t_load * 1000:>9.1f}ms {t_detect * 1000:>8.2f}ms {t_feature * 1000:>8.2f}ms")
@@ -0,0 +1,107 @@
+"""
+Mémoire par processus et latence de comparaison d'une base copiée ou partagée, selon sa taille.
+
+Pour chaque taille de base (signatures aléatoires de dimension 128) :
+- "copie" : chaque processus de comparaison reçoit sa propre copie de la matrice ;
+- "partagée" : la matrice est publiée une fois en mémoire partagée (ShardedMatcher),
+  chaque processus n'en obtient qu'une vue.
+La mémoire privée (USS) et proportionnelle (PSS) de chaque processus est lue dans
+/proc/<pid>/smaps_rollup (Linux). La latence est celle d'un lot de NB_VISAGES visages,
+comparé en une tranche dans le processus courant ou en NB_TRANCHES processus.
+
+Usage :
+
+    python bench_base_partagee.py [taille_base ...]
+"""
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from gallery import Gallery  # noqa: E402
+from shared_gallery import ShardedMatcher, SharedGallery  # noqa: E402
+
+# --- CONFIGURATION ---
+TAILLES = (10_000, 100_000, 500_000)
+NB_TRANCHES = 2
+NB_VISAGES = 32
+REPETITIONS = 10
+
+_copie = None
+
+
+def _initialiser_copie(matrice):
+    global _copie
+    _copie = matrice
+
+
+def _comparer_copie(requetes, debut, fin):
+    scores = requetes @ _copie[debut:fin].T
+    return scores.argmax(axis=1) + debut, scores.max(axis=1)
+
+
+def memoire(pid):
+    """:return: (float, float): USS et PSS du processus, en Mo."""
+    valeurs = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for ligne in f:
+            champs = ligne.split()
+            if len(champs) >= 2 and champs[1].isdigit():
+                valeurs[champs[0].rstrip(":")] = int(champs[1]) / 1024
+    return valeurs["Private_Clean"] + valeurs["Private_Dirty"], valeurs["Pss"]
+
+
+def chronometrer(fonction):
+    fonction()  # Préchauffage (attachement des processus)
+    t0 = time.perf_counter()
+    for _ in range(REPETITIONS):
+        fonction()
+    return (time.perf_counter() - t0) / REPETITIONS * 1000
+
+
+if __name__ == "__main__":
+    tailles = [int(t) for t in sys.argv[1:]] or TAILLES
+    rng = np.random.default_rng(0)
+    requetes = rng.normal(size=(NB_VISAGES, 128)).astype(np.float32)
+    requetes /= np.linalg.norm(requetes, axis=1, keepdims=True)
+    print(f"{NB_TRANCHES} processus de comparaison, lots de {NB_VISAGES} visages, {os.cpu_count()} cœur(s)")
+
+    for taille in tailles:
+        matrice = rng.normal(size=(taille, 128)).astype(np.float32)
+        matrice /= np.linalg.norm(matrice, axis=1, keepdims=True)
+        base = Gallery(list(matrice.reshape(taille, 1, 128)), [f"Personne_{i}" for i in range(taille)])
+        bornes = np.linspace(0, taille, NB_TRANCHES + 1).astype(int)
+        print(f"\nBase de {taille} signatures ({matrice.nbytes / 2**20:.0f} Mo)")
+
+        contexte = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(NB_TRANCHES, mp_context=contexte, initializer=_initialiser_copie,
+                                 initargs=(matrice,)) as pool:
+            def copie(pool=pool, bornes=bornes):
+                futures = [pool.submit(_comparer_copie, requetes, a, b) for a, b in zip(bornes[:-1], bornes[1:])]
+                return [f.result() for f in futures]
+            duree = chronometrer(copie)
+            mesures = [memoire(pid) for pid in pool._processes]
+        print(f"  copie    : {duree:7.1f} ms/lot, par processus USS "
+              + ", ".join(f"{uss:.0f}" for uss, _ in mesures) + " Mo, PSS "
+              + ", ".join(f"{pss:.0f}" for _, pss in mesures) + " Mo")
+
+        comparateur = ShardedMatcher(NB_TRANCHES)
+        try:
+            duree = chronometrer(lambda comparateur=comparateur, base=base: comparateur.top_k(base, requetes))
+            mesures = [memoire(pid) for pid in comparateur.worker_pids()]
+        finally:
+            comparateur.close()
+        print(f"  partagée : {duree:7.1f} ms/lot, par processus USS "
+              + ", ".join(f"{uss:.0f}" for uss, _ in mesures) + " Mo, PSS "
+              + ", ".join(f"{pss:.0f}" for _, pss in mesures) + " Mo")
+
+        locale = SharedGallery.create(base)
+        try:
+            duree = chronometrer(lambda locale=locale: locale.top_k(requetes))
+        finally:
+            locale.close()
+        print(f"  1 tranche dans le processus courant : {duree:7.1f} ms/lot")
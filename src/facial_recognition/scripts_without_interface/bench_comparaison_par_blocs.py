@@ -0,0 +1,83 @@
+"""
+Débit de la comparaison visages x base selon la façon de regrouper les visages.
+
+Pour chaque taille de base (signatures aléatoires normalisées de dimension 128), NB_VISAGES
+visages sont comparés :
+- par lots d'encodage de LOT_ENCODAGE visages (un produit matriciel par lot) ;
+- tous ensemble, en calculant la matrice complète des scores (si elle tient en mémoire) ;
+- tous ensemble, par produits de blocs avec sélection du top-1 au fil des blocs
+  (`blocked_top_k`, mode `match_batch`).
+Affiche le temps par visage, le débit en GFLOP/s et la taille de la matrice de scores vivante.
+
+Usage :
+
+    python bench_comparaison_par_blocs.py [taille_base ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from shared_gallery import QUERY_BLOCK, ROW_BLOCK, blocked_top_k  # noqa: E402
+
+# --- CONFIGURATION ---
+TAILLES = (10_000, 100_000)
+NB_VISAGES = 4096
+LOT_ENCODAGE = 32
+MATRICE_COMPLETE_MAX = 1 << 30  # Octets
+REPETITIONS = 3
+
+
+def chronometrer(fonction):
+    fonction()  # Préchauffage
+    t0 = time.perf_counter()
+    for _ in range(REPETITIONS):
+        resultat = fonction()
+    return (time.perf_counter() - t0) / REPETITIONS, resultat
+
+
+def par_lots(requetes, matrice):
+    indices = []
+    for debut in range(0, len(requetes), LOT_ENCODAGE):
+        indices.append((requetes[debut:debut + LOT_ENCODAGE] @ matrice.T).argmax(axis=1))
+    return np.concatenate(indices)
+
+
+def matrice_complete(requetes, matrice):
+    return (requetes @ matrice.T).argmax(axis=1)
+
+
+def par_blocs(requetes, matrice):
+    return blocked_top_k(requetes, matrice, k=1)[0][:, 0]
+
+
+if __name__ == "__main__":
+    tailles = [int(t) for t in sys.argv[1:]] or TAILLES
+    rng = np.random.default_rng(0)
+    requetes = rng.normal(size=(NB_VISAGES, 128)).astype(np.float32)
+    requetes /= np.linalg.norm(requetes, axis=1, keepdims=True)
+    print(f"{NB_VISAGES} visages, {os.cpu_count()} cœur(s), NumPy {np.__version__}")
+
+    for taille in tailles:
+        matrice = rng.normal(size=(taille, 128)).astype(np.float32)
+        matrice /= np.linalg.norm(matrice, axis=1, keepdims=True)
+        operations = 2 * NB_VISAGES * taille * 128
+        print(f"\nBase de {taille} signatures")
+        modes = [
+            (f"lots de {LOT_ENCODAGE} visages", par_lots, LOT_ENCODAGE * taille * 4),
+            ("matrice complète", matrice_complete, NB_VISAGES * taille * 4),
+            (f"blocs {QUERY_BLOCK}x{ROW_BLOCK}", par_blocs, QUERY_BLOCK * min(ROW_BLOCK, taille) * 4),
+        ]
+        reference = None
+        for libelle, fonction, octets in modes:
+            if octets > MATRICE_COMPLETE_MAX:
+                print(f"  {libelle:<22}: ignoré (scores de {octets / 2**30:.1f} Go)")
+                continue
+            duree, indices = chronometrer(lambda fonction=fonction, matrice=matrice: fonction(requetes, matrice))
+            if reference is None:
+                reference = indices
+            identiques = "identiques" if np.array_equal(indices, reference) else "DIFFÉRENTS"
+            print(f"  {libelle:<22}: {duree / NB_VISAGES * 1e6:7.1f} µs/visage, "
+                  f"{operations / duree / 1e9:5.1f} GFLOP/s, scores {octets / 2**20:7.1f} Mo, résultats {identiques}")
@@ -0,0 +1,76 @@
+"""
+Compare le décodage complet et le décodage réduit (IMREAD_REDUCED_COLOR_*) sur un dossier de JPEG.
+
+Chaque mode est mesuré dans un processus séparé pour que le pic de mémoire
+(ru_maxrss) lui soit propre. Avec un dossier de modèles, la détection YuNet est
+aussi chronométrée : sa taille d'entrée suit celle de l'image décodée.
+
+Usage :
+
+    python bench_decodage.py dossier_images [taille_max] [dossier_modeles]
+"""
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from decoding import DecodedImage  # noqa: E402
+
+# --- CONFIGURATION ---
+TAILLE_MAX = 1920
+REPETITIONS = 3
+
+
+def mesurer(dossier, taille_max, dossier_modeles=None):
+    """Décode (et détecte) toutes les images ; retourne (durée décodage, durée détection, pixels décodés)."""
+    detecteur = None
+    if dossier_modeles:
+        detecteur = cv2.FaceDetectorYN.create(
+            os.path.join(dossier_modeles, "face_detection_yunet_2023mar.onnx"), "", (320, 320), 0.8, 0.3, 5000
+        )
+    fichiers = sorted(f for f in os.listdir(dossier) if f.lower().endswith(('.jpg', '.jpeg')))
+    duree_decodage = duree_detection = 0.0
+    pixels = 0
+    for _ in range(REPETITIONS):
+        for nom in fichiers:
+            t0 = time.perf_counter()
+            image = DecodedImage.read(os.path.join(dossier, nom), taille_max)
+            duree_decodage += time.perf_counter() - t0
+            if image is None:
+                continue
+            h, w = image.image.shape[:2]
+            pixels += h * w
+            if detecteur is not None:
+                t0 = time.perf_counter()
+                detecteur.setInputSize((w, h))
+                detecteur.detect(image.image)
+                duree_detection += time.perf_counter() - t0
+    n = len(fichiers) * REPETITIONS
+    return duree_decodage / n, duree_detection / n, pixels // n
+
+
+if __name__ == "__main__":
+    if sys.argv[1] == "--enfant":
+        # Processus de mesure : taille_max "0" = décodage complet
+        _, _, dossier, taille_max, dossier_modeles = sys.argv
+        decodage, detection, pixels = mesurer(dossier, int(taille_max) or None, dossier_modeles or None)
+        pic_mo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{decodage * 1000:.1f} {detection * 1000:.1f} {pixels} {pic_mo:.0f}")
+        sys.exit(0)
+
+    dossier = sys.argv[1]
+    taille_max = int(sys.argv[2]) if len(sys.argv) > 2 else TAILLE_MAX
+    dossier_modeles = sys.argv[3] if len(sys.argv) > 3 else ""
+
+    print(f"{'Mode':<20} {'Décodage':>10} {'Détection':>10} {'Pixels':>12} {'Pic RSS':>9}")
+    for libelle, taille in (("Complet", 0), (f"Réduit (>= {taille_max})", taille_max)):
+        sortie = subprocess.run(
+            [sys.executable, __file__, "--enfant", dossier, str(taille), dossier_modeles],
+            capture_output=True, text=True, check=True,
+        ).stdout.split()
+        decodage, detection, pixels, pic = sortie
+        print(f"{libelle:<20} {decodage:>7} ms {detection:>7} ms {int(pixels):>12,} {pic:>6} Mo")
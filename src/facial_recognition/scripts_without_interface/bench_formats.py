@@ -0,0 +1,81 @@
+"""
+Compare la détection YuNet à la taille exacte de chaque image et dans les formats fixes (letterbox).
+
+Les images d'un dossier (ou, à défaut, une image de bruit) sont redimensionnées à
+NB_IMAGES tailles aléatoires pour simuler un dossier hétérogène. Pour chaque mode :
+latence moyenne par image (mise au format comprise), nombre de tailles d'entrée
+distinctes vues par le détecteur et nombre de visages détectés. En mode formats, les
+images sont traitées regroupées par format, comme dans `process_directory`.
+
+Usage :
+
+    python bench_formats.py dossier_modeles [dossier_images]
+"""
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from letterbox import DetectionBuckets  # noqa: E402
+
+# --- CONFIGURATION ---
+NB_IMAGES = 120
+COTE_MIN, COTE_MAX = 600, 1920
+REPETITIONS = 2
+
+
+def mesurer(detecteur, images, formats=None):
+    """Détecte toutes les images ; retourne (ms par image, tailles d'entrée distinctes, visages)."""
+    tailles = set()
+    visages = 0
+    t0 = time.perf_counter()
+    for _ in range(REPETITIONS):
+        for image in images:
+            echelle = 1.0
+            if formats is not None:
+                image, echelle = formats.fit(image)
+            h, w = image.shape[:2]
+            tailles.add((w, h))
+            detecteur.setInputSize((w, h))
+            _, detections = detecteur.detect(image)
+            if detections is not None:
+                visages += len(DetectionBuckets.to_image_coordinates(detections, echelle))
+    duree = (time.perf_counter() - t0) / (len(images) * REPETITIONS)
+    return duree * 1000, len(tailles), visages // REPETITIONS
+
+
+if __name__ == "__main__":
+    dossier_modeles = sys.argv[1]
+    sources = []
+    if len(sys.argv) > 2:
+        for nom in sorted(os.listdir(sys.argv[2])):
+            image = cv2.imread(os.path.join(sys.argv[2], nom))
+            if image is not None:
+                sources.append(image)
+    if not sources:
+        sources = [np.random.default_rng(0).integers(0, 255, (1080, 1440, 3), dtype=np.uint8)]
+
+    rng = np.random.default_rng(0)
+    images = []
+    for i in range(NB_IMAGES):
+        source = sources[i % len(sources)]
+        grand = int(rng.integers(COTE_MIN, COTE_MAX))
+        h, w = source.shape[:2]
+        echelle = grand / max(h, w)
+        images.append(cv2.resize(source, (max(1, round(w * echelle)), max(1, round(h * echelle)))))
+
+    detecteur = cv2.FaceDetectorYN.create(
+        os.path.join(dossier_modeles, "face_detection_yunet_2023mar.onnx"), "", (320, 320), 0.8, 0.3, 5000
+    )
+    formats = DetectionBuckets()
+    groupees = sorted(images, key=lambda image: formats.choose(image.shape[1], image.shape[0])[0])
+    mesurer(detecteur, images[:5])  # Préchauffage
+
+    exact = mesurer(detecteur, images)
+    boite = mesurer(detecteur, groupees, formats)
+    print(f"{NB_IMAGES} images de {COTE_MIN} à {COTE_MAX} px de grand côté, OpenCV {cv2.__version__}")
+    print(f"Taille exacte : {exact[0]:.1f} ms/image, {exact[1]} tailles d'entrée, {exact[2]} visages")
+    print(f"Formats fixes : {boite[0]:.1f} ms/image, {boite[1]} tailles d'entrée, {boite[2]} visages")
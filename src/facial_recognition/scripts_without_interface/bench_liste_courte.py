@@ -0,0 +1,117 @@
+"""
+Mesure le taux de succès et le gain de la liste courte des identités récentes sur un flux synthétique.
+
+La base contient NB_IDENTITES personnes (SIGNATURES_PAR_PERSONNE signatures chacune),
+simulées par des vecteurs de dimension 128 bruités (similarité cosinus ~0,7 entre deux
+photos d'une même personne, comme SFace). Le flux imite un événement : des photos de
+1 à 4 personnes tirées d'un petit groupe qui évolue lentement, plus des inconnus.
+Les résultats sont comparés à ceux de la recherche exhaustive, visage par visage puis
+vectorisée (comparaison à la base partagée, dans le processus courant) ; la liste courte est
+mesurée avec chacune de ces recherches complètes en repli.
+
+Usage :
+
+    python bench_liste_courte.py [taille_liste_courte] [modele_sface.onnx]
+
+Avec un modèle SFace, les comparaisons passent par `FaceRecognizerSF.match` d'OpenCV
+(le modèle n'est pas utilisé pour l'encodage) ; sinon par un équivalent NumPy.
+"""
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from gallery import Gallery  # noqa: E402
+from manager import FaceRecognizerManager  # noqa: E402
+from shortlist import RecentIdentities  # noqa: E402
+
+# --- CONFIGURATION ---
+NB_IDENTITES = 1000
+SIGNATURES_PAR_PERSONNE = 5
+NB_PHOTOS = 1500
+TAILLE_GROUPE = 12
+PART_INCONNUS = 0.1
+BRUIT = 0.058  # Écart-type par composante : cos ~0,7 entre deux photos d'une même personne
+SEUIL = 0.363  # Seuil cosinus recommandé pour SFace
+
+
+class Reconnaisseur:
+    """Comparaison cosinus d'OpenCV, sans modèle (seul `match` est utilisé)."""
+
+    @staticmethod
+    def match(a, b, _):
+        a, b = a.ravel(), b.ravel()
+        return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def gestionnaire(modele=None, vectorise=False):
+    """Gestionnaire réduit à la comparaison à la base (reconnaisseur remplacé, seuil de SFace)."""
+    resultat = FaceRecognizerManager(threshold=SEUIL, match_batch=1 if vectorise else 0)
+    resultat.recognizer = cv2.FaceRecognizerSF.create(modele, "") if modele else Reconnaisseur()
+    return resultat
+
+
+def chronometrer(fonction):
+    t0 = time.perf_counter()
+    resultat = fonction()
+    return resultat, time.perf_counter() - t0
+
+
+def photo(rng, centre):
+    v = centre + rng.normal(0, BRUIT, centre.shape)
+    return (v / np.linalg.norm(v)).astype(np.float32).reshape(1, -1)
+
+
+if __name__ == "__main__":
+    taille = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    modele = sys.argv[2] if len(sys.argv) > 2 else None
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(NB_IDENTITES, 128))
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    noms = [f"Personne_{i:04d}" for i in range(NB_IDENTITES)]
+    base = Gallery(
+        [photo(rng, c) for c in centres for _ in range(SIGNATURES_PAR_PERSONNE)],
+        [n for n in noms for _ in range(SIGNATURES_PAR_PERSONNE)],
+    )
+
+    # Flux d'un événement : groupe qui change d'une personne toutes les 20 photos
+    groupe = list(rng.choice(NB_IDENTITES, TAILLE_GROUPE, replace=False))
+    visages = []
+    for p in range(NB_PHOTOS):
+        if p % 20 == 19:
+            groupe[rng.integers(TAILLE_GROUPE)] = rng.integers(NB_IDENTITES)
+        for idx in rng.choice(groupe, rng.integers(1, 5), replace=False):
+            visages.append(photo(rng, centres[idx]))
+        if rng.random() < PART_INCONNUS:
+            inconnu = rng.normal(size=128)
+            visages.append(photo(rng, inconnu / np.linalg.norm(inconnu)))
+
+    exhaustif = gestionnaire(modele)
+    attendus, duree_exhaustive = chronometrer(lambda: [exhaustif._match_feature(v, base) for v in visages])
+    print(f"{len(visages)} visages, base de {len(base)} signatures, liste courte de {taille} identités")
+    print(f"Exhaustif, visage par visage : {duree_exhaustive:.2f}s")
+
+    for vectorise in (False, True):
+        comparaison = gestionnaire(modele, vectorise)
+        comparaison.open_matcher()
+        try:
+            complets, duree_complete = chronometrer(
+                lambda comparaison=comparaison: comparaison._match_features(visages, base))
+            recents = RecentIdentities(taille)
+            obtenus, duree_liste = chronometrer(
+                lambda comparaison=comparaison, recents=recents: [recents.match(comparaison, v, base) for v in visages])
+        finally:
+            comparaison.close_matcher()
+        mode = "vectorisée" if vectorise else "visage par visage"
+        print(f"Recherche complète {mode} : {duree_complete:.2f}s ; avec la liste courte : {duree_liste:.2f}s "
+              f"(x{duree_complete / duree_liste:.1f})")
+        print("  " + recents.report())
+        # Scores en float32 dans la recherche vectorisée : seuls les noms doivent être identiques
+        noms = [nom for nom, _ in attendus]
+        identiques = all([nom for nom, _ in resultats] == noms for resultats in (obtenus, complets))
+        ecart = max(abs(score - attendu) for resultats in (obtenus, complets)
+                    for (_, score), (_, attendu) in zip(resultats, attendus))
+        print(f"  Noms identiques : {identiques} (écart de score au plus {ecart:.1e})")
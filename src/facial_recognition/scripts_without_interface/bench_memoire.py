@@ -0,0 +1,75 @@
+"""
+Mesure le pic de mémoire et la durée du tri d'un dossier selon le budget mémoire.
+
+Chaque budget est mesuré dans un processus séparé (pic de mémoire propre), sur une
+copie du dossier (le tri renomme les fichiers). La base de signatures est une base
+factice : seuls la détection, l'alignement et l'encodage comptent ici.
+
+Usage :
+
+    python bench_memoire.py dossier_images dossier_modeles [taille_max] [budget_mo ...]
+
+`taille_max` vaut 0 pour décoder en pleine résolution ; un budget de 0 Mo = illimité.
+"""
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from manager import FaceRecognizerManager  # noqa: E402
+
+# --- CONFIGURATION ---
+BUDGETS_MO = (0, 1024, 512)
+
+
+def mesurer(dossier, dossier_modeles, taille_max, budget_mo):
+    """Trie une copie du dossier ; retourne (durée, visages détectés, journal)."""
+    with tempfile.TemporaryDirectory() as copie:
+        for nom in os.listdir(dossier):
+            shutil.copy(os.path.join(dossier, nom), copie)
+        gestionnaire = FaceRecognizerManager(
+            model_dir=dossier_modeles,
+            encoding_file=os.path.join(copie, "inutilise.pkl"),
+            decode_max_side=taille_max or None,
+            memory_budget=budget_mo * 1024 * 1024 or None,
+        )
+        gestionnaire.load_models()
+        gestionnaire.known_features = [np.ones((1, 128), dtype=np.float32)]
+        gestionnaire.known_names = ["Personne"]
+        journal = []
+        t0 = time.perf_counter()
+        gestionnaire.process_directory(copie, progress_callback=journal.append)
+        return time.perf_counter() - t0, journal
+
+
+if __name__ == "__main__":
+    if sys.argv[1] == "--enfant":
+        _, _, dossier, dossier_modeles, taille_max, budget_mo = sys.argv
+        duree, journal = mesurer(dossier, dossier_modeles, int(taille_max), int(budget_mo))
+        pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{duree:.1f} {pic:.0f}")
+        for ligne in journal:
+            if ligne.startswith("Budget"):
+                print(ligne)
+        sys.exit(0)
+
+    dossier, dossier_modeles = sys.argv[1], sys.argv[2]
+    taille_max = sys.argv[3] if len(sys.argv) > 3 else "1920"
+    budgets = sys.argv[4:] or [str(b) for b in BUDGETS_MO]
+    for budget in budgets:
+        sortie = subprocess.run(
+            [sys.executable, __file__, "--enfant", dossier, dossier_modeles, taille_max, budget],
+            capture_output=True, text=True, check=True,
+        ).stdout.split("\n")
+        duree, pic = sortie[0].split()
+        libelle = f"{budget} Mo" if int(budget) else "illimité"
+        print(f"Budget {libelle:>9} : {duree} s, pic de mémoire {pic} Mo")
+        for ligne in sortie[1:]:
+            if ligne:
+                print("    " + ligne)
@@ -0,0 +1,283 @@
+"""
+Banc de non-régression des performances du tri, sur des données synthétiques.
+
+Balaye la taille de la base (signatures synthétiques regroupées par identité, voir
+`synthetic.py`), la densité de visages par image et le nombre de processus de comparaison
+(`gallery_shards`), en triant avec `FaceRecognizerManager` un dossier d'images synthétiques
+(visages dessinés, ou collés depuis un dossier de photos avec `--visages`). Les bases de 10 à
+100 fois la taille actuelle se mesurent ainsi avant d'exister.
+
+Les débits bruts dépendent de la machine. Chaque dossier est donc d'abord traité par un
+étalon, sur la même machine et dans la même exécution : OpenCV seul (lecture, détection YuNet,
+`alignCrop` et `feature` de SFace visage par visage, sans base à comparer). Un scénario est
+mesuré par son rapport au débit de l'étalon, passé en alternance dans le même processus, et par
+la mémoire qu'il ajoute au pic de l'étalon seul ; ce sont ces valeurs relatives que garde la
+référence (`reference_performances.json`). Le script
+échoue (code de sortie 1) si le rapport d'un scénario baisse de plus de TOLERANCE_DEBIT, si sa
+mémoire ajoutée augmente de plus de TOLERANCE_MEMOIRE (plus MARGE_MEMOIRE_MO), ou s'il ne
+détecte pas les mêmes visages que l'étalon.
+
+Les scénarios à plusieurs processus dépendent du nombre de cœurs : ils ne sont comparés qu'à une
+référence enregistrée avec autant de cœurs. L'enregistrer à nouveau (`--enregistrer`) après une
+amélioration volontaire ou un changement de version d'OpenCV.
+
+Chaque scénario tourne dans un processus séparé (pic de mémoire propre) et trie PASSAGES
+copies du dossier (le tri renomme les fichiers) : le débit retenu est celui du meilleur passage.
+Le pic de mémoire est celui du processus du scénario. Les processus de comparaison sont
+démarrés en « spawn », sans copie de sa mémoire, et ne sont pas mesurés : ils ne font que
+projeter la base en mémoire partagée, créée et remplie (donc comptée) par le processus du scénario.
+
+Usage :
+
+    python bench_regression.py dossier_modeles [--profil rapide|complet] [--enregistrer]
+        [--visages dossier] [--bases 1000,10000] [--densites 1,8] [--processus 1,2] [--reference fichier]
+
+Le profil « rapide » est celui du test `pytest --performance`. `--processus 0` mesure la
+comparaison visage par visage (lente au-delà de quelques milliers de signatures).
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from manager import FaceRecognizerManager  # noqa: E402
+from memory import MB, peak_rss  # noqa: E402
+from progress import ProgressTracker  # noqa: E402
+from synthetic import drawn_faces, synthetic_gallery, write_image_folder  # noqa: E402
+
+# --- CONFIGURATION ---
+PROFILS = {
+    "rapide": {"bases": [1_000, 20_000], "densites": [1, 4], "processus": [1],
+               "images": 24, "resolution": [640, 480], "passages": 3},
+    "complet": {"bases": [1_000, 10_000, 100_000], "densites": [1, 8], "processus": [1, 2],
+                "images": 24, "resolution": [1280, 720], "passages": 3},
+}
+NB_VISAGES_DESSINES = 32
+TOLERANCE_DEBIT = 0.3  # Baisse relative tolérée du rapport à l'étalon (il varie de ~10 % d'une exécution à l'autre)
+TOLERANCE_MEMOIRE = 0.15  # Hausse relative tolérée de la mémoire ajoutée à celle de l'étalon
+MARGE_MEMOIRE_MO = 10  # Hausse tolérée en plus, pour les scénarios qui n'ajoutent presque rien
+REFERENCE = os.path.join(os.path.dirname(__file__), "reference_performances.json")
+
+
+def cle(base, densite, processus):
+    return f"base={base} visages={densite} processus={processus}"
+
+
+def passage_etalon(dossier, detecteur, encodeur):
+    """Traite le dossier avec OpenCV seul (sans le gestionnaire) ; retourne (durée, visages)."""
+    visages = 0
+    t0 = time.perf_counter()
+    for nom in sorted(os.listdir(dossier)):
+        image = cv2.imread(os.path.join(dossier, nom))
+        detecteur.setInputSize((image.shape[1], image.shape[0]))
+        _, detections = detecteur.detect(image)
+        for visage in detections if detections is not None else []:
+            encodeur.feature(encodeur.alignCrop(image, visage))
+            visages += 1
+    return time.perf_counter() - t0, visages
+
+
+def etalonner(dossier, dossier_modeles, passages):
+    """Mesures de l'étalon seul : débit, visages détectés et pic de mémoire."""
+    gestionnaire = FaceRecognizerManager(model_dir=dossier_modeles)
+    gestionnaire.load_models()
+    durees, visages = zip(*(passage_etalon(dossier, gestionnaire.detector, gestionnaire.recognizer)
+                            for _ in range(passages)))
+    return {"images_par_s": round(len(os.listdir(dossier)) / min(durees), 2), "visages": visages[-1],
+            "pic_mo": round(peak_rss() / MB)}
+
+
+def mesurer(dossier, dossier_modeles, base, processus, passages):
+    """
+    Trie des copies du dossier contre une base synthétique ; retourne les mesures du scénario.
+
+    Chaque passage du tri suit un passage de l'étalon dans le même processus, pour que le
+    rapport des meilleurs débits ne dépende pas des variations de charge de la machine.
+    """
+    meilleure, meilleure_etalon, visages = None, None, 0
+    with tempfile.TemporaryDirectory() as temporaire:
+        gestionnaire = FaceRecognizerManager(
+            model_dir=dossier_modeles,
+            encoding_file=os.path.join(temporaire, "inutilise.pkl"),
+            gallery_shards=processus,
+        )
+        gestionnaire.load_models()
+        gestionnaire.gallery = synthetic_gallery(base)
+        for passage in range(passages):
+            duree, _ = passage_etalon(dossier, gestionnaire.detector, gestionnaire.recognizer)
+            meilleure_etalon = duree if meilleure_etalon is None else min(meilleure_etalon, duree)
+            copie = os.path.join(temporaire, str(passage))
+            shutil.copytree(dossier, copie)
+            suivi = ProgressTracker(lambda message: None)
+            t0 = time.perf_counter()
+            gestionnaire.process_directory(copie, progress_callback=suivi)
+            duree = time.perf_counter() - t0
+            meilleure = duree if meilleure is None else min(meilleure, duree)
+            visages = suivi.counts.get("visages", 0)
+    nb_images = len(os.listdir(dossier))
+    return {
+        "images_par_s": round(nb_images / meilleure, 2),
+        "visages_par_s": round(visages / meilleure, 2),
+        "rapport": round(meilleure_etalon / meilleure, 3),
+        "visages": visages,
+        "pic_mo": round(peak_rss() / MB),
+    }
+
+
+def enfant(*arguments):
+    """Lance une mesure dans un processus séparé ; retourne son résultat."""
+    sortie = subprocess.run(
+        [sys.executable, __file__, *map(str, arguments)], capture_output=True, text=True, check=True,
+    ).stdout.strip().split("\n")[-1]
+    return json.loads(sortie)
+
+
+def executer(dossier_modeles, profil, bases=None, densites=None, processus=None, dossier_visages=None,
+             afficher=print):
+    """
+    Mesure l'étalon puis chaque scénario, dossier par dossier.
+
+    :param dossier_modeles: Dossier des modèles ONNX.
+    :param profil: Paramètres du profil (voir PROFILS).
+    :param bases: Tailles de base (None : celles du profil) ; de même pour `densites` et `processus`.
+    :param dossier_visages: Photos de visages à coller (None : visages dessinés).
+    :param afficher: Fonction d'affichage de la progression.
+    :return: dict: Mesures par scénario, avec le rapport au débit de l'étalon (`rapport`) et la
+        mémoire ajoutée à son pic (`memoire_mo`).
+    """
+    visages = None if dossier_visages else drawn_faces(NB_VISAGES_DESSINES)
+    mesures = {}
+    with tempfile.TemporaryDirectory() as dossiers:
+        for densite in densites or profil["densites"]:
+            dossier = os.path.join(dossiers, str(densite))
+            write_image_folder(dossier, profil["images"], densite, tuple(profil["resolution"]),
+                               face_dir=dossier_visages, seed=densite, faces=visages)
+            etalon = enfant("--etalon", dossier, dossier_modeles, profil["passages"])
+            afficher(f"  étalon visages={densite:<22}: {etalon['images_par_s']:7.2f} images/s, "
+                     f"{etalon['visages']} visages, pic {etalon['pic_mo']} Mo")
+            for base in bases or profil["bases"]:
+                for nb_processus in processus or profil["processus"]:
+                    mesure = enfant("--enfant", dossier, dossier_modeles, base, nb_processus, profil["passages"])
+                    mesure["memoire_mo"] = mesure["pic_mo"] - etalon["pic_mo"]
+                    mesure["visages_etalon"] = etalon["visages"]
+                    mesures[cle(base, densite, nb_processus)] = mesure
+                    afficher(f"  {cle(base, densite, nb_processus):<38}: {mesure['images_par_s']:7.2f} images/s "
+                             f"(x{mesure['rapport']:.2f} l'étalon), {mesure['visages_par_s']:7.1f} visages/s, "
+                             f"+{mesure['memoire_mo']} Mo")
+    return mesures
+
+
+def regressions(mesures, reference, tolerance_debit=TOLERANCE_DEBIT, tolerance_memoire=TOLERANCE_MEMOIRE):
+    """
+    :param mesures: dict: Mesures par scénario (voir `executer`).
+    :param reference: dict: Mesures de référence par scénario.
+    :return: list: Description de chaque régression (vide si aucune).
+    """
+    problemes = []
+    for scenario, mesure in mesures.items():
+        if mesure["visages"] != mesure["visages_etalon"]:
+            problemes.append(f"{scenario} : {mesure['visages']} visages détectés, "
+                             f"{mesure['visages_etalon']} par OpenCV seul")
+        attendu = reference.get(scenario)
+        if attendu is None:
+            continue
+        plancher = attendu["rapport"] * (1 - tolerance_debit)
+        if mesure["rapport"] < plancher:
+            problemes.append(f"{scenario} : x{mesure['rapport']:.2f} le débit de l'étalon, "
+                             f"référence x{attendu['rapport']:.2f} (plancher x{plancher:.2f})")
+        plafond = max(0, attendu["memoire_mo"]) * (1 + tolerance_memoire) + MARGE_MEMOIRE_MO
+        if mesure["memoire_mo"] > plafond:
+            problemes.append(f"{scenario} : +{mesure['memoire_mo']} Mo sur l'étalon, "
+                             f"référence +{attendu['memoire_mo']} Mo (plafond {plafond:.0f})")
+    return problemes
+
+
+def comparables(reference_profil):
+    """
+    :param reference_profil: dict: Référence enregistrée d'un profil.
+    :return: dict: Ses scénarios comparables sur cette machine (ceux à plusieurs processus
+        seulement si elle a le même nombre de cœurs).
+    """
+    meme_machine = reference_profil["machine"]["processeurs"] == os.cpu_count()
+    return {scenario: mesure for scenario, mesure in reference_profil["scenarios"].items()
+            if meme_machine or scenario.endswith("processus=0") or scenario.endswith("processus=1")}
+
+
+def lire_reference(chemin=REFERENCE):
+    """:return: dict: Références par profil (vide si le fichier n'existe pas)."""
+    if not os.path.exists(chemin):
+        return {}
+    with open(chemin, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def entiers(texte):
+    return [int(valeur) for valeur in texte.split(",") if valeur]
+
+
+if __name__ == "__main__":
+    if sys.argv[1] == "--etalon":
+        _, _, dossier, dossier_modeles, passages = sys.argv
+        print(json.dumps(etalonner(dossier, dossier_modeles, int(passages))))
+        sys.exit(0)
+    if sys.argv[1] == "--enfant":
+        _, _, dossier, dossier_modeles, base, processus, passages = sys.argv
+        print(json.dumps(mesurer(dossier, dossier_modeles, int(base), int(processus), int(passages))))
+        sys.exit(0)
+
+    parseur = argparse.ArgumentParser(description="Banc de non-régression des performances du tri.")
+    parseur.add_argument("dossier_modeles")
+    parseur.add_argument("--profil", choices=sorted(PROFILS), default="complet")
+    parseur.add_argument("--visages", help="Photos de visages collées dans les images (défaut : visages dessinés).")
+    parseur.add_argument("--bases", type=entiers)
+    parseur.add_argument("--densites", type=entiers)
+    parseur.add_argument("--processus", type=entiers)
+    parseur.add_argument("--reference", default=REFERENCE)
+    parseur.add_argument("--enregistrer", action="store_true", help="Remplace la référence du profil par ces mesures.")
+    arguments = parseur.parse_args()
+
+    profil = PROFILS[arguments.profil]
+    parametres = {cle_: profil[cle_] for cle_ in ("images", "resolution", "passages")}
+    parametres["visages"] = "dossier" if arguments.visages else "dessines"
+    references = lire_reference(arguments.reference)
+    reference = {}
+    enregistree = references.get(arguments.profil)
+    if not arguments.enregistrer and enregistree is not None:
+        if enregistree["parametres"] != parametres:
+            sys.exit(f"Paramètres différents de la référence ({enregistree['parametres']}) : relancez avec --enregistrer.")
+        reference = comparables(enregistree)
+    print(f"{os.cpu_count()} cœur(s), OpenCV {cv2.__version__}, NumPy {np.__version__}, profil {arguments.profil} : "
+          f"{profil['images']} images {profil['resolution'][0]}x{profil['resolution'][1]} par scénario")
+
+    mesures = executer(arguments.dossier_modeles, profil, arguments.bases, arguments.densites,
+                       arguments.processus, arguments.visages)
+
+    if arguments.enregistrer:
+        machine = {"processeurs": os.cpu_count(), "systeme": platform.platform(),
+                   "opencv": cv2.__version__, "numpy": np.__version__}
+        references[arguments.profil] = {"parametres": parametres, "machine": machine, "scenarios": mesures}
+        with open(arguments.reference, "w", encoding="utf-8") as f:
+            json.dump(references, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"Référence enregistrée : {arguments.reference}")
+        sys.exit(0)
+
+    problemes = regressions(mesures, reference)
+    absents = [scenario for scenario in mesures if scenario not in reference]
+    if absents:
+        print(f"Sans référence comparable : {', '.join(absents)}")
+    if problemes:
+        print("Régressions :")
+        for probleme in problemes:
+            print("  " + probleme)
+        sys.exit(1)
+    print("Aucune régression.")
@@ -0,0 +1,59 @@
+"""
+Mesure le temps d'écriture et de requête de la base des résultats sur une archive synthétique.
+
+Usage :
+
+    python bench_results_db.py [nombre_photos] [chemin.sqlite3]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from results_db import ResultsDatabase  # noqa: E402
+
+# --- CONFIGURATION ---
+NB_PHOTOS = 200_000
+NB_PERSONNES = 500
+TAILLE_LOT = 32
+
+
+def remplir(db, nb_photos, nb_personnes=NB_PERSONNES):
+    """Insère des photos de 1 à 4 visages par lots de TAILLE_LOT, comme `process_directory`."""
+    personnes = [f"Personne_{i:04d}" for i in range(nb_personnes)] + ["Inconnu"]
+    db.start_run("synthetique")
+    lot = []
+    for i in range(nb_photos):
+        visages = [((10.0, 20.0, 64.0, 64.0), random.choice(personnes), random.random())
+                   for _ in range(random.randint(1, 4))]
+        lot.append((f"/archive/{i:07d}.jpg", f"{i:032x}", visages))
+        if len(lot) == TAILLE_LOT:
+            db.record_images(lot)
+            lot = []
+    db.record_images(lot)
+    db.finish_run()
+
+
+def chronometrer(libelle, fonction, *args):
+    t0 = time.perf_counter()
+    resultat = fonction(*args)
+    print(f"{libelle:<40} {(time.perf_counter() - t0) * 1000:8.2f} ms  ({len(resultat)} lignes)")
+
+
+if __name__ == "__main__":
+    nb_photos = int(sys.argv[1]) if len(sys.argv) > 1 else NB_PHOTOS
+    chemin = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.mkdtemp(), "resultats.sqlite3")
+
+    db = ResultsDatabase(chemin)
+    t0 = time.perf_counter()
+    remplir(db, nb_photos)
+    ecoule = time.perf_counter() - t0
+    print(f"Écriture de {nb_photos} photos : {ecoule:.1f}s ({nb_photos / ecoule:.0f} photos/s)")
+
+    chronometrer("Photos d'une personne", db.photos_of, "Personne_0042")
+    chronometrer("Photos de deux personnes ensemble", db.photos_with, ["Personne_0042", "Personne_0007"])
+    chronometrer("Co-occurrences", db.co_occurrences, "Personne_0042")
+    chronometrer("100 visages inconnus", db.unknown_faces, 100)
+    db.close()
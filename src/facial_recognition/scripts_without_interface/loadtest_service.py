@@ -0,0 +1,84 @@
+"""
+Test de charge du service de reconnaissance local (`facial-recognition serve`).
+
+Plusieurs clients envoient la même image en boucle pendant une durée donnée ; on
+rapporte le débit, les latences p50/p99 et le nombre de requêtes refusées (503).
+Usage :
+
+    python loadtest_service.py image.jpg [clients] [durée_s] [url]
+"""
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+# --- CONFIGURATION ---
+CLIENTS = 8
+DUREE_S = 10.0
+URL = "http://127.0.0.1:8765/recognize"
+
+
+def client(url, payload, fin, latences, refus, erreurs, verrou):
+    """Envoie des requêtes jusqu'à l'échéance et enregistre leurs latences."""
+    while time.perf_counter() < fin:
+        requete = urllib.request.Request(url, data=payload, method="POST",
+                                         headers={"Content-Type": "application/octet-stream"})
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(requete, timeout=30) as reponse:
+                reponse.read()
+            with verrou:
+                latences.append(time.perf_counter() - t0)
+        except urllib.error.HTTPError as e:
+            with verrou:
+                if e.code == 503:
+                    refus.append(1)
+                else:
+                    erreurs.append(e.code)
+            time.sleep(0.01)
+        except OSError as e:
+            with verrou:
+                erreurs.append(str(e))
+
+
+def lancer(image_path, clients=CLIENTS, duree=DUREE_S, url=URL):
+    """Lance le test de charge et affiche le rapport."""
+    with open(image_path, "rb") as f:
+        payload = f.read()
+
+    latences, refus, erreurs = [], [], []
+    verrou = threading.Lock()
+    debut = time.perf_counter()
+    fin = debut + duree
+    threads = [
+        threading.Thread(target=client, args=(url, payload, fin, latences, refus, erreurs, verrou))
+        for _ in range(clients)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ecoule = time.perf_counter() - debut
+
+    print(f"Clients : {clients}, durée : {ecoule:.1f}s")
+    print(f"Requêtes réussies : {len(latences)} ({len(latences) / ecoule:.1f} req/s)")
+    print(f"Refusées (503) : {len(refus)}, erreurs : {len(erreurs)}")
+    if latences:
+        ms = np.array(latences) * 1000
+        print(f"Latence p50 : {np.percentile(ms, 50):.1f} ms, p99 : {np.percentile(ms, 99):.1f} ms, "
+              f"max : {ms.max():.1f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    lancer(
+        sys.argv[1],
+        clients=int(sys.argv[2]) if len(sys.argv) > 2 else CLIENTS,
+        duree=float(sys.argv[3]) if len(sys.argv) > 3 else DUREE_S,
+        url=sys.argv[4] if len(sys.argv) > 4 else URL,
+    )
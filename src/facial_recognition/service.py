@@ -0,0 +1,258 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+try:
+    from .alignment import CropBatch
+except ImportError:
+    from alignment import CropBatch
+
+
+# Taille maximale d'une image soumise par HTTP
+MAX_BODY_BYTES = 32 * 1024 * 1024
+
+
+class ServiceBusy(Exception):
+    """Levée lorsque la file d'attente du service est pleine (contre-pression)."""
+
+
+class RecognitionService:
+    """
+    Service de reconnaissance résident : modèles et base de signatures restent chargés.
+
+    Les requêtes concurrentes sont regroupées en micro-lots : un thread unique attend
+    la première image, collecte les suivantes pendant `batch_window` secondes (ou
+    jusqu'à `max_batch` images), puis encode tous leurs visages en une seule passe.
+    """
+
+    def __init__(self, manager, max_batch=16, batch_window=0.005, max_pending=64):
+        """
+        :param manager: FaceRecognizerManager dont les modèles et signatures sont chargés.
+        :param max_batch: Nombre maximal d'images par micro-lot.
+        :param batch_window: Fenêtre de regroupement des requêtes, en secondes.
+        :param max_pending: Nombre maximal de requêtes en cours ; au-delà, `ServiceBusy` est levée.
+        """
+        self.manager = manager
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._queue = queue.Queue()
+        self._crops = CropBatch(manager.batch_size)
+        self._thread = None
+        self._running = False
+        self._opened_matcher = False
+
+    def start(self):
+        """Démarre le thread de traitement des micro-lots."""
+        if self._running:
+            return
+        self._running = True
+        self._opened_matcher = self.manager.open_matcher()
+        self._thread = threading.Thread(target=self._run, name="recognition-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Arrête le thread de traitement après le lot en cours. Les requêtes encore en
+        attente échouent avec `ServiceBusy`.
+        """
+        self._running = False
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(ServiceBusy("Service arrêté"))
+        if self._opened_matcher:
+            self.manager.close_matcher()
+            self._opened_matcher = False
+
+    def submit(self, image_bytes):
+        """
+        Soumet une image encodée (JPEG, PNG...) à la reconnaissance.
+
+        :param image_bytes: Contenu du fichier image.
+        :return: Future dont le résultat est la liste des visages (boîte, nom, score).
+        :raises ServiceBusy: Si trop de requêtes sont déjà en attente.
+        :raises ValueError: Si l'image ne peut pas être décodée.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ServiceBusy("Trop de requêtes en attente")
+        try:
+            # Décodage dans le thread de la requête : il se parallélise entre clients
+            img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                raise ValueError("Image illisible")
+        except Exception:
+            self._slots.release()
+            raise
+
+        future = Future()
+        future.add_done_callback(lambda _: self._slots.release())
+        self._queue.put((img, future))
+        return future
+
+    def recognize(self, image_bytes, timeout=None):
+        """Version bloquante de `submit`."""
+        return self.submit(image_bytes).result(timeout=timeout)
+
+    def _run(self):
+        while self._running:
+            item = self._queue.get()
+            if item is None:
+                continue
+            batch = [item]
+            deadline = time.perf_counter() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    continue
+                batch.append(item)
+
+            try:
+                results = self._process_batch([img for img, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _process_batch(self, images):
+        """
+        Détecte, aligne et encode en une passe les visages d'un micro-lot d'images.
+
+        :param images: Images BGR décodées.
+        :return: Pour chaque image, liste de dict {box, name, score}.
+        """
+        manager = self.manager
+        # Prise en compte des identités ajoutées ou retirées par un autre processus
+        manager.refresh_gallery()
+        gallery = manager.gallery
+        detections = []
+        self._crops.clear()
+
+        for img in images:
+            faces = manager._detect(img)
+            detections.append(faces)
+            self._crops.add(img, faces)
+
+        features = manager._embed_crops(self._crops.crops)
+        results = []
+        offset = 0
+        matches = manager._match_features(features, gallery)
+        for faces in detections:
+            faces_result = []
+            for face, (name, score) in zip(faces, matches[offset:offset + len(faces)]):
+                faces_result.append({
+                    "box": [round(float(v), 1) for v in face[:4]],
+                    "name": name,
+                    "score": round(float(score), 4),
+                })
+            offset += len(faces)
+            results.append(faces_result)
+        return results
+
+
+class RecognitionRequestHandler(BaseHTTPRequestHandler):
+    """
+    Point d'accès HTTP : `POST /recognize` avec le contenu brut de l'image, `GET /health`.
+    """
+
+    service = None  # RecognitionService, renseigné par `create_server`
+    timeout_s = 30.0
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "known_faces": len(self.service.manager.known_names)})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/recognize":
+            self._send_json(404, {"error": "not found"})
+            return
+        if "Content-Length" not in self.headers:
+            self._send_json(411, {"error": "Content-Length required"})
+            return
+        try:
+            length = int(self.headers["Content-Length"])
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json(400, {"error": "invalid Content-Length"})
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": f"image larger than {MAX_BODY_BYTES} bytes"})
+            return
+        body = self.rfile.read(length)
+        start = time.perf_counter()
+        try:
+            faces = self.service.submit(body).result(timeout=self.timeout_s)
+        except ServiceBusy as e:
+            self._send_json(503, {"error": str(e)}, headers={"Retry-After": "1"})
+            return
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+
+        names = sorted({f["name"] for f in faces if f["name"] != "Inconnu"})
+        self._send_json(200, {
+            "faces": faces,
+            "names": names,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+        })
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Pas de journalisation par requête : elle coûterait plus cher que la reconnaissance
+        pass
+
+
+class RecognitionHTTPServer(ThreadingHTTPServer):
+    """Serveur HTTP multi-thread avec une file de connexions élargie pour les pics de charge."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def create_server(service, host="127.0.0.1", port=8765):
+    """
+    Crée le serveur HTTP local autour d'un service démarré.
+
+    :param service: RecognitionService.
+    :param host: Adresse d'écoute (locale par défaut).
+    :param port: Port d'écoute.
+    :return: RecognitionHTTPServer prêt à `serve_forever()`.
+    """
+    handler = type("BoundRecognitionRequestHandler", (RecognitionRequestHandler,), {"service": service})
+    return RecognitionHTTPServer((host, port), handler)
@@ -0,0 +1,273 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Bases attachées dans un processus de comparaison (la dernière publiée seulement)
+_attached = {}
+
+# Blocs des produits visages x base : un bloc de scores (512 x 2048 float32, 4 Mo) reste en
+# cache, et chaque produit est assez grand pour que BLAS tourne à plein régime
+QUERY_BLOCK = 512
+ROW_BLOCK = 2048
+
+
+class SharedGallery:
+    """
+    Signatures de la base placées une seule fois en mémoire partagée.
+
+    La matrice des signatures normalisées (N, 128) float32 est écrite dans un segment
+    `multiprocessing.shared_memory` ; chaque processus qui s'y attache n'en obtient qu'une
+    vue NumPy, sans copie. Les noms restent dans le processus qui publie : les processus
+    de comparaison ne retournent que des positions et des scores.
+    """
+
+    def __init__(self, shm, rows, dim, owner, names=None):
+        """
+        Utiliser `create` ou `attach`.
+
+        :param shm: Segment de mémoire partagée.
+        :param rows: Nombre de signatures.
+        :param dim: Dimension des signatures.
+        :param owner: True pour le processus qui a créé le segment (et le libère).
+        :param names: Identités associées (processus propriétaire seulement).
+        """
+        self._shm = shm
+        self.owner = owner
+        self.names = names
+        self.matrix = np.ndarray((rows, dim), dtype=np.float32, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, gallery):
+        """
+        Publie un instantané de la base en mémoire partagée.
+
+        :param gallery: Gallery (signatures et noms).
+        :return: SharedGallery propriétaire du segment.
+        """
+        if gallery.features:
+            matrix = np.vstack([np.asarray(f, dtype=np.float32).reshape(1, -1) for f in gallery.features])
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        else:
+            matrix = np.empty((0, 128), dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+        shared = cls(shm, matrix.shape[0], matrix.shape[1], True, list(gallery.names))
+        shared.matrix[:] = matrix
+        return shared
+
+    @classmethod
+    def attach(cls, descriptor):
+        """
+        S'attache à une base publiée par un autre processus.
+
+        :param descriptor: `descriptor` de la base publiée.
+        :return: SharedGallery (vue sans copie, sans les noms).
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=descriptor["name"], track=False)
+        except TypeError:
+            # Python < 3.13 : les processus de comparaison (spawn) partagent le suivi des ressources
+            # du processus qui publie, où le segment est déjà enregistré
+            shm = shared_memory.SharedMemory(name=descriptor["name"])
+        return cls(shm, descriptor["rows"], descriptor["dim"], False)
+
+    @property
+    def descriptor(self):
+        """Description picklable (quelques octets) permettant à un autre processus de s'attacher."""
+        return {"name": self._shm.name, "rows": self.matrix.shape[0], "dim": self.matrix.shape[1]}
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def close(self):
+        """Détache la base ; le propriétaire libère aussi le segment."""
+        self.matrix = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+    def top_k(self, features, k=1, start=0, stop=None):
+        """
+        Meilleures signatures (similarité cosinus) d'un lot de visages, sur une tranche de la base.
+
+        :param features: Signatures des visages (F, 128), ou liste de signatures 1x128.
+        :param k: Nombre de résultats par visage.
+        :param start: Début de la tranche.
+        :param stop: Fin de la tranche (None = fin de la base).
+        :return: (np.ndarray, np.ndarray): Positions dans la base (F, k') et scores (F, k'), par score
+            décroissant puis position croissante, avec k' = min(k, taille de la tranche).
+        """
+        return blocked_top_k(_unit_rows(features), self.matrix[start:stop], k, start)
+
+
+class ShardedMatcher:
+    """
+    Comparaison à une base partagée, répartie par tranches entre des processus.
+
+    Chaque processus s'attache au segment de la base (sans copie) et retourne le
+    top-k de sa tranche ; les résultats sont fusionnés en un top-k global. Avec une
+    seule tranche, la comparaison est faite dans le processus courant. Quand la base
+    change, elle est republiée et les processus s'attachent au nouveau segment.
+    """
+
+    def __init__(self, shards=1):
+        """
+        :param shards: Nombre de tranches (et de processus de comparaison au-delà de 1).
+        """
+        self.shards = max(1, shards)
+        self.gallery = None  # Instantané publié
+        self.shared = None
+        self._executor = None
+        if self.shards > 1:
+            # "spawn" : pas de fork d'un processus qui a déjà démarré des threads (Qt, OpenCV)
+            self._executor = ProcessPoolExecutor(max_workers=self.shards,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+
+    def publish(self, gallery):
+        """Publie un instantané de la base s'il n'est pas déjà celui en mémoire partagée."""
+        if gallery is self.gallery:
+            return
+        previous = self.shared
+        self.shared = SharedGallery.create(gallery)
+        self.gallery = gallery
+        if previous is not None:
+            previous.close()
+
+    def top_k(self, gallery, features, k=1):
+        """
+        :param gallery: Instantané de la base (publié s'il a changé).
+        :param features: Signatures des visages (F, 128), ou liste de signatures 1x128.
+        :param k: Nombre de résultats par visage.
+        :return: (np.ndarray, np.ndarray): Positions dans la base et scores, (F, k) chacun.
+        """
+        self.publish(gallery)
+        rows = len(self.shared)
+        if self._executor is None or rows < self.shards:
+            return self.shared.top_k(features, k)
+        queries = _unit_rows(features)
+        bounds = np.linspace(0, rows, self.shards + 1).astype(int)
+        futures = [
+            self._executor.submit(_shard_top_k, self.shared.descriptor, queries, k, start, stop)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        parts = [future.result() for future in futures]
+        return _select_top_k(np.hstack([scores for _, scores in parts]),
+                             np.hstack([indices for indices, _ in parts]), k)
+
+    def report(self):
+        """Résumé lisible : taille de la base partagée et nombre de tranches."""
+        rows = len(self.shared) if self.shared is not None else 0
+        size = self.shared.nbytes / (1024 * 1024) if self.shared is not None else 0.0
+        return (f"Base partagée : {rows} signatures ({size:.1f} Mo en une seule copie), "
+                f"comparées en {self.shards} tranche(s).")
+
+    def worker_pids(self):
+        """:return: list: Identifiants des processus de comparaison démarrés."""
+        if self._executor is None:
+            return []
+        return list(self._executor._processes or {})
+
+    def close(self):
+        """Arrête les processus de comparaison et libère la base partagée."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+            self.gallery = None
+
+
+def _unit_rows(features):
+    """Signatures (F, D) float32 normalisées."""
+    queries = np.vstack([np.asarray(f, dtype=np.float32).reshape(1, -1) for f in features])
+    return queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+
+def blocked_top_k(queries, matrix, k=1, start=0, query_block=QUERY_BLOCK, row_block=ROW_BLOCK):
+    """
+    Top-k de chaque visage parmi les lignes de `matrix`, par produits matriciels de blocs.
+
+    Seul un bloc de scores (query_block x row_block) existe à la fois, jamais la matrice
+    complète visages x base : le top-k courant de chaque visage est fusionné avec celui
+    de chaque bloc de la base, parcourue dans l'ordre (les ex aequo gardent la première
+    position, comme une recherche exhaustive).
+
+    :param queries: Signatures normalisées (F, D) float32.
+    :param matrix: Signatures normalisées de la base (ou d'une tranche), (n, D) float32.
+    :param k: Nombre de résultats par visage.
+    :param start: Position de la première ligne de `matrix` dans la base.
+    :return: (np.ndarray, np.ndarray): Positions dans la base (F, k') et scores (F, k'), par score
+        décroissant puis position croissante, avec k' = min(k, n).
+    """
+    k = min(k, len(matrix))
+    top_indices = np.empty((len(queries), k), dtype=np.int64)
+    top_scores = np.empty((len(queries), k), dtype=np.float32)
+    if k == 0:
+        return top_indices, top_scores
+    for q in range(0, len(queries), query_block):
+        block = queries[q:q + query_block]
+        best_indices = best_scores = None
+        for r in range(0, len(matrix), row_block):
+            scores = block @ matrix[r:r + row_block].T
+            indices, scores = _select_top_k(scores, np.arange(start + r, start + r + scores.shape[1]), k)
+            if best_indices is None:
+                best_indices, best_scores = indices, scores
+            elif k == 1:
+                # Strictement meilleur seulement : un ex aequo garde la position du bloc précédent
+                better = scores > best_scores
+                best_indices = np.where(better, indices, best_indices)
+                best_scores = np.where(better, scores, best_scores)
+            else:
+                best_indices, best_scores = _select_top_k(np.hstack([best_scores, scores]),
+                                                          np.hstack([best_indices, indices]), k)
+        top_indices[q:q + query_block] = best_indices
+        top_scores[q:q + query_block] = best_scores
+    return top_indices, top_scores
+
+
+def _select_top_k(scores, indices, k):
+    """
+    Top-k par ligne de `scores` (F, n), les positions `indices` (n,) ou (F, n) départageant les
+    ex aequo (pour k = 1, elles doivent être croissantes le long de chaque ligne).
+    """
+    indices = np.broadcast_to(indices, scores.shape)
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((len(scores), 0), dtype=np.int64), np.empty((len(scores), 0), dtype=np.float32)
+    if k == 1:
+        # Positions croissantes (tranches dans l'ordre) : argmax retient déjà la première ex aequo
+        best = scores.argmax(axis=1)[:, None]
+        return np.take_along_axis(indices, best, axis=1), np.take_along_axis(scores, best, axis=1)
+    # Présélection en temps linéaire de k candidats par ligne, triés par score puis position
+    cols = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < scores.shape[1] else \
+        np.broadcast_to(np.arange(k), scores.shape)
+    top_indices = np.take_along_axis(indices, cols, axis=1)
+    top_scores = np.take_along_axis(scores, cols, axis=1)
+    order = np.lexsort((top_indices, -top_scores), axis=1)
+    top_indices = np.take_along_axis(top_indices, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    if k < scores.shape[1]:
+        # Lignes où des ex aequo du k-ième score n'ont pas tous été présélectionnés : choix exact
+        for row in np.flatnonzero((scores >= top_scores[:, -1:]).sum(axis=1) > k):
+            cand = np.flatnonzero(scores[row] >= top_scores[row, -1])
+            best = cand[np.lexsort((indices[row, cand], -scores[row, cand]))[:k]]
+            top_indices[row] = indices[row, best]
+            top_scores[row] = scores[row, best]
+    return top_indices, top_scores
+
+
+def _shard_top_k(descriptor, queries, k, start, stop):
+    """Top-k d'une tranche, dans un processus de comparaison attaché à la base partagée."""
+    shared = _attached.get(descriptor["name"])
+    if shared is None:
+        for previous in _attached.values():
+            previous.close()
+        _attached.clear()
+        shared = _attached[descriptor["name"]] = SharedGallery.attach(descriptor)
+    return shared.top_k(queries, k, start, stop)
@@ -0,0 +1,158 @@
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class RecentIdentities:
+    """
+    Liste courte des identités reconnues sur les dernières photos, avec repli exact.
+
+    Un visage est d'abord comparé, avec le reconnaisseur, aux signatures des identités
+    récentes. Le reste de la base n'est ensuite que borné, identité par identité : le score
+    d'une signature normalisée ne dépasse pas celui du centre de son identité plus la
+    distance qui l'en sépare (le rayon de l'identité). Seules les signatures des identités
+    dont la borne approche le meilleur score de la liste courte sont comparées. La recherche
+    complète (`_match_features` du gestionnaire, vectorisée si la comparaison à la base
+    partagée est ouverte) n'a lieu que si l'une d'elles approche ce score, à la marge de
+    sécurité près. Le résultat est donc identique à celui de la recherche exhaustive.
+    """
+
+    def __init__(self, capacity=8, margin=1e-4):
+        """
+        :param capacity: Nombre d'identités conservées dans la liste courte.
+        :param margin: Marge de sécurité couvrant les écarts d'arrondi entre le filtrage (NumPy)
+            et les scores d'OpenCV.
+        """
+        self.capacity = capacity
+        self.margin = margin
+        self._recent = OrderedDict()
+        self._gallery = None
+        self._indices = {}
+        self._matrix = None
+        self._positions = {}  # Identité -> rang dans `_centers`
+        self._rows = []  # Lignes de `_matrix` de chaque identité
+        self._centers = None
+        self._radii = None
+        self.faces = 0
+        self.hits = 0
+        self.shortlist_time = 0.0  # Liste courte, filtrage du reste de la base et préparation
+        self.full_time = 0.0  # Recherches complètes (échecs de la liste courte)
+
+    def match(self, manager, unknown_feat, gallery):
+        """
+        Identifie un visage, en passant par la liste courte lorsque c'est sans risque.
+
+        :param manager: FaceRecognizerManager (reconnaisseur, règle de décision, recherche complète).
+        :param unknown_feat: Signature du visage à identifier.
+        :param gallery: Instantané de la base.
+        :return: (str, float): Même résultat que `manager._match_features([unknown_feat], gallery)`.
+        """
+        start = time.perf_counter()
+        self.faces += 1
+        self._prepare(gallery)
+        result = self._match_recent(manager, unknown_feat, gallery)
+        now = time.perf_counter()
+        self.shortlist_time += now - start
+
+        if result is None:
+            result = manager._match_features([unknown_feat], gallery)[0]
+            self.full_time += time.perf_counter() - now
+        else:
+            self.hits += 1
+
+        name = result[0]
+        if name in self._indices:
+            self._recent[name] = None
+            self._recent.move_to_end(name)
+            if len(self._recent) > self.capacity:
+                self._recent.popitem(last=False)
+        return result
+
+    def estimated_savings(self):
+        """
+        :return: float: Temps de comparaison économisé (s), estimé d'après la durée moyenne des
+            recherches complètes effectuées ; None si aucune n'a eu lieu.
+        """
+        misses = self.faces - self.hits
+        if not misses:
+            return None
+        return self.hits * self.full_time / misses - self.shortlist_time
+
+    def report(self):
+        """Résumé lisible : taux de succès de la liste courte et temps économisé."""
+        if not self.faces:
+            return "Liste courte : aucun visage comparé."
+        text = (f"Liste courte : {self.hits}/{self.faces} visages ({self.hits / self.faces:.0%}) "
+                f"identifiés sans recherche complète")
+        savings = self.estimated_savings()
+        if savings is not None:
+            text += f", environ {savings:.2f}s de comparaison économisées"
+        return text + "."
+
+    def _prepare(self, gallery):
+        """
+        Indexe un nouvel instantané de la base : positions par identité, signatures normalisées,
+        centre et rayon de chaque identité.
+        """
+        if gallery is self._gallery:
+            return
+        self._gallery = gallery
+        self._indices = {}
+        for i, name in enumerate(gallery.names):
+            self._indices.setdefault(name, []).append(i)
+        if gallery.features:
+            matrix = np.vstack([np.asarray(f, dtype=np.float64).reshape(1, -1) for f in gallery.features])
+            self._matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        else:
+            self._matrix = np.empty((0, 0))
+        self._positions = {name: rank for rank, name in enumerate(self._indices)}
+        self._rows = [np.asarray(rows) for rows in self._indices.values()]
+        if self._rows:
+            labels = np.empty(len(self._matrix), dtype=np.intp)
+            for rank, rows in enumerate(self._rows):
+                labels[rows] = rank
+            counts = np.bincount(labels)
+            self._centers = np.zeros((len(self._rows), self._matrix.shape[1]))
+            np.add.at(self._centers, labels, self._matrix)
+            self._centers /= counts[:, None]
+            self._radii = np.zeros(len(self._rows))
+            np.maximum.at(self._radii, labels, np.linalg.norm(self._matrix - self._centers[labels], axis=1))
+        # Les identités retirées de la base sortent de la liste courte
+        for name in [n for n in self._recent if n not in self._indices]:
+            del self._recent[name]
+
+    def _match_recent(self, manager, unknown_feat, gallery):
+        """Résultat tiré de la liste courte, ou None si la recherche complète est nécessaire."""
+        if not self._recent:
+            return None
+        # Ordre de la base : les ex aequo sont départagés comme dans la recherche exhaustive
+        candidates = sorted(i for name in self._recent for i in self._indices[name])
+        scores = [
+            manager.recognizer.match(gallery.features[i], unknown_feat, cv2.FaceRecognizerSF_FR_COSINE)
+            for i in candidates
+        ]
+        best = int(np.argmax(scores))
+        best_score = scores[best]
+
+        name = gallery.names[candidates[best]]
+        # Meilleur score d'une autre identité (marge), tiré des scores déjà calculés
+        rivals = [score for i, score in zip(candidates, scores) if gallery.names[i] != name]
+
+        # Reste de la base : aucune autre signature ne doit approcher ce score. Les identités dont
+        # la borne reste sous le meilleur score, marge de décision comprise, ne changent ni le nom
+        # ni la décision ; seules les autres sont comparées
+        if len(candidates) < len(self._matrix):
+            unknown = np.asarray(unknown_feat, dtype=np.float64).ravel()
+            unknown = unknown / max(np.linalg.norm(unknown), 1e-12)
+            bounds = self._centers @ unknown + self._radii
+            bounds[[self._positions[n] for n in self._recent]] = -np.inf
+            contenders = np.flatnonzero(bounds >= best_score - self.margin - (manager.margin or 0))
+            if contenders.size:
+                others = self._matrix[np.concatenate([self._rows[i] for i in contenders])] @ unknown
+                if others.max() >= best_score - self.margin:
+                    return None
+                rivals.append(float(others.max()))
+
+        return manager._decide(name, best_score, max(rivals, default=None))
@@ -0,0 +1,171 @@
+import os
+
+import cv2
+import numpy as np
+
+try:
+    from .gallery import Gallery
+except ImportError:
+    from gallery import Gallery
+
+# Écart-type par composante du bruit d'une signature autour du centre de son identité :
+# cos ~0,7 entre deux photos d'une même personne, comme SFace
+FEATURE_NOISE = 0.058
+# Côté d'un visage collé, en fraction de la plus petite dimension de sa case
+FACE_FILL = 0.6
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def synthetic_gallery(size, per_identity=5, noise=FEATURE_NOISE, dim=128, seed=0):
+    """
+    Base de signatures synthétique : identités regroupées autour de centres aléatoires.
+
+    :param size: Nombre de signatures.
+    :param per_identity: Signatures par identité (la dernière peut en compter moins).
+    :param noise: Écart-type par composante autour du centre normalisé d'une identité.
+    :param dim: Dimension des signatures.
+    :param seed: Graine du générateur (même base pour les mêmes paramètres).
+    :return: Gallery de signatures normalisées (tableaux 1 x dim, float32).
+    """
+    rng = np.random.default_rng(seed)
+    identities = -(-size // per_identity)
+    centers = rng.standard_normal((identities, dim), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    labels = np.arange(size) // per_identity
+    matrix = centers[labels]
+    matrix += rng.standard_normal(matrix.shape, dtype=np.float32) * np.float32(noise)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    width = len(str(identities - 1))
+    names = [f"Identite_{label:0{width}d}" for label in labels.tolist()]
+    return Gallery([row.reshape(1, -1) for row in matrix], names)
+
+
+def drawn_face(side, rng=None):
+    """
+    Dessine un visage schématique (cheveux, peau, yeux, sourcils, nez, bouche) que YuNet détecte,
+    pour mesurer le tri sans photos de visages.
+
+    :param side: Hauteur du visage en pixels (largeur : 80 %).
+    :param rng: Générateur NumPy (optionnel) : couleurs de la peau, des cheveux et du fond.
+    :return: Image BGR.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    height, width = side, max(1, side * 4 // 5)
+    center = width // 2
+
+    def color(low, high):
+        return tuple(int(v) for v in rng.integers(low, high, 3))
+
+    skin = np.array(color((90, 130, 170), (170, 200, 240)))
+    face = np.empty((height, width, 3), dtype=np.uint8)
+    face[:] = color(90, 160)
+    cv2.ellipse(face, (center, int(height * 0.42)), (int(width * 0.44), int(height * 0.44)), 0, 0, 360,
+                color(20, 70), -1, cv2.LINE_AA)
+    cv2.ellipse(face, (center, int(height * 0.55)), (int(width * 0.38), int(height * 0.42)), 0, 0, 360,
+                tuple(skin.tolist()), -1, cv2.LINE_AA)
+    eye_y, eye_dx = int(height * 0.48), int(width * 0.17)
+    for side_sign in (-1, 1):
+        eye_x = center + side_sign * eye_dx
+        cv2.ellipse(face, (eye_x, eye_y), (int(width * 0.08), int(height * 0.035)), 0, 0, 360,
+                    (245, 245, 245), -1, cv2.LINE_AA)
+        cv2.circle(face, (eye_x, eye_y), int(height * 0.028), (40, 30, 20), -1, cv2.LINE_AA)
+        cv2.line(face, (eye_x - int(width * 0.09), eye_y - int(height * 0.07)),
+                 (eye_x + int(width * 0.09), eye_y - int(height * 0.08)), (30, 30, 40), max(1, height // 40), cv2.LINE_AA)
+    cv2.line(face, (center, eye_y + int(height * 0.02)), (center - int(width * 0.03), int(height * 0.66)),
+             tuple((skin * 3 // 4).tolist()), max(1, height // 50), cv2.LINE_AA)
+    cv2.ellipse(face, (center, int(height * 0.76)), (int(width * 0.13), int(height * 0.04)), 0, 0, 180,
+                (60, 60, 150), max(1, height // 35), cv2.LINE_AA)
+    return cv2.GaussianBlur(face, (0, 0), side / 120)
+
+
+def drawn_faces(count, side=160, seed=0):
+    """
+    :param count: Nombre de visages.
+    :param side: Hauteur de chaque visage.
+    :param seed: Graine du générateur (mêmes visages pour les mêmes paramètres).
+    :return: list: Visages dessinés (voir `drawn_face`), à coller dans les images synthétiques.
+    """
+    rng = np.random.default_rng(seed)
+    return [drawn_face(side, rng) for _ in range(count)]
+
+
+def load_face_images(face_dir):
+    """
+    :param face_dir: Répertoire de photos de visages, parcouru récursivement (par exemple
+        celui des visages connus).
+    :return: list: Images BGR lisibles, dans l'ordre des chemins.
+    """
+    faces = []
+    for root, dirs, files in os.walk(face_dir):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                img = cv2.imread(os.path.join(root, filename))
+                if img is not None:
+                    faces.append(img)
+    return faces
+
+
+def synthetic_image(faces, count, resolution=(1920, 1080), rng=None):
+    """
+    Compose une image : fond dégradé légèrement bruité et `count` visages, un par case d'une grille.
+
+    :param faces: Images de visages à coller (tirées au hasard), ou liste vide pour une image sans visage.
+    :param count: Nombre de visages.
+    :param resolution: (largeur, hauteur) de l'image.
+    :param rng: Générateur NumPy (optionnel).
+    :return: Image BGR.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    width, height = resolution
+    ramp = np.linspace(60, 190, width, dtype=np.float32)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = (ramp[None, :, None] * rng.uniform(0.6, 1.0, 3)).astype(np.uint8)
+    image += rng.integers(0, 12, image.shape, dtype=np.uint8)
+    if not faces or not count:
+        return image
+
+    # Grille au rapport de l'image, assez grande pour `count` visages
+    columns = max(1, int(np.ceil(np.sqrt(count * width / height))))
+    rows = -(-count // columns)
+    cell_w, cell_h = width // columns, height // rows
+    side = int(FACE_FILL * min(cell_w, cell_h))
+    for cell in rng.permutation(rows * columns)[:count].tolist():
+        face = faces[int(rng.integers(len(faces)))]
+        face_h = max(1, side)
+        face_w = max(1, face_h * face.shape[1] // face.shape[0])
+        face = cv2.resize(face, (face_w, face_h), interpolation=cv2.INTER_LINEAR)
+        y = (cell // columns) * cell_h + int(rng.integers(0, max(1, cell_h - face_h)))
+        x = (cell % columns) * cell_w + int(rng.integers(0, max(1, cell_w - face_w)))
+        image[y:y + face_h, x:x + face_w] = face[:height - y, :width - x]
+    return image
+
+
+def write_image_folder(directory, images, faces_per_image=1, resolution=(1920, 1080), face_dir=None,
+                       quality=90, seed=0, faces=None):
+    """
+    Écrit un dossier d'images JPEG synthétiques à trier.
+
+    :param directory: Dossier de sortie (créé au besoin).
+    :param images: Nombre d'images.
+    :param faces_per_image: Visages par image.
+    :param resolution: (largeur, hauteur) des images.
+    :param face_dir: Photos de visages à coller (voir `load_face_images`). Sans elles (ni `faces`),
+        les images n'ont pas de visage : seuls le décodage et la détection sont mesurés.
+    :param quality: Qualité JPEG.
+    :param seed: Graine du générateur.
+    :param faces: Visages à coller, à la place de `face_dir` (par exemple ceux de `drawn_faces`).
+    :return: list: Chemins des images écrites.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if faces is None:
+        faces = load_face_images(face_dir) if face_dir else []
+    rng = np.random.default_rng(seed)
+    width = len(str(max(0, images - 1)))
+    paths = []
+    for i in range(images):
+        path = os.path.join(directory, f"synthetique_{i:0{width}d}.jpg")
+        image = synthetic_image(faces, faces_per_image, resolution, rng)
+        cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        paths.append(path)
+    return paths
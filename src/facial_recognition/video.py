@@ -0,0 +1,166 @@
+import numpy as np
+
+
+class Track:
+    """
+    Visage suivi d'une image à l'autre dans une vidéo.
+    """
+
+    def __init__(self, track_id, face, frame_idx):
+        """
+        :param track_id: Identifiant unique de la piste.
+        :param face: Détection YuNet initiale (15 valeurs).
+        :param frame_idx: Index de l'image où le visage apparaît.
+        """
+        self.track_id = track_id
+        self.face = face
+        self.first_frame = frame_idx
+        self.last_frame = frame_idx
+        self.missed = 0
+        self.name = None  # None tant que la piste n'a pas été encodée
+        self.score = 0.0
+        self.samples_since_embedding = 0
+
+
+def box_iou(boxes_a, boxes_b):
+    """
+    Calcule la matrice des IoU entre deux ensembles de boîtes (x, y, w, h).
+
+    :return: Tableau (len(boxes_a), len(boxes_b)).
+    """
+    a = np.asarray(boxes_a, dtype=np.float32)[:, None, :4]
+    b = np.asarray(boxes_b, dtype=np.float32)[None, :, :4]
+    x1 = np.maximum(a[..., 0], b[..., 0])
+    y1 = np.maximum(a[..., 1], b[..., 1])
+    x2 = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2])
+    y2 = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+def landmark_distance(faces_a, faces_b):
+    """
+    Distance moyenne entre les 5 points de repère, normalisée par la largeur des boîtes.
+
+    :return: Tableau (len(faces_a), len(faces_b)).
+    """
+    a = np.asarray(faces_a, dtype=np.float32)[:, None, 4:14].reshape(len(faces_a), 1, 5, 2)
+    b = np.asarray(faces_b, dtype=np.float32)[None, :, 4:14].reshape(1, len(faces_b), 5, 2)
+    dist = np.linalg.norm(a - b, axis=-1).mean(axis=-1)
+    width = np.maximum(np.asarray(faces_a, dtype=np.float32)[:, None, 2], 1.0)
+    return dist / width
+
+
+class FaceTracker:
+    """
+    Suivi glouton des visages par IoU des boîtes et proximité des points de repère.
+
+    Une piste n'est encodée (SFace) et comparée à la base qu'à sa création ; tant
+    qu'elle reste « Inconnu », une nouvelle tentative est faite toutes les
+    `retry_interval` images échantillonnées.
+    """
+
+    def __init__(self, iou_threshold=0.3, landmark_threshold=0.5, max_missed=2, retry_interval=5):
+        """
+        :param iou_threshold: IoU minimale pour associer une détection à une piste.
+        :param landmark_threshold: Distance maximale des points de repère (relative à la largeur du visage)
+            acceptée lorsque l'IoU est insuffisante (mouvement rapide).
+        :param max_missed: Nombre d'images échantillonnées sans détection avant de clore une piste.
+        :param retry_interval: Intervalle de nouvelle tentative d'identification d'une piste inconnue.
+        """
+        self.iou_threshold = iou_threshold
+        self.landmark_threshold = landmark_threshold
+        self.max_missed = max_missed
+        self.retry_interval = retry_interval
+        self.active = []
+        self.finished = []
+        self._next_id = 0
+
+    def update(self, faces, frame_idx):
+        """
+        Associe les détections d'une image aux pistes actives.
+
+        :param faces: Détections YuNet de l'image (F, 15), éventuellement None.
+        :param frame_idx: Index de l'image dans la vidéo.
+        :return: list: Tuples (indice de la détection, piste) des visages à encoder.
+        """
+        faces = np.empty((0, 15), dtype=np.float32) if faces is None else np.asarray(faces)
+        matched_tracks = {}  # indice de piste -> indice de détection
+        matched_faces = set()
+
+        if self.active and len(faces):
+            track_faces = np.stack([t.face for t in self.active])
+            iou = box_iou(track_faces, faces)
+            close = landmark_distance(track_faces, faces) < self.landmark_threshold
+            affinity = np.where((iou >= self.iou_threshold) | close, iou + close, -1.0)
+
+            # Association gloutonne par affinité décroissante
+            for flat in np.argsort(-affinity, axis=None):
+                t_idx, f_idx = (int(i) for i in np.unravel_index(flat, affinity.shape))
+                if affinity[t_idx, f_idx] < 0:
+                    break
+                if t_idx in matched_tracks or f_idx in matched_faces:
+                    continue
+                matched_tracks[t_idx] = f_idx
+                matched_faces.add(f_idx)
+                track = self.active[t_idx]
+                track.face = faces[f_idx]
+                track.last_frame = frame_idx
+                track.missed = 0
+                track.samples_since_embedding += 1
+
+        to_embed = []
+        still_active = []
+        for t_idx, track in enumerate(self.active):
+            if t_idx not in matched_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    self.finished.append(track)
+                    continue
+            elif track.name == "Inconnu" and track.samples_since_embedding >= self.retry_interval:
+                track.samples_since_embedding = 0
+                to_embed.append((matched_tracks[t_idx], track))
+            still_active.append(track)
+        self.active = still_active
+
+        for f_idx in range(len(faces)):
+            if f_idx in matched_faces:
+                continue
+            track = Track(self._next_id, faces[f_idx], frame_idx)
+            self._next_id += 1
+            self.active.append(track)
+            to_embed.append((f_idx, track))
+
+        return to_embed
+
+    def close(self):
+        """Clôt toutes les pistes actives (fin de la vidéo)."""
+        self.finished.extend(self.active)
+        self.active = []
+
+
+def build_timeline(tracks, fps, gap=0.0):
+    """
+    Regroupe les pistes en intervalles de présence par personne.
+
+    :param tracks: Pistes terminées.
+    :param fps: Cadence de la vidéo (images par seconde).
+    :param gap: Écart maximal (en secondes) en dessous duquel deux intervalles sont fusionnés.
+    :return: dict: nom -> liste de (début, fin) en secondes, triée.
+    """
+    intervals = {}
+    for track in tracks:
+        name = track.name or "Inconnu"
+        intervals.setdefault(name, []).append((track.first_frame / fps, track.last_frame / fps))
+
+    timeline = {}
+    for name, spans in intervals.items():
+        merged = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1] + gap:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        timeline[name] = merged
+    return timeline
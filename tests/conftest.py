@@ -0,0 +1,19 @@
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption("--performance", action="store_true", default=False,
+                     help="Run the performance regression checks (slow, needs the ONNX models).")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "performance: performance regression check, run with --performance")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--performance"):
+        return
+    skip = pytest.mark.skip(reason="performance check: run with --performance")
+    for item in items:
+        if "performance" in item.keywords:
+            item.add_marker(skip)
@@ -1,19 +1,24 @@
 import os
 import pickle
+import numpy as np
 import pytest
 from unittest.mock import MagicMock, patch
 from facial_recognition.manager import FaceRecognizerManager
 
+# One YuNet detection: box (x, y, w, h), 5 landmarks (eyes, nose, mouth corners), score
+FACE = np.array([[30, 30, 40, 40, 40, 45, 60, 45, 50, 55, 42, 65, 58, 65, 0.95]], dtype=np.float32)
+
 @pytest.fixture
-def manager():
+def manager(tmp_path):
     """Fixture to provide a FaceRecognizerManager instance."""
-    return FaceRecognizerManager(model_dir="/tmp/models", encoding_file="/tmp/encodings.pkl")
+    return FaceRecognizerManager(model_dir="/tmp/models", encoding_file=str(tmp_path / "encodings.pkl"))
 
-def test_manager_init(manager):
+def test_manager_init(manager, tmp_path):
     """Test the initialization of FaceRecognizerManager."""
     assert manager.model_dir == "/tmp/models"
-    assert manager.encoding_file == "/tmp/encodings.pkl"
+    assert manager.encoding_file == str(tmp_path / "encodings.pkl")
     assert manager.threshold == 0.4
+    assert not manager.calibration_sigmas  # Per-identity thresholds are opt-in
     assert manager.detector is None
     assert manager.recognizer is None
 
@@ -101,16 +106,14 @@ def test_train_faces(mock_imread, mock_listdir, mock_isdir, mock_exists, manager
     # Structure: known_dir/Aimine/Léo.jpg
     mock_listdir.side_effect = [["Aimine"], ["Léo.jpg"]]
     
-    mock_img = MagicMock()
-    mock_img.shape = (100, 100, 3)
-    mock_imread.return_value = mock_img
+    mock_imread.return_value = np.zeros((100, 100, 3), dtype=np.uint8)
     
     # Mock detection and recognition
-    manager.detector.detect.return_value = (None, [MagicMock()])
-    manager.recognizer.alignCrop.return_value = MagicMock()
+    manager.detector.detect.return_value = (None, FACE)
     manager.recognizer.feature.return_value = "feature_vector"
     
-    with patch("builtins.open", MagicMock()):
+    # The store is written to a temporary file then atomically moved into place
+    with patch("facial_recognition.gallery.open", MagicMock(), create=True), patch("os.fsync"), patch("os.replace"):
         with patch("pickle.dump") as mock_pickle_dump:
             result = manager.train_faces("/tmp/known")
             
@@ -132,13 +135,10 @@ def test_process_directory(mock_imread, mock_listdir, mock_exists, manager):
     mock_exists.return_value = True
     mock_listdir.return_value = ["unknown.jpg"]
     
-    mock_img = MagicMock()
-    mock_img.shape = (100, 100, 3)
-    mock_imread.return_value = mock_img
+    mock_imread.return_value = np.zeros((100, 100, 3), dtype=np.uint8)
     
     # Mock detection: one face found
-    manager.detector.detect.return_value = (None, [MagicMock()])
-    manager.recognizer.alignCrop.return_value = MagicMock()
+    manager.detector.detect.return_value = (None, FACE)
     manager.recognizer.feature.return_value = "unknown_feat"
     
     # Mock recognition match score > threshold
@@ -153,3 +153,1300 @@ def test_process_directory(mock_imread, mock_listdir, mock_exists, manager):
         # Verify it passed the correct set of found names
         args, _ = mock_rename.call_args
         assert args[2] == {"Aimine"}
+
+def test_train_from_images(manager):
+    """Test training from in-memory images without touching the known_faces folder."""
+    manager.detector = MagicMock()
+    manager.recognizer = MagicMock()
+
+    mock_img = np.zeros((56, 58, 3), dtype=np.uint8)
+
+    # First image has a face, second one has none
+    manager.detector.detect.side_effect = [(None, FACE), (None, None)]
+    manager.recognizer.feature.return_value = "feature_vector"
+
+    with patch("cv2.imread") as mock_imread:
+        with patch.object(manager, "save_encodings") as mock_save:
+            result = manager.train_from_images([("Aimine", mock_img), ("Léo", mock_img)])
+
+            assert result is True
+            assert manager.known_names == ["Aimine"]
+            assert manager.known_features == ["feature_vector"]
+            assert mock_save.called
+            assert not mock_imread.called
+
+EXTRACTION_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "facial_recognition", "extraction")
+
+@pytest.fixture
+def extraction(monkeypatch):
+    """The PDF extraction script, imported from its folder like the scripts do."""
+    pytest.importorskip("fitz")
+    monkeypatch.syspath_prepend(EXTRACTION_DIR)
+    import extraction
+    return extraction
+
+def write_trombinoscope(path, students):
+    """Writes a one-page yearbook: each photo with the student's name on its right."""
+    import cv2
+    import fitz
+    doc = fitz.open()
+    page = doc.new_page()
+    for i, (name, image) in enumerate(students):
+        top = 40 + i * 90
+        page.insert_image(fitz.Rect(40, top, 120, top + 80), stream=cv2.imencode(".png", image)[1].tobytes())
+        page.insert_text((140, top + 44), name)
+    doc.save(path)
+    doc.close()
+
+def test_pixmap_to_bgr_array(extraction):
+    """Gray, RGB and RGBA pixmaps of odd width become BGR arrays with the right pixels."""
+    import fitz
+    for colorspace, alpha, value, expected in (
+        (fitz.csGRAY, False, (90,), (90, 90, 90)),
+        (fitz.csRGB, False, (10, 20, 30), (30, 20, 10)),
+        (fitz.csRGB, True, (10, 20, 30, 255), (30, 20, 10)),
+    ):
+        pix = fitz.Pixmap(colorspace, fitz.IRect(0, 0, 5, 3), alpha)
+        pix.clear_with(0)
+        pix.set_pixel(4, 2, value)
+        assert pix.stride >= pix.w * pix.n
+
+        image = extraction.pixmap_vers_tableau(pix)
+        del pix
+
+        assert image.shape == (3, 5, 3) and image.dtype == np.uint8
+        assert tuple(image[2, 4]) == expected
+        assert not image[:2].any() and not image[2, :4].any()
+
+def test_extract_to_gallery_without_writing_images(tmp_path, extraction):
+    """The yearbook is encoded straight from memory; PNG copies only with an output folder."""
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, (60, 50, 3), dtype=np.uint8) for _ in range(2)]
+    pdf = str(tmp_path / "promo.pdf")
+    write_trombinoscope(pdf, [("Alice MARTIN", images[0]), ("Bruno DURAND", images[1])])
+
+    received = []
+    manager = MagicMock()
+    manager.train_from_images.side_effect = lambda samples, progress_callback=None: received.extend(samples) or True
+
+    assert extraction.extraire_vers_galerie(pdf, manager) is True
+    assert [name for name, _ in received] == ["Alice_MARTIN", "Bruno_DURAND"]
+    assert all(image.shape == (60, 50, 3) for _, image in received)
+    assert np.array_equal(received[0][1], images[0])  # PNG is lossless
+    assert sorted(os.listdir(tmp_path)) == ["promo.pdf"]
+
+    received.clear()
+    assert extraction.extraire_vers_galerie(pdf, manager, output_folder=str(tmp_path / "faces")) is True
+    assert os.path.exists(tmp_path / "faces" / "Alice_MARTIN" / "Alice_MARTIN.png")
+    assert len(received) == 2
+
+@patch("os.path.exists")
+@patch("os.path.isdir")
+@patch("os.listdir")
+@patch("cv2.imread")
+def test_train_faces_incremental(mock_imread, mock_listdir, mock_isdir, mock_exists, manager):
+    """Test that incremental training only re-encodes the given identities."""
+    manager.detector = MagicMock()
+    manager.recognizer = MagicMock()
+    manager.known_features = ["feat_aimine", "feat_leo_old"]
+    manager.known_names = ["Aimine", "Léo"]
+
+    mock_exists.return_value = True
+    # "Bob" was removed from known_faces, only "Léo" remains on disk
+    mock_isdir.side_effect = lambda path: not path.endswith("Bob")
+    mock_listdir.return_value = ["Léo.png"]
+
+    mock_imread.return_value = np.zeros((100, 100, 3), dtype=np.uint8)
+
+    manager.detector.detect.return_value = (None, FACE)
+    manager.recognizer.feature.return_value = "feat_leo_new"
+
+    # Only the changed identity is appended to the log, the store is not rewritten
+    with patch.object(manager, "save_encodings") as mock_save, \
+            patch.object(manager.gallery_store, "append") as mock_append:
+        result = manager.train_faces("/tmp/known", identities=["Léo", "Bob"])
+
+    mock_save.assert_not_called()
+    mock_append.assert_called_once_with([("set", "Léo", ["feat_leo_new"])])
+
+    assert result is True
+    assert manager.known_names == ["Aimine", "Léo"]
+    assert manager.known_features == ["feat_aimine", "feat_leo_new"]
+    mock_listdir.assert_called_once_with(os.path.join("/tmp/known", "Léo"))
+
+def test_incremental_yearbook_update(tmp_path, extraction):
+    """Only new or changed photos are re-encoded, absent students are removed, failed training is retried."""
+    rng = np.random.default_rng(1)
+    alice, bruno, chloe, alice_new = (rng.integers(0, 255, (60, 50, 3), dtype=np.uint8) for _ in range(4))
+    pdf, faces = str(tmp_path / "promo.pdf"), str(tmp_path / "faces")
+    manager = MagicMock()
+    manager.train_faces.return_value = True
+
+    def trained():
+        identities = [c.kwargs["identities"] for c in manager.train_faces.call_args_list]
+        manager.train_faces.reset_mock()
+        return identities
+
+    # First run: everything is extracted and encoded
+    write_trombinoscope(pdf, [("Alice MARTIN", alice), ("Bruno DURAND", bruno)])
+    report = extraction.mettre_a_jour_galerie(pdf, faces, manager)
+    assert report["ajoutes"] == ["Alice_MARTIN", "Bruno_DURAND"]
+    assert trained() == [["Alice_MARTIN", "Bruno_DURAND"]]
+
+    # Same PDF: nothing to do
+    report = extraction.mettre_a_jour_galerie(pdf, faces, manager)
+    assert report["inchanges"] == ["Alice_MARTIN", "Bruno_DURAND"] and not report["a_encoder"]
+    assert trained() == [] and not manager.remove_identity.called
+
+    # New photo for Alice, Bruno gone, Chloé arrives; training fails
+    alice_png = os.path.join(faces, "Alice_MARTIN", "Alice_MARTIN.png")
+    before = open(alice_png, "rb").read()
+    write_trombinoscope(pdf, [("Alice MARTIN", alice_new), ("Chloe PETIT", chloe)])
+    manager.train_faces.return_value = False
+    assert extraction.mettre_a_jour_galerie(pdf, faces, manager) is None
+    assert open(alice_png, "rb").read() != before
+    assert trained() == [["Alice_MARTIN", "Chloe_PETIT"]]
+    manager.remove_identity.assert_called_once_with("Bruno_DURAND")
+    assert os.path.isdir(os.path.join(faces, "Bruno_DURAND"))  # Folder kept
+
+    # Next run: the PDF is unchanged but the failed training is retried, once
+    manager.train_faces.return_value = True
+    report = extraction.mettre_a_jour_galerie(pdf, faces, manager)
+    assert not report["ajoutes"] and not report["modifies"]
+    assert trained() == [["Alice_MARTIN", "Chloe_PETIT"]]
+    assert manager.remove_identity.call_count == 1
+    extraction.mettre_a_jour_galerie(pdf, faces, manager)
+    assert trained() == []
+
+@patch("os.path.exists")
+@patch("os.path.isdir")
+@patch("os.listdir")
+def test_train_faces_parallel_merges_in_identity_order(mock_listdir, mock_isdir, mock_exists, manager):
+    """Test that parallel training merges the chunks in identity order, whatever finishes first."""
+    from concurrent.futures import Future
+
+    class FakeExecutor:
+        """Runs each chunk immediately; `as_completed` below hands them back in reverse."""
+        def __init__(self, max_workers, mp_context, initializer, initargs):
+            assert initargs[0]["num_threads"] == 1
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def submit(self, fn, chunk):
+            future = Future()
+            names = [name for name, _, _ in chunk]
+            future.set_result((
+                [np.full((1, 4), ord(name[0]), dtype=np.float64) for name in names],
+                names,
+                {"identités": len(chunk), "visages": len(chunk)},
+                [],
+            ))
+            return future
+
+    mock_exists.return_value = True
+    mock_isdir.return_value = True
+    mock_listdir.side_effect = lambda path: ["Chloé", "Aimine", "Léo"] if path == "/tmp/known" else ["1.jpg"]
+    progress = MagicMock()
+
+    with patch("facial_recognition.manager.TRAIN_CHUNK_IDENTITIES", 1), \
+            patch("facial_recognition.manager.ProcessPoolExecutor", FakeExecutor), \
+            patch("facial_recognition.manager.as_completed", lambda futures: reversed(list(futures))), \
+            patch.object(manager, "save_encodings") as mock_save:
+        result = manager.train_faces("/tmp/known", progress_callback=progress, workers=2)
+
+    assert result is True
+    mock_save.assert_called_once()
+    assert manager.known_names == ["Aimine", "Chloé", "Léo"]
+    assert [int(f[0, 0]) for f in manager.known_features] == [ord("A"), ord("C"), ord("L")]
+    assert all(f.dtype == np.float32 for f in manager.known_features)
+
+@patch("cv2.setNumThreads")
+@patch("cv2.FaceDetectorYN.create")
+@patch("cv2.FaceRecognizerSF.create")
+def test_load_models_backend_and_warm_up(mock_sf_create, mock_yn_create, mock_set_threads):
+    """Test that backend, target and thread settings reach OpenCV and models are warmed up."""
+    manager = FaceRecognizerManager(model_dir="/tmp/models", backend_id=3, target_id=1, num_threads=2)
+
+    assert manager.load_models() is True
+
+    mock_set_threads.assert_called_once_with(2)
+    assert mock_yn_create.call_args.kwargs["backend_id"] == 3
+    assert mock_yn_create.call_args.kwargs["target_id"] == 1
+    assert mock_sf_create.call_args.kwargs["backend_id"] == 3
+    assert mock_sf_create.call_args.kwargs["target_id"] == 1
+    # Warm-up: one dummy inference on each network
+    assert manager.detector.detect.call_count == 1
+    assert manager.recognizer.feature.call_count == 1
+
+    FaceRecognizerManager(model_dir="/tmp/models").load_models()
+    mock_set_threads.assert_called_with(-1)  # Default restored
+
+def test_embedding_preprocess_matches_blob_from_images():
+    """Test that the batched engine feeds SFace exactly what FaceRecognizerSF.feature does."""
+    import cv2
+    from facial_recognition.embedding import SFaceOnnxEngine
+
+    crops = np.random.default_rng(0).integers(0, 256, (5, 112, 112, 3), dtype=np.uint8)
+    expected = cv2.dnn.blobFromImages(list(crops), 1.0, (112, 112), (0, 0, 0), True, False)
+
+    blob = SFaceOnnxEngine.preprocess(crops)
+
+    assert blob.shape == (5, 3, 112, 112)
+    assert np.array_equal(blob, expected)
+
+def _write_tiny_sface(path):
+    """Write a small ONNX network with SFace's signature (1x3x112x112 -> 1x128)."""
+    onnx = pytest.importorskip("onnx")
+    from onnx import helper, numpy_helper, TensorProto
+
+    rng = np.random.default_rng(0)
+    weights = [
+        numpy_helper.from_array((rng.standard_normal((8, 3, 3, 3)) * 0.1).astype(np.float32), "W"),
+        numpy_helper.from_array((rng.standard_normal((128, 8 * 28 * 28)) * 0.01).astype(np.float32), "G"),
+    ]
+    nodes = [
+        helper.make_node("Conv", ["data", "W"], ["c"], strides=[4, 4], pads=[1, 1, 1, 1]),
+        helper.make_node("Flatten", ["c"], ["f"]),
+        helper.make_node("Gemm", ["f", "G"], ["fc1"], transB=1),
+    ]
+    graph = helper.make_graph(
+        nodes, "sface",
+        [helper.make_tensor_value_info("data", TensorProto.FLOAT, [1, 3, 112, 112])],
+        [helper.make_tensor_value_info("fc1", TensorProto.FLOAT, [1, 128])],
+        weights,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return str(path)
+
+def test_embedding_engine_matches_opencv(tmp_path):
+    """Test that ONNX Runtime batches give the same embeddings as FaceRecognizerSF.feature."""
+    import cv2
+    pytest.importorskip("onnxruntime")
+    from facial_recognition.embedding import create_embedding_engine
+
+    model_path = _write_tiny_sface(tmp_path / "sface.onnx")
+    engine = create_embedding_engine(model_path, batch_size=4)
+    recognizer = cv2.FaceRecognizerSF.create(model_path, "")
+    crops = np.random.default_rng(1).integers(0, 256, (10, 112, 112, 3), dtype=np.uint8)
+
+    expected = np.vstack([recognizer.feature(crop) for crop in crops])
+    features = engine.embed(crops)
+
+    assert engine.batch_size == 4
+    assert features.shape == (10, 128)
+    assert np.allclose(features, expected, rtol=1e-4, atol=1e-4)
+
+def test_embed_crops_falls_back_to_opencv(manager):
+    """Test that crops are encoded one by one with SFace when no batch engine is available."""
+    manager.recognizer = MagicMock()
+    manager.recognizer.feature.side_effect = ["feat_1", "feat_2"]
+    manager.embedder = None
+
+    assert manager._embed_crops(["crop_1", "crop_2"]) == ["feat_1", "feat_2"]
+
+def test_align_faces_matches_align_crop(tmp_path):
+    """Test that vectorized alignment matches FaceRecognizerSF.alignCrop."""
+    import cv2
+    from facial_recognition.alignment import align_faces
+
+    recognizer = cv2.FaceRecognizerSF.create(_write_tiny_sface(tmp_path / "sface.onnx"), "")
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8), (5, 5), 0)
+
+    # Scaled, shifted, rotated and mirrored versions of the same face
+    faces = np.repeat(FACE, 4, axis=0)
+    faces[1, 4:14] = faces[1, 4:14] * 2 + 20
+    angle = 0.3
+    points = faces[2, 4:14].reshape(5, 2) - 50
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    faces[2, 4:14] = (points @ rotation.T + 150).ravel()
+    faces[3, 4:14:2] = 200 - faces[3, 4:14:2]
+
+    crops = align_faces(img, faces)
+    expected = np.stack([recognizer.alignCrop(img, face) for face in faces])
+
+    assert crops.shape == (4, 112, 112, 3)
+    assert crops.flags["C_CONTIGUOUS"]
+    assert np.abs(crops.astype(int) - expected.astype(int)).max() <= 1
+
+def test_reduced_decode_from_header(tmp_path):
+    """Test that large JPEGs are decoded reduced and only decoded in full for small faces."""
+    import cv2
+    from facial_recognition.alignment import CropBatch
+    from facial_recognition.decoding import DecodedImage, read_image_header, reduction_factor
+
+    img = np.random.default_rng(0).integers(0, 256, (600, 1000, 3), dtype=np.uint8)
+    jpeg, png = str(tmp_path / "photo.jpg"), str(tmp_path / "photo.png")
+    cv2.imwrite(jpeg, img)
+    cv2.imwrite(png, img)
+    (tmp_path / "notes.txt").write_text("pas une image")
+
+    assert read_image_header(jpeg) == ("jpeg", 1000, 600)
+    assert read_image_header(png) == ("png", 1000, 600)
+    assert read_image_header(str(tmp_path / "notes.txt")) is None
+    assert [reduction_factor(4000, 3000, side) for side in (None, 4000, 1920, 960, 100)] == [1, 1, 2, 4, 8]
+
+    decoded = DecodedImage.read(jpeg, max_side=250)
+    assert decoded.scale == 4 and decoded.image.shape == (150, 250, 3)
+    assert DecodedImage.read(png, max_side=250).scale == 1  # Pas de décodage réduit hors JPEG
+    # Désactivé par défaut : le gestionnaire décode en pleine résolution
+    assert FaceRecognizerManager(model_dir="/tmp/models").decode_max_side is None
+    assert DecodedImage.read(jpeg, None).scale == 1
+
+    # Boîte et points de repère ramenés en pleine résolution, score inchangé
+    assert np.allclose(decoded.to_full_coordinates(FACE)[0, :14], FACE[0, :14] * 4)
+    assert decoded.to_full_coordinates(FACE)[0, 14] == FACE[0, 14]
+
+    # Visage de 40 px à l'échelle 1/4 : trop petit, alignement depuis l'image complète
+    with patch("cv2.imread", wraps=cv2.imread) as mock_imread:
+        decoded.align_into(CropBatch(), FACE)
+        large = FACE.copy()
+        large[0, 2:4] = 120
+        DecodedImage.read(jpeg, max_side=250).align_into(CropBatch(), large)
+    assert [c.args[1:] for c in mock_imread.call_args_list] == [(), (cv2.IMREAD_REDUCED_COLOR_4,)]
+
+def test_detection_buckets_letterbox_and_map_back(manager):
+    """Test that letterboxing uses few fixed detector sizes and maps detections back to the image."""
+    from facial_recognition.letterbox import DetectionBuckets
+
+    buckets = DetectionBuckets()
+    rng = np.random.default_rng(0)
+    sizes = {buckets.choose(int(w), int(h))[0] for w, h in zip(rng.integers(900, 1300, 200), rng.integers(600, 1000, 200))}
+    assert len(sizes) <= 10
+
+    # Slightly larger than a bucket: scaled down into it rather than padded to the next one
+    (w, h), scale = buckets.choose(1000, 740)
+    assert (w, h) == (960, 736) and scale == pytest.approx(0.96)
+    boxed, scale = buckets.fit(np.zeros((740, 1000, 3), dtype=np.uint8))
+    assert boxed.shape == (736, 960, 3)
+
+    # Padded (no scaling): the detector sees the bucket, the caller gets image coordinates
+    manager.buckets = buckets
+    manager.detector = MagicMock()
+    manager.detector.detect.return_value = (None, FACE)
+    faces = manager._detect(np.zeros((720, 900, 3), dtype=np.uint8))
+    manager.detector.setInputSize.assert_called_once_with((960, 736))
+    assert manager.detector.detect.call_args[0][0].shape == (736, 960, 3)
+    np.testing.assert_array_equal(faces, FACE)
+
+    manager.detector.detect.return_value = (None, None)
+    faces = manager._detect(np.zeros((740, 1000, 3), dtype=np.uint8))
+    assert faces.shape == (0, 15)
+
+def test_memory_governor_bounds_detection_batches_and_prefetch(tmp_path):
+    """Test that the memory budget caps detection size, batches, workers and bytes decoded ahead."""
+    import cv2
+    from facial_recognition.decoding import DecodedImage, prefetch_images
+    from facial_recognition.memory import MB, MIN_DETECTION_PIXELS, MemoryGovernor
+
+    small, large = MemoryGovernor(256 * MB), MemoryGovernor(4096 * MB)
+    assert small.batch_size(32) < 32 and large.batch_size(32) == 32
+    assert MIN_DETECTION_PIXELS <= small.detection_pixels() < large.detection_pixels()
+    assert small.workers(8, 32, 1920) == 1 and 1 < large.workers(8, 32, 1920) < 8
+
+    # Above the detection cap: JPEGs are decoded reduced, other formats resized
+    for name in ("big.jpg", "big.png"):
+        cv2.imwrite(str(tmp_path / name), np.zeros((1200, 1600, 3), dtype=np.uint8))
+        img = DecodedImage.read(str(tmp_path / name), max_pixels=MIN_DETECTION_PIXELS)
+        assert img.image.shape[0] * img.image.shape[1] <= MIN_DETECTION_PIXELS
+        assert img.scale * img.image.shape[1] == pytest.approx(1600, abs=1)
+
+    # Images wait in order, within the prefetch share of the budget (one is always admitted)
+    governor = MemoryGovernor(256 * MB)
+    images = [DecodedImage(str(i), np.zeros((1000, 3000, 3), dtype=np.uint8)) for i in range(6)]
+    read_ahead = []
+
+    def read(path):
+        read_ahead.append(path)
+        return images[int(path)]
+
+    for path, img in prefetch_images([str(i) for i in range(6)], read, depth=4, governor=governor):
+        assert img is images[int(path)]
+        assert governor.prefetched <= max(governor.prefetch_bytes, img.image.nbytes)
+    assert governor.waits > 0 and governor.peak_prefetched <= governor.prefetch_bytes
+
+    # Stopping early does not leave the reader thread blocked
+    read_ahead.clear()
+    for path, img in prefetch_images([str(i) for i in range(6)], read, depth=1):
+        assert path == "0" and img is images[0]
+        break
+    assert len(read_ahead) <= 3
+
+def test_crop_batch_grows_and_keeps_crops():
+    """Test that the preallocated crop buffer grows without losing queued faces."""
+    from facial_recognition.alignment import CropBatch
+
+    img = np.random.default_rng(0).integers(0, 256, (100, 100, 3), dtype=np.uint8)
+    batch = CropBatch(capacity=2)
+
+    batch.add(img, FACE)
+    first = batch.crops[0].copy()
+    batch.add(img, np.repeat(FACE, 3, axis=0))
+
+    assert len(batch) == 4
+    assert len(batch.buffer) == 4
+    assert np.array_equal(batch.crops[0], first)
+    assert np.array_equal(batch.crops[3], first)
+
+    batch.clear()
+    assert len(batch) == 0
+
+def test_face_tracker_embeds_once_per_track():
+    """Test that a face moving across frames keeps its track and is embedded only once."""
+    from facial_recognition.video import FaceTracker
+
+    tracker = FaceTracker(max_missed=1)
+    moved = FACE.copy()
+    moved[:, [0, 4, 6, 8, 10, 12]] += 5  # small horizontal motion
+
+    to_embed = tracker.update(FACE, 0)
+    assert [idx for idx, _ in to_embed] == [0]
+    track = to_embed[0][1]
+    track.name = "Aimine"
+
+    assert tracker.update(moved, 2) == []
+    assert tracker.active == [track]
+    assert track.last_frame == 2
+
+    # The face disappears for longer than max_missed frames: the track is closed
+    tracker.update(None, 4)
+    tracker.update(None, 6)
+    assert tracker.active == []
+    assert tracker.finished == [track]
+
+def test_build_timeline_merges_spans():
+    """Test that track spans are merged into a per-person timeline in seconds."""
+    from facial_recognition.video import Track, build_timeline
+
+    tracks = []
+    for name, first, last in [("Aimine", 0, 50), ("Aimine", 60, 100), ("Léo", 25, 75), ("Aimine", 200, 250)]:
+        track = Track(len(tracks), FACE[0], first)
+        track.last_frame = last
+        track.name = name
+        tracks.append(track)
+
+    timeline = build_timeline(tracks, fps=25, gap=0.5)
+
+    assert timeline == {"Aimine": [(0.0, 4.0), (8.0, 10.0)], "Léo": [(1.0, 3.0)]}
+
+@patch("cv2.VideoCapture")
+def test_process_video(mock_capture_cls, manager):
+    """Test frame sampling, tracking and the per-video report."""
+    manager.known_features = ["known_feat"]
+    manager.known_names = ["Aimine"]
+    manager.detector = MagicMock()
+    manager.recognizer = MagicMock()
+    manager.recognizer.feature.return_value = "unknown_feat"
+    manager.recognizer.match.return_value = 0.9
+
+    # 10 frames at 10 fps, sampled at 5 fps -> frames 0, 2, 4, 6, 8 are decoded
+    capture = mock_capture_cls.return_value
+    capture.isOpened.return_value = True
+    capture.get.side_effect = lambda prop: {5: 10.0, 7: 10.0}.get(prop, 0)
+    capture.read.side_effect = [(True, np.zeros((100, 100, 3), dtype=np.uint8))] * 5 + [(False, None)]
+    capture.grab.return_value = True
+    manager.detector.detect.return_value = (None, FACE)
+
+    report = manager.process_video("/tmp/video.mp4", sample_fps=5)
+
+    assert report["frames_sampled"] == 5
+    assert report["embeddings"] == 1
+    assert report["embeddings_skipped"] == 4
+    assert report["timeline"] == {"Aimine": [(0.0, 0.8)]}
+    assert manager.processed_videos == [report]
+
+def _service_manager(manager):
+    """Prepare a manager whose models are mocked for the recognition service tests."""
+    manager.known_features = ["known_feat"]
+    manager.known_names = ["Aimine"]
+    manager.detector = MagicMock()
+    manager.detector.detect.return_value = (None, FACE)
+    manager.recognizer = MagicMock()
+    manager.recognizer.feature.return_value = "unknown_feat"
+    manager.recognizer.match.return_value = 0.9
+    return manager
+
+def test_recognition_service_micro_batches(manager):
+    """Test that concurrent requests are grouped and answered individually."""
+    import cv2
+    from facial_recognition.service import RecognitionService
+
+    service = RecognitionService(_service_manager(manager), max_batch=8, batch_window=0.05)
+    _, image_bytes = cv2.imencode(".png", np.zeros((100, 100, 3), dtype=np.uint8))
+
+    with patch.object(service, "_process_batch", wraps=service._process_batch) as mock_batch:
+        # Requests queued before the batcher starts end up in the same micro-batch
+        futures = [service.submit(image_bytes.tobytes()) for _ in range(3)]
+        service.start()
+        results = [f.result(timeout=5) for f in futures]
+        service.stop()
+
+    assert mock_batch.call_count == 1
+    assert len(mock_batch.call_args.args[0]) == 3
+    assert all(r[0]["name"] == "Aimine" for r in results)
+
+def test_recognition_service_back_pressure(manager):
+    """Test that requests beyond the concurrency limit are refused, and bad images rejected."""
+    import cv2
+    from facial_recognition.service import RecognitionService, ServiceBusy
+
+    service = RecognitionService(_service_manager(manager), max_pending=1)
+    _, image_bytes = cv2.imencode(".png", np.zeros((100, 100, 3), dtype=np.uint8))
+
+    with pytest.raises(ValueError):
+        service.submit(b"not an image")
+
+    future = service.submit(image_bytes.tobytes())
+    with pytest.raises(ServiceBusy):
+        service.submit(image_bytes.tobytes())
+
+    service.start()
+    future.result(timeout=5)
+    service.stop()
+    # The slot is released once the request is answered
+    pending = service.submit(image_bytes.tobytes())
+    # Stopping fails the requests still queued instead of leaving them unanswered
+    service.stop()
+    with pytest.raises(ServiceBusy):
+        pending.result(timeout=5)
+    service.submit(image_bytes.tobytes())
+
+def test_recognition_http_endpoint(manager):
+    """Test the HTTP front-end of the recognition service."""
+    import http.client
+    import json
+    import threading
+    import urllib.request
+    import cv2
+    from facial_recognition.service import MAX_BODY_BYTES, RecognitionService, create_server
+
+    service = RecognitionService(_service_manager(manager))
+    service.start()
+    server = create_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _, image_bytes = cv2.imencode(".jpg", np.zeros((100, 100, 3), dtype=np.uint8))
+
+    def status(headers, body=b""):
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+        connection.putrequest("POST", "/recognize")
+        for key, value in headers.items():
+            connection.putheader(key, value)
+        connection.endheaders(body)
+        code = connection.getresponse().status
+        connection.close()
+        return code
+
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/recognize"
+        request = urllib.request.Request(url, data=image_bytes.tobytes(), method="POST")
+        with urllib.request.urlopen(request, timeout=5) as response:
+            payload = json.loads(response.read())
+        assert status({}) == 411
+        assert status({"Content-Length": "abc"}) == 400
+        assert status({"Content-Length": "-1"}) == 400
+        assert status({"Content-Length": str(MAX_BODY_BYTES + 1)}) == 413
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.stop()
+
+    assert payload["names"] == ["Aimine"]
+    assert payload["faces"][0]["box"] == [30.0, 30.0, 40.0, 40.0]
+
+def test_gallery_updates_are_logged_and_picked_up(tmp_path):
+    """Test that identity changes are appended to the log and seen by another process."""
+    encoding_file = str(tmp_path / "encodings.pkl")
+    writer = FaceRecognizerManager(model_dir="/tmp/models", encoding_file=encoding_file)
+    writer.detector = MagicMock()
+    writer.detector.detect.return_value = (None, FACE)
+    writer.recognizer = MagicMock()
+    writer.recognizer.feature.side_effect = lambda crop: np.full((1, 128), 1.0, dtype=np.float32)
+    writer.known_features = [np.zeros((1, 128), dtype=np.float32)]
+    writer.known_names = ["Aimine"]
+    writer.save_encodings()
+
+    reader = FaceRecognizerManager(model_dir="/tmp/models", encoding_file=encoding_file)
+    assert reader.load_encodings() == (True, 1)
+    assert reader.refresh_gallery() is False
+
+    image = np.zeros((100, 100, 3), dtype=np.uint8)
+    snapshot = reader.gallery
+    assert writer.add_identity("Léo", [image, image]) == 2
+    assert writer.remove_identity("Aimine") is True
+    assert writer.remove_identity("Bob") is False
+    assert os.path.getsize(writer.gallery_store.log_file) > 0
+
+    assert reader.refresh_gallery() is True
+    assert reader.known_names == ["Léo", "Léo"]
+    # Matching that started on the previous snapshot is unaffected
+    assert snapshot.names == ["Aimine"]
+
+    # Reaching the threshold rewrites the snapshot and empties the log
+    writer.gallery_store.compact_every = 3
+    writer.add_identity("Bob", [image])
+    assert os.path.getsize(writer.gallery_store.log_file) == 0
+
+    assert reader.refresh_gallery() is True
+    assert reader.known_names == ["Léo", "Léo", "Bob"]
+    fresh = FaceRecognizerManager(model_dir="/tmp/models", encoding_file=encoding_file)
+    assert fresh.load_encodings() == (True, 3)
+
+    # Removing from a manager that has not loaded the store yet
+    assert FaceRecognizerManager(model_dir="/tmp/models", encoding_file=encoding_file).remove_identity("Bob") is True
+    assert fresh.refresh_gallery() is True and fresh.known_names == ["Léo", "Léo"]
+
+def test_results_database_queries(tmp_path):
+    """Test the person, co-occurrence and unknown face queries of the results database."""
+    from facial_recognition.results_db import ResultsDatabase
+
+    db = ResultsDatabase(str(tmp_path / "results.sqlite3"))
+    db.start_run("/photos")
+    box = (1.0, 2.0, 30.0, 40.0)
+    db.record_images([
+        ("/photos/a.jpg", "hash_a", [(box, "Aimine", 0.8), (box, "Léo", 0.7)]),
+        ("/photos/b.jpg", "hash_b", [(box, "Aimine", 0.9), (box, "Inconnu", 0.2)]),
+        ("/photos/c.jpg", "hash_c", [(box, "Léo", 0.6)]),
+    ])
+    # Re-processing a renamed image replaces its previous results
+    db.record_images([("/photos/Léo.jpg", "hash_c", [(box, "Léo", 0.65)])])
+    db.finish_run()
+
+    assert db.photos_of("Aimine") == ["/photos/a.jpg", "/photos/b.jpg"]
+    assert db.photos_of("Léo") == ["/photos/Léo.jpg", "/photos/a.jpg"]
+    assert db.photos_with(["Aimine", "Léo"]) == ["/photos/a.jpg"]
+    assert db.co_occurrences("Aimine") == [("Léo", 1)]
+    assert db.unknown_faces() == [("/photos/b.jpg", box, 0.2)]
+    assert db.identities() == [("Aimine", 2), ("Inconnu", 1), ("Léo", 2)]
+    assert db.images() == [
+        ("/photos/Léo.jpg", ["Léo"], "hash_c"),
+        ("/photos/a.jpg", ["Aimine", "Léo"], "hash_a"),
+        ("/photos/b.jpg", ["Aimine"], "hash_b"),
+    ]
+    db.close()
+
+def test_process_directory_records_results(tmp_path, manager):
+    """Test that processing a directory stores every face in the results database."""
+    import cv2
+    from facial_recognition.results_db import ResultsDatabase
+
+    unknown_dir = tmp_path / "unknown"
+    unknown_dir.mkdir()
+    cv2.imwrite(str(unknown_dir / "photo.png"), np.zeros((100, 100, 3), dtype=np.uint8))
+
+    manager.results_db = str(tmp_path / "results.sqlite3")
+    manager.known_features = ["known_feat"]
+    manager.known_names = ["Aimine"]
+    manager.detector = MagicMock()
+    manager.detector.detect.return_value = (None, FACE)
+    manager.recognizer = MagicMock()
+    manager.recognizer.feature.return_value = "unknown_feat"
+    manager.recognizer.match.return_value = 0.9
+
+    manager.process_directory(str(unknown_dir))
+
+    db = ResultsDatabase(manager.results_db)
+    assert db.photos_of("Aimine") == [str(unknown_dir / "Aimine.png")]
+    assert db.conn.execute("SELECT finished_at IS NOT NULL, images FROM runs").fetchall() == [(1, 1)]
+    db.close()
+
+def test_process_directory_streams_export(tmp_path, manager):
+    """Test that results are exported image by image, as gzipped JSON Lines or CSV."""
+    import csv
+    import gzip
+    import json
+    import cv2
+
+    unknown_dir = tmp_path / "unknown"
+    unknown_dir.mkdir()
+    cv2.imwrite(str(unknown_dir / "a.png"), np.zeros((100, 100, 3), dtype=np.uint8))
+    cv2.imwrite(str(unknown_dir / "b.png"), np.zeros((80, 80, 3), dtype=np.uint8))
+    (unknown_dir / "c.jpg").write_bytes(b"not an image")
+
+    manager.known_features = ["known_feat"]
+    manager.known_names = ["Aimine"]
+    manager.detector = MagicMock()
+    manager.detector.detect.side_effect = lambda img: (None, FACE if img.shape[0] == 100 else None)
+    manager.recognizer = MagicMock()
+    manager.recognizer.feature.return_value = "unknown_feat"
+    manager.recognizer.match.return_value = 0.9
+
+    export = tmp_path / "resultats.jsonl.gz"
+    manager.process_directory(str(unknown_dir), export=str(export))
+    with gzip.open(export, "rt", encoding="utf-8") as f:
+        records = {r["file"]: r for r in map(json.loads, f)}
+    assert {f: r["status"] for f, r in records.items()} == {"a.png": "ok", "b.png": "no_face", "c.jpg": "unreadable"}
+    assert records["a.png"]["path"] == str(unknown_dir / "Aimine.png")
+    (face,) = records["a.png"]["faces"]
+    assert face["box"] == [30, 30, 40, 40]
+    assert face["landmarks"]["nose"] == [50, 55]
+    assert face["identity"] == "Aimine" and face["score"] == 0.9 and face["detection_score"] == 0.95
+
+    export = tmp_path / "resultats.csv"
+    manager.process_directory(str(unknown_dir), export=str(export))
+    with open(export, newline="", encoding="utf-8") as f:
+        rows = {row["file"]: row for row in csv.DictReader(f)}
+    assert rows["Aimine.png"]["identity"] == "Aimine" and rows["Aimine.png"]["left_mouth_y"] == "65.0"
+    assert rows["b.png"]["status"] == "no_face" and rows["b.png"]["face"] == ""
+
+def test_reembed_from_crop_archive(tmp_path):
+    """Test that archived aligned faces rebuild the gallery and results without re-detecting."""
+    import cv2
+    from facial_recognition.crop_archive import CropArchive
+    from facial_recognition.results_db import ResultsDatabase
+
+    known_dir, unknown_dir = tmp_path / "known", tmp_path / "unknown"
+    for i, name in enumerate(["Aimine", "Léo"]):
+        (known_dir / name).mkdir(parents=True)
+        cv2.imwrite(str(known_dir / name / "1.png"), np.full((100, 100, 3), 60 * (i + 1), dtype=np.uint8))
+    unknown_dir.mkdir()
+    cv2.imwrite(str(unknown_dir / "photo.png"), np.full((100, 100, 3), 100, dtype=np.uint8))
+
+    manager = FaceRecognizerManager(
+        model_dir="/tmp/models",
+        encoding_file=str(tmp_path / "encodings.pkl"),
+        results_db=str(tmp_path / "results.sqlite3"),
+        crop_archive=str(tmp_path / "crops"),
+    )
+    manager.detector = MagicMock()
+    manager.detector.detect.return_value = (None, FACE)
+    # First model: intensity 100 (unknown photo) is encoded like 120 (Léo)
+    manager.recognizer = MagicMock()
+    manager.recognizer.feature.side_effect = lambda crop: np.array([[round(crop.max() / 50), 1]], dtype=np.float32)
+    manager.recognizer.match.side_effect = lambda a, b, _: float(a[0, 0] == b[0, 0])
+    assert manager.train_faces(str(known_dir))
+    manager.process_directory(str(unknown_dir))
+    assert os.listdir(unknown_dir) == ["Léo.png"]
+
+    archive = CropArchive(manager.crop_archive)
+    assert len(archive) == 3
+    assert [name for name, _ in archive.gallery()] == ["Aimine", "Léo"]
+    assert archive.crops().shape == (3, 112, 112, 3)
+    archive.close()
+
+    # Second model: intensity 100 is now encoded like 60 (Aimine); nothing is decoded or detected again
+    manager.detector.detect.reset_mock()
+    manager.recognizer.feature.side_effect = lambda crop: np.array([[round(crop.max() / 70), 1]], dtype=np.float32)
+    with patch("cv2.imread") as mock_imread:
+        assert manager.reembed(batch_size=2)
+    mock_imread.assert_not_called()
+    manager.detector.detect.assert_not_called()
+    assert manager.known_names == ["Aimine", "Léo"]
+    assert [int(f[0, 0]) for f in manager.known_features] == [1, 2]
+
+    db = ResultsDatabase(manager.results_db)
+    assert db.identities() == [("Aimine", 1)]
+    db.close()
+
+    # Identities added or removed afterwards stay in sync with the archive
+    assert manager.add_identity("Bob", [np.full((100, 100, 3), 210, dtype=np.uint8)]) == 1
+    assert manager.remove_identity("Aimine")
+    assert manager.reembed(batch_size=2)
+    assert manager.known_names == ["Léo", "Bob"]
+    assert [int(f[0, 0]) for f in manager.known_features] == [2, 3]
+
+    # A gallery changed without the archive is not overwritten
+    other = FaceRecognizerManager(model_dir="/tmp/models", encoding_file=manager.encoding_file)
+    other.detector, other.recognizer = manager.detector, manager.recognizer
+    assert other.add_identity("Zoé", [np.full((100, 100, 3), 250, dtype=np.uint8)]) == 1
+    assert not manager.reembed(batch_size=2)
+    assert manager.known_names == ["Léo", "Bob", "Zoé"]
+
+def test_image_cache_evicts_least_recently_used():
+    """Test that the viewer cache stays under its byte budget, evicting the oldest images."""
+    QtGui = pytest.importorskip("PyQt6.QtGui")
+    from facial_recognition.interface import ImageCache
+
+    def image():
+        return QtGui.QImage(100, 100, QtGui.QImage.Format.Format_RGB32)  # 40 000 bytes
+
+    cache = ImageCache(max_bytes=100_000)
+    cache.put("a.jpg", image())
+    cache.put("b.jpg", image())
+    assert cache.get("a.jpg") is not None  # "a" becomes the most recently used
+    cache.put("c.jpg", image())
+
+    assert "b.jpg" not in cache
+    assert "a.jpg" in cache and "c.jpg" in cache
+    assert cache.current_bytes == 80_000
+
+def test_results_list_model_filters_and_caches_thumbnails(tmp_path):
+    """Test the lazy grid model: name filtering and thumbnails stored on disk by content hash."""
+    pytest.importorskip("PyQt6.QtGui")
+    import cv2
+    from facial_recognition.interface import ResultsListModel, ThumbnailDiskCache, ThumbnailSignals, ThumbnailTask
+
+    photo = tmp_path / "photo.png"
+    cv2.imwrite(str(photo), np.zeros((400, 600, 3), dtype=np.uint8))
+    images = [(str(photo), ["Aimine", "Léo"])] + [(f"/missing/{i}.jpg", ["Inconnu"]) for i in range(1000)]
+    disk_cache = ThumbnailDiskCache(str(tmp_path / "thumbs"), size=64)
+    model = ResultsListModel(images, disk_cache)
+
+    model.set_name_filter("léo")
+    assert model.rowCount() == 1
+    model.set_name_filter("")
+    assert model.rowCount() == 1001
+    # Called by Qt with the root index or a row: only the root has rows
+    from PyQt6.QtCore import QModelIndex
+    assert model.rowCount(QModelIndex()) == 1001 and model.rowCount(model.index(0)) == 0
+
+    # The thumbnail is generated once, then served from the disk cache
+    results = []
+    signals = ThumbnailSignals()
+    signals.ready.connect(lambda path, image: results.append(image))
+    ThumbnailTask(str(photo), disk_cache, signals).run()
+    assert (results[0].width(), results[0].height()) == (64, 42)
+    assert len(list((tmp_path / "thumbs").glob("*/*.jpg"))) == 1
+    ThumbnailTask(str(photo), disk_cache, signals).run()
+    assert results[1].width() == 64
+
+@patch("os.path.exists")
+@patch("os.listdir")
+@patch("cv2.imread")
+def test_process_directory_structured_progress(mock_imread, mock_listdir, mock_exists, manager):
+    """Test that a ProgressTracker receives determinate progress and stage counts, not a message per image."""
+    from facial_recognition.progress import ProgressTracker
+
+    manager.known_features = ["known_feat"]
+    manager.known_names = ["Aimine"]
+    manager.detector = MagicMock()
+    manager.detector.detect.side_effect = [(None, FACE), (None, None), (None, FACE)]
+    manager.recognizer = MagicMock()
+    manager.recognizer.feature.return_value = "unknown_feat"
+    manager.recognizer.match.return_value = 0.2  # Below threshold: nothing renamed
+
+    mock_exists.return_value = True
+    mock_listdir.return_value = ["a.jpg", "b.jpg", "c.jpg", "d.jpg"]
+    mock_imread.side_effect = [np.zeros((100, 100, 3), dtype=np.uint8)] * 3 + [None]
+
+    tracker = ProgressTracker()
+    manager.process_directory("/tmp/unknown", progress_callback=tracker)
+
+    snapshot = tracker.snapshot()
+    assert (snapshot["stage"], snapshot["done"], snapshot["total"]) == ("Tri", 4, 4)
+    assert snapshot["counts"] == {"visages": 2, "sans visage": 1, "illisibles": 1, "renommées": 0}
+    logs = tracker.drain_logs()
+    assert logs[0] == "Traitement terminé. 0 images identifiées sur 4."
+    assert [line.split(" :")[0] for line in logs[1:]] == ["Pic de mémoire"]
+    assert tracker.drain_logs() == []
+
+def test_progress_tracker_throttles_text_callback():
+    """Test that plain text callbacks get log lines and at most one progress summary per interval."""
+    from facial_recognition.progress import ProgressTracker
+
+    messages = []
+    tracker = ProgressTracker.wrap(messages.append)
+    tracker.text_interval = 3600
+    tracker.start("Tri", 100)
+    tracker("Renommé : a.jpg -> Aimine.jpg")
+    for _ in range(100):
+        tracker.advance()
+
+    # The log line, one summary at the first image, one when the stage completes
+    assert len(messages) == 3
+    assert messages[0] == "Renommé : a.jpg -> Aimine.jpg"
+    assert messages[1].startswith("Tri : 1/100")
+    assert messages[2].startswith("Tri : 100/100")
+
+def test_recent_identities_match_exhaustive_search(manager):
+    """Test that the recent-identities shortlist returns exactly the exhaustive results."""
+    from facial_recognition.gallery import Gallery
+    from facial_recognition.shortlist import RecentIdentities
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(40, 128))
+
+    def sample(center):
+        v = center / np.linalg.norm(center) + rng.normal(0, 0.06, 128)
+        return v.astype(np.float32).reshape(1, -1)
+
+    gallery = Gallery([sample(c) for c in centers for _ in range(3)], [f"P{i}" for i in range(40) for _ in range(3)])
+    manager.recognizer = MagicMock()
+    manager.recognizer.match.side_effect = lambda a, b, _: float(
+        (a.ravel() @ b.ravel()) / (np.linalg.norm(a) * np.linalg.norm(b))
+    )
+    # An event: the same few people photographed again and again, plus strangers
+    faces = [sample(centers[i]) for i in rng.choice([3, 7, 11, 19], 60)]
+    faces += [sample(rng.normal(size=128)) for _ in range(5)]
+
+    recent = RecentIdentities(capacity=4)
+    assert [recent.match(manager, f, gallery) for f in faces] == [manager._match_feature(f, gallery) for f in faces]
+    assert recent.faces == 65
+    assert recent.hits >= 50
+    assert "identifiés sans recherche complète" in recent.report()
+
+    # Identity bounds hold for every signature, and leave the other identities out of the comparison
+    unit = np.vstack(gallery.features).astype(np.float64)
+    unit /= np.linalg.norm(unit, axis=1, keepdims=True)
+    probe = faces[0].ravel().astype(np.float64) / np.linalg.norm(faces[0])
+    bounds = recent._centers @ probe + recent._radii
+    assert (unit @ probe <= bounds[[recent._positions[n] for n in gallery.names]] + 1e-9).all()
+    best = recent.match(manager, faces[0], gallery)[1]
+    assert (bounds >= best - recent.margin).sum() == 1  # Its own identity, already in the shortlist
+
+    # Same decisions with a margin, and the fallback goes through the vectorized search when it is open
+    manager.margin = 0.05
+    expected = [manager._match_feature(f, gallery) for f in faces]
+    assert [RecentIdentities(capacity=4).match(manager, f, gallery) for f in faces] == expected
+    manager.match_batch = 4
+    assert manager.open_matcher()
+    try:
+        with patch.object(manager, "_match_feature") as face_by_face:
+            results = [RecentIdentities(capacity=4).match(manager, f, gallery) for f in faces]
+        face_by_face.assert_not_called()
+        assert [name for name, _ in results] == [name for name, _ in expected]
+        np.testing.assert_allclose([score for _, score in results], [score for _, score in expected], atol=1e-5)
+    finally:
+        manager.close_matcher()
+
+def test_shared_gallery_sharded_top_k_matches_exhaustive_search(manager):
+    """Test that the shared-memory gallery, in-process or split across processes, matches the exhaustive search."""
+    from facial_recognition.gallery import Gallery
+    from facial_recognition.shared_gallery import SharedGallery
+
+    rng = np.random.default_rng(1)
+    features = [rng.normal(size=(1, 128)).astype(np.float32) for _ in range(200)]
+    features[150] = features[20].copy()  # Tie: the first position wins, as in the exhaustive search
+    gallery = Gallery(features, [f"Personne_{i // 4}" for i in range(200)])
+    queries = [features[20] + rng.normal(0, 0.01, (1, 128)).astype(np.float32), features[199], -features[0]]
+
+    manager.recognizer = MagicMock()
+    manager.recognizer.match.side_effect = lambda a, b, _: float(
+        a.ravel() @ b.ravel() / (np.linalg.norm(a) * np.linalg.norm(b)))
+    expected = [manager._match_feature(q, gallery) for q in queries]
+
+    shared = SharedGallery.create(gallery)
+    attached = SharedGallery.attach(shared.descriptor)
+    np.testing.assert_array_equal(attached.matrix, shared.matrix)
+    # Zero-copy: both views read the same segment
+    saved = shared.matrix[0, 0]
+    shared.matrix[0, 0] = 42
+    assert attached.matrix[0, 0] == 42
+    shared.matrix[0, 0] = saved
+    indices, scores = attached.top_k([features[150]], k=2)
+    assert indices.tolist() == [[20, 150]]
+    attached.close()
+    shared.close()
+
+    for shards in (1, 2):
+        manager.gallery_shards = shards
+        assert manager.open_matcher()
+        try:
+            results = manager._match_features(queries, gallery)
+            indices, _ = manager._matcher.top_k(gallery, [features[150], features[7]], k=3)
+        finally:
+            manager.close_matcher()
+        assert [name for name, _ in results] == [name for name, _ in expected]
+        assert np.allclose([score for _, score in results], [score for _, score in expected], atol=1e-5)
+        assert indices[0, :2].tolist() == [20, 150] and indices[1, 0] == 7
+
+def test_blocked_top_k_and_match_batch_across_images(tmp_path, manager):
+    """Test that blocked top-k equals the full score matrix, and that match_batch matches many images at once."""
+    import cv2
+    from facial_recognition.shared_gallery import blocked_top_k
+
+    rng = np.random.default_rng(2)
+    # Small integer values: many ties, broken by the lowest gallery position
+    matrix = rng.integers(-2, 3, (300, 8)).astype(np.float32)
+    queries = rng.integers(-2, 3, (50, 8)).astype(np.float32)
+    full = queries @ matrix.T
+    for k in (1, 3):
+        indices, scores = blocked_top_k(queries, matrix, k, start=10, query_block=16, row_block=64)
+        expected = np.array([np.lexsort((np.arange(300), -row))[:k] for row in full])
+        np.testing.assert_array_equal(indices, expected + 10)
+        np.testing.assert_array_equal(scores, np.take_along_axis(full, expected, axis=1))
+
+    unknown_dir = tmp_path / "unknown"
+    unknown_dir.mkdir()
+    for i in range(5):
+        cv2.imwrite(str(unknown_dir / f"photo{i}.png"), np.zeros((100, 100, 3), dtype=np.uint8))
+    known = rng.normal(size=(2, 1, 128)).astype(np.float32)
+    manager.known_features = list(known)
+    manager.known_names = ["Aimine", "Léo"]
+    manager.detector = MagicMock()
+    manager.detector.detect.return_value = (None, FACE)
+    manager.recognizer = MagicMock()
+    manager.recognizer.feature.side_effect = [known[i % 2] for i in range(5)]
+    manager.batch_size = 2
+    manager.match_batch = 3
+
+    with patch.object(manager, "_match_features", wraps=manager._match_features) as match:
+        manager.process_directory(str(unknown_dir))
+    # Two encoding batches (4 faces) matched together, then the last face
+    assert [len(call.args[0]) for call in match.call_args_list] == [4, 1]
+    names = [name.split(".")[0].split("_")[0] for name in os.listdir(unknown_dir)]
+    assert sorted(names) == ["Aimine"] * 3 + ["Léo"] * 2
+    assert manager._matcher is None
+
+def test_cold_start_imports_and_first_window(tmp_path, record_property):
+    """Test that importing the package or the CLI loads neither OpenCV nor PyQt, and that the window shows first."""
+    import json
+    import subprocess
+    import sys
+
+    script = """
+import json, sys, time
+t0 = time.perf_counter()
+import facial_recognition
+import facial_recognition.__main__
+imported = time.perf_counter() - t0
+heavy = sorted(m for m in ("cv2", "numpy", "PyQt6", "onnx") if m in sys.modules)
+from PyQt6.QtWidgets import QApplication
+from facial_recognition import FaceRecoApp
+app = QApplication([])
+window = FaceRecoApp()
+window.show()
+shown = time.perf_counter() - t0
+before_window = "cv2" in sys.modules
+app.processEvents()  # Lance la préparation en arrière-plan
+window.scheduler.wait()
+ready = time.perf_counter() - t0
+print(json.dumps([imported, shown, ready, heavy, before_window, window._manager is not None]))
+"""
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    out = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True,
+                         check=True, timeout=120).stdout
+    imported, shown, ready, heavy, before_window, created = json.loads(out.splitlines()[-1])
+    record_property("import_ms", round(imported * 1000))
+    record_property("first_window_ms", round(shown * 1000))
+    record_property("warm_up_done_ms", round(ready * 1000))
+    assert heavy == []
+    assert not before_window and created
+
+def test_read_capture_time_from_exif(tmp_path):
+    """Test that the EXIF capture date is read from the JPEG header, with mtime as fallback."""
+    import struct
+    import time
+    import cv2
+    from facial_recognition.decoding import capture_time, read_capture_time
+
+    # Minimal little-endian TIFF: IFD0 -> Exif sub-IFD -> DateTimeOriginal
+    date = b"2024:06:01 14:30:00\0"
+    tiff = b"II*\0" + struct.pack("<I", 8)
+    tiff += struct.pack("<H", 1) + struct.pack("<HHII", 0x8769, 4, 1, 26) + struct.pack("<I", 0)
+    tiff += struct.pack("<H", 1) + struct.pack("<HHII", 0x9003, 2, len(date), 44) + struct.pack("<I", 0)
+    tiff += date
+    app1 = b"Exif\0\0" + tiff
+    jpeg = cv2.imencode(".jpg", np.zeros((16, 16, 3), dtype=np.uint8))[1].tobytes()
+    with_exif = tmp_path / "exif.jpg"
+    with_exif.write_bytes(jpeg[:2] + b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + jpeg[2:])
+    without_exif = tmp_path / "plain.jpg"
+    without_exif.write_bytes(jpeg)
+
+    expected = time.mktime(time.strptime("2024:06:01 14:30:00", "%Y:%m:%d %H:%M:%S"))
+    assert read_capture_time(str(with_exif)) == expected
+    assert cv2.imread(str(with_exif)) is not None
+    assert read_capture_time(str(without_exif)) is None
+    assert capture_time(str(without_exif)) == os.path.getmtime(without_exif)
+
+def test_calibration_per_identity_threshold_and_margin(tmp_path):
+    """Test the impostor statistics, the calibrated thresholds and the margin, per face and in the top-k path."""
+    from facial_recognition.calibration import Calibration
+    from facial_recognition.gallery import Gallery
+
+    rng = np.random.default_rng(3)
+    features = [rng.normal(size=(1, 128)).astype(np.float32) for _ in range(7)]
+    names = ["A", "A", "B", "C", "C", "C", "D"]
+    calibration = Calibration.compute(Gallery(features, names), tile=10)
+    unit = np.vstack(features) / np.linalg.norm(np.vstack(features), axis=1, keepdims=True)
+    for i, name in enumerate(calibration.names):
+        own = [j for j, n in enumerate(names) if n == name]
+        impostors = (unit[own] @ unit[[j for j, n in enumerate(names) if n != name]].T).ravel()
+        assert calibration.mean[i] == pytest.approx(impostors.mean(), abs=1e-5)
+        assert calibration.std[i] == pytest.approx(impostors.std(), abs=1e-5)
+        assert calibration.maximum[i] == pytest.approx(impostors.max(), abs=1e-5)
+    assert Calibration.compute(Gallery(features[:2], ["A", "A"])).names == []
+
+    # The query scores 0.8 against A and 0.6 against B
+    axes = np.eye(128, dtype=np.float32)
+    gallery = Gallery([axes[0:1], axes[1:2], axes[2:3]], ["A", "A", "B"])
+    query = 0.8 * axes[0:1] + 0.6 * axes[2:3]
+    manager = FaceRecognizerManager(model_dir="/tmp/models", encoding_file=str(tmp_path / "enc.pkl"),
+                                    calibration_sigmas=3)
+    manager.recognizer = MagicMock()
+    manager.recognizer.match.side_effect = lambda a, b, _: float(
+        a.ravel() @ b.ravel() / (np.linalg.norm(a) * np.linalg.norm(b)))
+    manager.gallery_shards = 1
+    cases = [
+        (0.1, None, "A"),
+        (0.3, None, "Inconnu"),  # B is within the margin
+        (0.0, Calibration(["A", "B"], [0.7, 0.0], [0.05, 0.0], [0.9, 0.1]), "Inconnu"),  # A needs > 0.85
+        (0.0, Calibration(["A", "B"], [0.1, 0.0], [0.05, 0.0], [0.3, 0.1]), "A"),
+    ]
+    for margin, calibration, expected in cases:
+        manager.margin, manager.calibration = margin, calibration
+        assert manager._match_feature(query, gallery)[0] == expected
+        assert manager.open_matcher()
+        try:
+            assert manager._match_features([query], gallery)[0][0] == expected
+        finally:
+            manager.close_matcher()
+
+    # Disabled: the global threshold alone decides, and nothing is calibrated at compaction
+    manager.calibration_sigmas, manager.calibration = 0, cases[2][1]
+    assert manager._match_feature(query, gallery)[0] == "A"
+    manager.gallery = gallery
+    manager.compact_gallery()
+    assert not os.path.exists(manager.calibration_file)
+
+    # Computed at compaction, written next to the signatures and read back by another process
+    manager.calibration_sigmas = 3
+    manager.compact_gallery()
+    assert os.path.exists(manager.calibration_file)
+    reader = FaceRecognizerManager(model_dir="/tmp/models", encoding_file=str(tmp_path / "enc.pkl"))
+    assert reader.load_encodings()
+    assert reader.calibration.names == ["A", "B"]
+    np.testing.assert_allclose(reader.calibration.mean, manager.calibration.mean)
+
+def test_synthetic_gallery_and_image_folder(tmp_path):
+    """Test that synthetic galleries are clustered and reproducible, and that faces are pasted into the images."""
+    import cv2
+    from facial_recognition.synthetic import drawn_faces, synthetic_gallery, write_image_folder
+
+    gallery = synthetic_gallery(12, per_identity=5)
+    assert len(gallery) == 12 and gallery.names[0] == "Identite_0" and gallery.names[-1] == "Identite_2"
+    matrix = np.vstack(gallery.features)
+    np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1, atol=1e-5)
+    scores = matrix @ matrix.T
+    assert scores[0, 1:5].min() > 0.5 and np.abs(scores[0, 5:]).max() < 0.5
+    np.testing.assert_array_equal(np.vstack(synthetic_gallery(12, per_identity=5).features), matrix)
+
+    face_dir = tmp_path / "visages" / "Personne"
+    face_dir.mkdir(parents=True)
+    cv2.imwrite(str(face_dir / "visage.png"), np.full((50, 40, 3), (255, 0, 255), dtype=np.uint8))
+    paths = write_image_folder(str(tmp_path / "images"), 3, faces_per_image=4, resolution=(320, 240),
+                               face_dir=str(tmp_path / "visages"))
+    assert len(paths) == 3
+    for path in paths:
+        image = cv2.imread(path)
+        assert image.shape == (240, 320, 3)
+        magenta = (image[..., 0] > 200) & (image[..., 1] < 60) & (image[..., 2] > 200)
+        # Four faces of 63 x 50 pixels (60 % of a 106 x 120 cell of the 3 x 2 grid)
+        assert 3.5 * 63 * 50 < magenta.sum() <= 4 * 63 * 50
+    empty = cv2.imread(write_image_folder(str(tmp_path / "vides"), 1, resolution=(64, 48))[0])
+    assert not (empty > 230).any()
+
+    # Drawn faces need no photos: reproducible, 4:5, pasted like photos
+    faces = drawn_faces(2, side=50)
+    assert [face.shape for face in faces] == [(50, 40, 3)] * 2
+    np.testing.assert_array_equal(drawn_faces(2, side=50)[1], faces[1])
+    drawn = cv2.imread(write_image_folder(str(tmp_path / "dessins"), 1, resolution=(64, 48), faces=faces)[0])
+    assert np.abs(drawn.astype(int) - empty).max() > 100
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "facial_recognition", "scripts_without_interface")
+
+@pytest.mark.performance
+def test_sorting_performance_against_reference(monkeypatch):
+    """Test that sorting drawn faces keeps its speed and memory relative to OpenCV alone on this machine."""
+    monkeypatch.syspath_prepend(SCRIPTS_DIR)
+    import bench_regression
+
+    models = "/tmp/models"
+    assert FaceRecognizerManager(model_dir=models).check_and_download_models()
+    profile = bench_regression.PROFILS["rapide"]
+    recorded = bench_regression.lire_reference()["rapide"]
+    assert recorded["parametres"] == dict(images=profile["images"], resolution=profile["resolution"],
+                                          passages=profile["passages"], visages="dessines")
+
+    measures = bench_regression.executer(models, profile, afficher=lambda message: None)
+    reference = bench_regression.comparables(recorded)
+    assert set(measures) == set(reference)
+    # The drawn faces are found by the detector itself, so the sorting pipeline is fully exercised
+    for density in profile["densites"]:
+        for base in profile["bases"]:
+            measure = measures[bench_regression.cle(base, density, profile["processus"][0])]
+            assert measure["visages_etalon"] >= 0.9 * profile["images"] * density
+    assert bench_regression.regressions(measures, reference) == []
+
+def test_job_scheduler_queues_cancels_and_keeps_results(tmp_path, manager):
+    """Test that queued jobs run in order on a shared manager, with their own progress, cancellation and results."""
+    import threading
+    import cv2
+    from facial_recognition.jobs import CANCELLED, DONE, FAILED, JobScheduler
+
+    unknown_dir = tmp_path / "unknown"
+    unknown_dir.mkdir()
+    for i in range(6):
+        cv2.imwrite(str(unknown_dir / f"photo{i}.png"), np.zeros((100, 100, 3), dtype=np.uint8))
+    manager.known_features = ["known_feat"]
+    manager.known_names = ["Aimine"]
+    manager.batch_size = 1
+    manager.detector = MagicMock()
+    manager.recognizer = MagicMock()
+    manager.recognizer.feature.return_value = "unknown_feat"
+    manager.recognizer.match.return_value = 0.9
+
+    scheduler = JobScheduler()
+    release = threading.Event()
+    first = scheduler.submit("Bloquante", lambda progress_callback=None: release.wait(5) and "premier")
+    queued = scheduler.submit("Retirée", MagicMock())
+    failed = scheduler.submit("Échec", lambda progress_callback=None: False)
+    cancelled = scheduler.submit("Tri annulé", manager.process_directory, str(unknown_dir))
+    sorted_job = scheduler.submit("Tri", manager.process_directory, str(unknown_dir))
+    assert scheduler.cancel(queued) and queued.state == CANCELLED
+
+    # The first sort is cancelled while detecting its second image
+    detections = []
+    def detect(img):
+        detections.append(img)
+        if len(detections) == 2:
+            scheduler.cancel(cancelled)
+        return None, FACE
+    manager.detector.detect.side_effect = detect
+    release.set()
+    assert scheduler.wait(timeout=10)
+
+    assert (first.state, first.result) == (DONE, "premier")
+    assert not queued.func.called
+    assert failed.state == FAILED
+    assert cancelled.state == CANCELLED and cancelled.result is None
+    assert "Tâche annulée." in cancelled.progress.drain_logs()
+    assert sorted_job.state == DONE and len(sorted_job.result) == 6
+    assert sorted_job.progress.snapshot()["done"] == 6
+    assert not scheduler.active() and not scheduler.cancel(sorted_job)
+    scheduler.shutdown()
+
+def test_gui_settings_apply_between_jobs(tmp_path, monkeypatch):
+    """GUI settings never build the manager on the GUI thread, apply at the next job, and closing does not wait."""
+    import threading
+    import time
+    monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    monkeypatch.chdir(tmp_path)
+    from PyQt6.QtWidgets import QApplication
+    from facial_recognition.interface import FaceRecoApp
+    from facial_recognition.jobs import CANCELLED, DONE
+
+    app = QApplication.instance() or QApplication([])
+    monkeypatch.setattr(FaceRecoApp, "start_warm_up", lambda self: None)
+    window = FaceRecoApp()
+    release = threading.Event()
+    blocking = window.submit_job("Bloquante", lambda progress_callback=None: release.wait(10))
+
+    window.threshold_spin.setValue(0.5)
+    window.margin_spin.setValue(0.05)
+    window.memory_spin.setValue(512)
+    dnn_jobs = []
+    for _ in range(3):  # Several steps of the threads spin box
+        window.update_dnn_settings()
+        dnn_jobs.append(window._dnn_job)
+    assert window._manager is None
+    assert [job.state for job in dnn_jobs[:2]] == [CANCELLED, CANCELLED]
+
+    seen = window.submit_job("Réglages", lambda progress_callback=None: window.job_manager().threshold)
+    release.set()
+    assert window.scheduler.wait(timeout=10)
+    assert dnn_jobs[2].state == DONE and seen.result == 0.5
+    assert window._manager.margin == 0.05 and window._manager.memory_budget == 512 * 1024 * 1024
+
+    # Closing cancels and returns while a job is still running
+    release.clear()
+    window.submit_job("Bloquante", lambda progress_callback=None: release.wait(10))
+    time.sleep(0.1)
+    start = time.perf_counter()
+    window.close()
+    assert time.perf_counter() - start < 1
+    release.set()
+    assert blocking.state == DONE
+    app.processEvents()